@@ -0,0 +1,35 @@
+"""video content hash for upload dedup
+
+Revision ID: 3f1c9a7d2e41
+Revises: 0002_add_used_at
+Create Date: 2025-09-06 11:20:13.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7d2e41'
+down_revision: Union[str, Sequence[str], None] = '0002_add_used_at'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("videos", sa.Column("content_sha256", sa.String(length=64), nullable=True))
+    op.create_index("ix_videos_content_sha256", "videos", ["content_sha256"])
+    # deduped uploads point several rows at one S3 object
+    op.drop_constraint("videos_s3_key_key", "videos", type_="unique")
+    op.create_index("ix_videos_s3_key", "videos", ["s3_key"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_videos_s3_key", table_name="videos")
+    op.create_unique_constraint("videos_s3_key_key", "videos", ["s3_key"])
+    op.drop_index("ix_videos_content_sha256", table_name="videos")
+    op.drop_column("videos", "content_sha256")
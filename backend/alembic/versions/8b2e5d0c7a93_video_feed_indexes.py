@@ -0,0 +1,45 @@
+"""covering indexes for the keyset video feed
+
+Revision ID: 8b2e5d0c7a93
+Revises: 3f1c9a7d2e41
+Create Date: 2025-09-07 15:41:52.118306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e5d0c7a93'
+down_revision: Union[str, Sequence[str], None] = '3f1c9a7d2e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INCLUDE = ["creator_id", "title", "ai_label", "ai_score", "view_count", "duration_s"]
+INDEXES = {
+    "ix_videos_feed": ["created_at", "id"],
+    "ix_videos_creator_feed": ["creator_id", "created_at", "id"],
+    "ix_videos_label_feed": ["ai_label", "created_at", "id"],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY so a big videos table stays writable while these build
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.create_index(
+                name, "videos", columns,
+                postgresql_include=INCLUDE,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.drop_index(name, table_name="videos", postgresql_concurrently=True, if_exists=True)
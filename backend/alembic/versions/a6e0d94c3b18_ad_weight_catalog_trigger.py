@@ -0,0 +1,44 @@
+"""ads.weight and catalog version trigger
+
+Revision ID: a6e0d94c3b18
+Revises: f19b6c2e7a40
+Create Date: 2025-09-13 10:17:42.903561
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6e0d94c3b18'
+down_revision: Union[str, Sequence[str], None] = 'f19b6c2e7a40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("ads", sa.Column("weight", sa.Float(), nullable=False, server_default="1"))
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_ad_catalog_version() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO cache_versions (name, version) VALUES ('ad_catalog', 1)
+            ON CONFLICT (name) DO UPDATE SET version = cache_versions.version + 1, updated_at = now();
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER ads_bump_catalog_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON ads
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_ad_catalog_version()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS ads_bump_catalog_version ON ads")
+    op.execute("DROP FUNCTION IF EXISTS bump_ad_catalog_version()")
+    op.drop_column("ads", "weight")
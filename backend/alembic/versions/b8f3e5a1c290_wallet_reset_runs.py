@@ -0,0 +1,36 @@
+"""wallet_reset_runs checkpoint table
+
+Revision ID: b8f3e5a1c290
+Revises: a6e0d94c3b18
+Create Date: 2025-09-14 16:05:51.240837
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8f3e5a1c290'
+down_revision: Union[str, Sequence[str], None] = 'a6e0d94c3b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "wallet_reset_runs",
+        sa.Column("period", sa.String(length=7), primary_key=True),
+        sa.Column("budget", sa.Integer(), nullable=False),
+        sa.Column("max_wallet_id", sa.Integer(), nullable=False),
+        sa.Column("last_wallet_id", sa.Integer(), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), server_default=sa.text("now()")),
+        sa.Column("completed_at", sa.DateTime(timezone=True)),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("wallet_reset_runs")
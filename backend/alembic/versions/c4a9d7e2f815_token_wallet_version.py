@@ -0,0 +1,29 @@
+"""token_wallets.version for optimistic concurrency
+
+Revision ID: c4a9d7e2f815
+Revises: b8f3e5a1c290
+Create Date: 2025-09-15 13:39:28.771402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a9d7e2f815'
+down_revision: Union[str, Sequence[str], None] = 'b8f3e5a1c290'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # constant default: no table rewrite on Postgres 11+
+    op.add_column("token_wallets", sa.Column("version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("token_wallets", "version")
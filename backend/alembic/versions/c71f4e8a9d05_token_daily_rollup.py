@@ -0,0 +1,46 @@
+"""token_daily_rollup + job_watermarks
+
+Revision ID: c71f4e8a9d05
+Revises: 8b2e5d0c7a93
+Create Date: 2025-09-09 10:03:27.551904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71f4e8a9d05'
+down_revision: Union[str, Sequence[str], None] = '8b2e5d0c7a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "token_daily_rollup",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("creator_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("video_id", sa.Integer(), sa.ForeignKey("videos.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("tok_cnt", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("day", "creator_id", "video_id"),
+    )
+    op.create_index("ix_token_daily_rollup_updated_at", "token_daily_rollup", ["updated_at"])
+    op.create_table(
+        "job_watermarks",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("last_id", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()")),
+    )
+    # the rollup job starts from watermark 0 and backfills history in batches
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("job_watermarks")
+    op.drop_index("ix_token_daily_rollup_updated_at", table_name="token_daily_rollup")
+    op.drop_table("token_daily_rollup")
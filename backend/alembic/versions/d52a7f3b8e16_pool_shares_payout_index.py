@@ -0,0 +1,35 @@
+"""pool_shares index for paginated summaries
+
+Revision ID: d52a7f3b8e16
+Revises: c71f4e8a9d05
+Create Date: 2025-09-10 11:02:37.584120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd52a7f3b8e16'
+down_revision: Union[str, Sequence[str], None] = 'c71f4e8a9d05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_pool_shares_pool_payout", "pool_shares",
+            ["pool_id", sa.text("payout_amount DESC"), "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_pool_shares_pool_payout", table_name="pool_shares", postgresql_concurrently=True, if_exists=True)
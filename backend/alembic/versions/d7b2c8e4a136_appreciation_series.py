@@ -0,0 +1,44 @@
+"""appreciation_series time-series buckets
+
+Revision ID: d7b2c8e4a136
+Revises: c4a9d7e2f815
+Create Date: 2025-09-21 11:42:17.503921
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7b2c8e4a136'
+down_revision: Union[str, Sequence[str], None] = 'c4a9d7e2f815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "appreciation_series",
+        sa.Column("subject", sa.String(length=7), nullable=False),
+        sa.Column("subject_id", sa.Integer(), nullable=False),
+        sa.Column("granularity", sa.String(length=5), nullable=False),
+        sa.Column("bucket", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("tok_cnt", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("subject", "subject_id", "granularity", "bucket"),
+    )
+    op.create_index(
+        "ix_appreciation_series_hour_bucket",
+        "appreciation_series",
+        ["bucket"],
+        postgresql_where=sa.text("granularity = 'hour'"),
+    )
+    # the series job starts from watermark 0 and backfills history in batches
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_appreciation_series_hour_bucket", table_name="appreciation_series")
+    op.drop_table("appreciation_series")
@@ -0,0 +1,48 @@
+"""outbox_events transactional outbox
+
+Revision ID: e5c1f9a3b742
+Revises: d7b2c8e4a136
+Create Date: 2025-09-24 09:17:03.684215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c1f9a3b742'
+down_revision: Union[str, Sequence[str], None] = 'd7b2c8e4a136'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "outbox_events",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("topic", sa.String(), nullable=False),
+        sa.Column("key", sa.String()),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("published_at", sa.DateTime(timezone=True)),
+        sa.Column("attempts", sa.Integer(), server_default="0", nullable=False),
+    )
+    # the relay only ever scans unpublished rows; the purge only published ones
+    op.create_index(
+        "ix_outbox_events_pending", "outbox_events", ["id"],
+        postgresql_where=sa.text("published_at IS NULL"),
+    )
+    op.create_index(
+        "ix_outbox_events_published", "outbox_events", ["published_at"],
+        postgresql_where=sa.text("published_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_outbox_events_published", table_name="outbox_events")
+    op.drop_index("ix_outbox_events_pending", table_name="outbox_events")
+    op.drop_table("outbox_events")
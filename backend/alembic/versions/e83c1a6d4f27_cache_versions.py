@@ -0,0 +1,33 @@
+"""cache_versions table for process-local cache invalidation
+
+Revision ID: e83c1a6d4f27
+Revises: d52a7f3b8e16
+Create Date: 2025-09-11 09:26:14.307751
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e83c1a6d4f27'
+down_revision: Union[str, Sequence[str], None] = 'd52a7f3b8e16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "cache_versions",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()")),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("cache_versions")
@@ -0,0 +1,42 @@
+"""partial indexes on open ad sessions
+
+Revision ID: f19b6c2e7a40
+Revises: e83c1a6d4f27
+Create Date: 2025-09-12 14:48:05.662019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f19b6c2e7a40'
+down_revision: Union[str, Sequence[str], None] = 'e83c1a6d4f27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_ad_session_open": ["user_id", "ad_id"],
+    "ix_ad_session_open_started": ["started_at"],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.create_index(
+                name, "ad_session", columns,
+                postgresql_where=sa.text("NOT is_completed"),
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.drop_index(name, table_name="ad_session", postgresql_concurrently=True, if_exists=True)
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from database.session import get_db
-from database.models import User, Ad, AdSession, TokenWallet
+from database.models import User, Ad, AdSession
 from ..auth.auth_utils import get_current_user
 import logging, secrets
-from datetime import datetime, UTC
-from .schemas import AdStartRequest, AdStartResponse, AdCompleteRequest, AdCompleteResponse
+from datetime import timedelta
+from .catalog import get_ad, pick_ad, record_watch
+from .sessions import AD_SESSION_TTL_S, complete_session
+from .schemas import AdStartRequest, AdStartResponse, AdCompleteRequest, AdCompleteResponse, AdNextResponse
 
 # Set up logger
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +18,14 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/ads", tags=["Ads"])
 
 # Endpoints
+@router.get("/next", response_model=AdNextResponse)
+def next_ad(user: User = Depends(get_current_user)):
+    """Pick an ad to show: weighted, skipping ads this user watched recently"""
+    ad = pick_ad(user.id)
+    if not ad:
+        raise HTTPException(status_code=404, detail="No ads available")
+    return AdNextResponse(ad_id=ad.ad_id, title=ad.title, ad_duration=ad.duration)
+
 @router.post("/start_ad_watch")
 async def start_ad_watch(
     request: AdStartRequest,
@@ -22,8 +33,8 @@ async def start_ad_watch(
     db: Session = Depends(get_db)
 ):
     """Start watching an ad - creates a session token"""
-    # Validate ad exists
-    ad = db.query(Ad).filter(Ad.ad_id == request.ad_id).first()
+    # Validate ad exists (in-memory catalog, no query)
+    ad = get_ad(request.ad_id)
     if not ad:
         raise HTTPException(status_code=404, detail="Ad not found")
 
@@ -33,7 +44,8 @@ async def start_ad_watch(
         .filter(
             AdSession.user_id == request.user_id, 
             AdSession.ad_id == request.ad_id, 
-            AdSession.is_completed == False
+            AdSession.is_completed == False,
+            AdSession.started_at > func.now() - timedelta(seconds=AD_SESSION_TTL_S),
         ).first()
     )
     if existing_session:
@@ -51,6 +63,7 @@ async def start_ad_watch(
         db.add(ad_session)
         db.commit()
         db.refresh(ad_session)
+        record_watch(request.user_id, request.ad_id)
 
         return AdStartResponse(
             session_token=session_token,
@@ -76,35 +89,19 @@ async def complete_ad_watch(
     db: Session = Depends(get_db),
 ):
     """Complete ad watch and grant appreciation token"""
-    ad_session = (
-        db.query(AdSession)
-        .filter(
-            AdSession.session_token == request.session_token,
-            AdSession.is_completed == False
-        ).first()
-    )
-    if not ad_session:
-        raise HTTPException(status_code=404, detail="Invalid session token or ad already completed")
-    
     try:
-        # Mark session as complete
-        ad_session.is_completed = True
-        ad_session.completed_at = datetime.now(UTC)
-
-        # Get user wallet
-        wallet = db.query(TokenWallet).filter(TokenWallet.user_id == request.user_id).first()
-        if not wallet:
+        # flip the session and credit its owner's wallet in one statement
+        completed, balance = complete_session(db, request.session_token)
+        if not completed:
+            db.rollback()
+            raise HTTPException(status_code=404, detail="Invalid session token or ad already completed")
+        if balance is None:
+            db.rollback()
             raise HTTPException(status_code=404, detail="Wallet not found")
-        
-        # Add appreciation token to wallet
-        wallet.bonus_balance += 1
-
         db.commit()
-        db.refresh(ad_session)
-        db.refresh(wallet)
 
         return AdCompleteResponse(
-            balance=wallet.bonus_balance+wallet.monthly_budget,
+            balance=balance,
             message="Wallet top up successfully"
         )
     
@@ -0,0 +1,196 @@
+# app/ads/catalog.py
+"""
+In-memory ad catalog and ad selection.
+
+Each worker holds an immutable snapshot of the ads table: rows by id plus
+cumulative weights for weighted picks. The snapshot is loaded at startup and
+swapped for a new one when the "ad_catalog" version stamp moves, or every
+AD_CATALOG_MAX_AGE_S as a backstop. A trigger on ads bumps that stamp
+(migration a6e0d94c3b18). Serving an ad therefore never touches the DB.
+
+Recently watched ads are kept per user as a bitmap keyed by ad_id. The
+bitmap lives in Redis (SETBIT, expiring AD_RECENT_TTL_S after the last
+watch) when REDIS_URL is set, and otherwise in a bounded per-worker LRU.
+pick() draws by weight with bisect. It rejects recently watched ads, and
+after a few misses it falls back to one weighted pass over the ads not yet
+watched. When the user has seen everything, the exclusion is dropped.
+"""
+import bisect
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+from database.session import engine
+from ..services import metrics, versions
+from ..storage.redis_client import get_redis_bytes
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION = "ad_catalog"
+AD_CATALOG_MAX_AGE_S = float(os.getenv("AD_CATALOG_MAX_AGE_S", "300"))
+AD_RECENT_TTL_S = int(os.getenv("AD_RECENT_TTL_S", "3600"))
+AD_RECENT_MAX_USERS = int(os.getenv("AD_RECENT_MAX_USERS", "100000"))
+PICK_ATTEMPTS = 8
+
+
+@dataclass(frozen=True)
+class CatalogAd:
+    ad_id: int
+    title: str
+    duration: int
+    weight: float
+
+
+class CatalogSnapshot:
+    def __init__(self, ads: List[CatalogAd], version: int):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.ads = [a for a in ads if a.weight > 0]
+        self.by_id: Dict[int, CatalogAd] = {a.ad_id: a for a in self.ads}  # paused ads can't be started
+        self.cumulative: List[float] = []
+        total = 0.0
+        for a in self.ads:
+            total += a.weight
+            self.cumulative.append(total)
+        self.total_weight = total
+
+    def pick(self, recent: int, rng: random.Random) -> Optional[CatalogAd]:
+        """Weighted pick among ads whose bit isn't set in `recent`"""
+        if not self.ads:
+            return None
+        last = len(self.ads) - 1
+        for _ in range(PICK_ATTEMPTS):
+            ad = self.ads[min(bisect.bisect_right(self.cumulative, rng.random() * self.total_weight), last)]
+            if not recent >> ad.ad_id & 1:
+                return ad
+        fresh = [a for a in self.ads if not recent >> a.ad_id & 1]
+        if not fresh:
+            fresh = self.ads  # watched everything lately: start over
+        return rng.choices(fresh, weights=[a.weight for a in fresh])[0]
+
+
+class MemoryRecentAds:
+    """user_id -> (bitmap, expires_at), least recently used users dropped first"""
+
+    def __init__(self, max_users: int = AD_RECENT_MAX_USERS):
+        self.max_users = max_users
+        self._users: "OrderedDict[int, tuple]" = OrderedDict()  # (bitmap, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> int:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return 0
+            if entry[1] <= time.monotonic():
+                del self._users[user_id]
+                return 0
+            return entry[0]
+
+    def add(self, user_id: int, ad_id: int) -> None:
+        with self._lock:
+            bits, _ = self._users.pop(user_id, (0, 0.0))
+            self._users[user_id] = (bits | (1 << ad_id), time.monotonic() + AD_RECENT_TTL_S)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+
+class RedisRecentAds:
+    def __init__(self, client):
+        self.client = client
+
+    def _key(self, user_id: int) -> str:
+        return f"ads:recent:{user_id}"
+
+    def get(self, user_id: int) -> int:
+        data = self.client.get(self._key(user_id))
+        return _redis_bits_to_int(data) if data else 0
+
+    def add(self, user_id: int, ad_id: int) -> None:
+        pipe = self.client.pipeline()
+        pipe.setbit(self._key(user_id), ad_id, 1)
+        pipe.expire(self._key(user_id), AD_RECENT_TTL_S)
+        pipe.execute()
+
+
+def _redis_bits_to_int(data: bytes) -> int:
+    """Redis bitmap (bit 0 = MSB of byte 0) -> int with bit n = offset n"""
+    out = 0
+    for i, byte in enumerate(data):
+        if byte:
+            for b in range(8):
+                if byte & (0x80 >> b):
+                    out |= 1 << (i * 8 + b)
+    return out
+
+
+def _make_recent():
+    client = get_redis_bytes()
+    return RedisRecentAds(client) if client is not None else MemoryRecentAds()
+
+
+recent_ads = _make_recent()
+
+_snapshot: Optional[CatalogSnapshot] = None
+_reload_lock = threading.Lock()
+_rng = random.Random()
+
+
+def load_catalog() -> CatalogSnapshot:
+    """Read the ads table into a new snapshot and make it current"""
+    global _snapshot
+    version = versions.current(CATALOG_VERSION)  # before the rows, so a racing change triggers a reload
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT ad_id, title, duration, weight FROM ads ORDER BY ad_id")).all()
+    snapshot = CatalogSnapshot(
+        [CatalogAd(r.ad_id, r.title, r.duration, float(r.weight if r.weight is not None else 1.0)) for r in rows],
+        version,
+    )
+    _snapshot = snapshot
+    metrics.set_gauge("ads.catalog_size", len(snapshot.by_id))
+    logger.info(f"ad catalog loaded: {len(snapshot.by_id)} ads (version {version})")
+    return snapshot
+
+
+def _stale(snapshot: Optional[CatalogSnapshot]) -> bool:
+    return (
+        snapshot is None
+        or time.monotonic() - snapshot.loaded_at > AD_CATALOG_MAX_AGE_S
+        or versions.current(CATALOG_VERSION) != snapshot.version
+    )
+
+
+def get_catalog() -> CatalogSnapshot:
+    snapshot = _snapshot
+    if _stale(snapshot):
+        with _reload_lock:
+            # one reload per worker; threads that waited use its result
+            snapshot = _snapshot
+            if _stale(snapshot):
+                snapshot = load_catalog()
+    return snapshot
+
+
+def get_ad(ad_id: int) -> Optional[CatalogAd]:
+    """The ad if it exists and isn't paused (weight 0)"""
+    return get_catalog().by_id.get(ad_id)
+
+
+def pick_ad(user_id: int) -> Optional[CatalogAd]:
+    ad = get_catalog().pick(recent_ads.get(user_id), _rng)
+    metrics.incr("ads.served" if ad else "ads.no_fill")
+    return ad
+
+
+def record_watch(user_id: int, ad_id: int) -> None:
+    try:
+        recent_ads.add(user_id, ad_id)
+    except Exception as e:
+        logger.warning(f"could not record recent ad for user {user_id}: {e}")
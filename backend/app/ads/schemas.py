@@ -15,4 +15,9 @@ class AdCompleteRequest(BaseModel):
 
 class AdCompleteResponse(BaseModel):
     balance: int
-    message: str
\ No newline at end of file
+    message: str
+
+class AdNextResponse(BaseModel):
+    ad_id: int
+    title: str
+    ad_duration: int
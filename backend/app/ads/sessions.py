@@ -0,0 +1,92 @@
+# app/ads/sessions.py
+"""
+Ad session completion and expiry.
+
+complete_session() flips the session and credits the owner's wallet in one
+statement (UPDATE ad_session ... RETURNING chained into UPDATE token_wallets),
+so a token can't be completed twice and the credit can't get lost between
+round trips.
+
+Sessions that are never completed expire after AD_SESSION_TTL_S. They can't
+be completed or block a new start any more, and sweep_expired_sessions()
+deletes them AD_SWEEP_CHUNK rows per transaction, so ad_session and its
+partial "open sessions" indexes stay small.
+"""
+import logging
+import os
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.session import engine
+from ..services import metrics
+from ..services.outbox import emit
+
+logger = logging.getLogger(__name__)
+
+AD_SESSION_TTL_S = int(os.getenv("AD_SESSION_TTL_S", "3600"))
+AD_SWEEP_INTERVAL_S = float(os.getenv("AD_SWEEP_INTERVAL_S", "300"))
+AD_SWEEP_CHUNK = 5000
+
+_COMPLETE_SQL = """
+    WITH done AS (
+        UPDATE ad_session
+        SET is_completed = true, completed_at = now()
+        WHERE session_token = :token
+          AND NOT is_completed
+          AND started_at > now() - make_interval(secs => :ttl)
+        RETURNING session_id, user_id, ad_id
+    ), credited AS (
+        UPDATE token_wallets w
+        SET bonus_balance = w.bonus_balance + 1, version = w.version + 1
+        FROM done
+        WHERE w.user_id = done.user_id
+        RETURNING w.bonus_balance + w.monthly_budget AS balance
+    )
+    SELECT (SELECT count(*) FROM done) AS completed,
+           (SELECT balance FROM credited LIMIT 1) AS balance,
+           done.session_id, done.user_id, done.ad_id
+    FROM (SELECT 1) AS one LEFT JOIN done ON true
+"""
+
+_SWEEP_SQL = """
+    DELETE FROM ad_session
+    WHERE session_id IN (
+        SELECT session_id FROM ad_session
+        WHERE NOT is_completed AND started_at < now() - make_interval(secs => :ttl)
+        ORDER BY started_at
+        LIMIT :chunk
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+
+
+def complete_session(db: Session, session_token: str) -> Tuple[bool, Optional[int]]:
+    """
+    (completed, balance) -- completed is False for an unknown, finished or
+    expired token; balance is None if the owner has no wallet. No commit.
+    """
+    row = db.execute(text(_COMPLETE_SQL), {"token": session_token, "ttl": AD_SESSION_TTL_S}).one()
+    if row.completed:
+        # a watch without a wallet still happened; it just credited nothing
+        emit(db, "ad_watch.completed", {
+            "session_id": row.session_id, "user_id": row.user_id, "ad_id": row.ad_id,
+            "bonus_tokens": 0 if row.balance is None else 1, "balance": row.balance,
+        }, key=row.user_id)
+    return bool(row.completed), row.balance
+
+
+def sweep_expired_sessions() -> int:
+    """Delete open sessions past the TTL; returns how many were removed"""
+    removed = 0
+    while True:
+        with engine.begin() as conn:
+            n = conn.execute(text(_SWEEP_SQL), {"ttl": AD_SESSION_TTL_S, "chunk": AD_SWEEP_CHUNK}).rowcount
+        removed += n
+        if n < AD_SWEEP_CHUNK:
+            break
+    if removed:
+        metrics.incr("ads.sessions_expired", removed)
+        logger.info(f"expired {removed} ad sessions")
+    return removed
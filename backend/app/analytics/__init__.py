@@ -0,0 +1 @@
+# analytics/__init__.py
\ No newline at end of file
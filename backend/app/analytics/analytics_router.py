@@ -0,0 +1,57 @@
+# app/analytics/analytics_router.py
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from database.session import get_db
+from database.models import User, Video
+from .schemas import SeriesOut, SeriesPointOut
+from .series import query_series
+
+router = APIRouter(tags=["Analytics"])
+
+GRANULARITY_PATTERN = r"^(hour|day|month)$"
+
+
+def _series(db: Session, subject: str, subject_id: int, granularity: str,
+            start: Optional[datetime], end: Optional[datetime]) -> SeriesOut:
+    try:
+        start, end, points = query_series(db, subject, subject_id, granularity, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return SeriesOut(
+        subject=subject,
+        id=subject_id,
+        granularity=granularity,
+        start=start,
+        end=end,
+        total=sum(n for _, n in points),
+        points=[SeriesPointOut(bucket=b, appreciations=n) for b, n in points],
+    )
+
+
+@router.get("/videos/{video_id}/stats", response_model=SeriesOut)
+def video_stats(
+    video_id: int,
+    granularity: str = Query("day", pattern=GRANULARITY_PATTERN),
+    start: Optional[datetime] = Query(None, description="UTC; defaults to 48 hours / 30 days / 12 months back"),
+    end: Optional[datetime] = Query(None, description="UTC; defaults to now"),
+    db: Session = Depends(get_db),
+):
+    if db.get(Video, video_id) is None:
+        raise HTTPException(404, "video not found")
+    return _series(db, "video", video_id, granularity, start, end)
+
+
+@router.get("/creators/{creator_id}/stats", response_model=SeriesOut)
+def creator_stats(
+    creator_id: int,
+    granularity: str = Query("day", pattern=GRANULARITY_PATTERN),
+    start: Optional[datetime] = Query(None, description="UTC; defaults to 48 hours / 30 days / 12 months back"),
+    end: Optional[datetime] = Query(None, description="UTC; defaults to now"),
+    db: Session = Depends(get_db),
+):
+    if db.get(User, creator_id) is None:
+        raise HTTPException(404, "creator not found")
+    return _series(db, "creator", creator_id, granularity, start, end)
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List
+
+class SeriesPointOut(BaseModel):
+    bucket: datetime  # UTC start of the bucket
+    appreciations: int
+
+class SeriesOut(BaseModel):
+    subject: str  # 'video' | 'creator'
+    id: int
+    granularity: str  # 'hour' | 'day' | 'month'
+    start: datetime
+    end: datetime
+    total: int
+    points: List[SeriesPointOut]
@@ -0,0 +1,180 @@
+# app/analytics/series.py
+"""
+Appreciation time series per video and per creator.
+
+The rows are appreciation_series(subject, subject_id, granularity, bucket,
+tok_cnt), where granularity is 'hour', 'day' or 'month' and bucket is the
+bucket's UTC start. refresh_series() follows appreciation_tokens with its own
+job_watermarks entry, the same way the daily rollup does. Each batch is first
+counted per (video, creator, hour). Those hourly counts are then rolled up
+into day and month buckets, and all six series (video / creator x three
+granularities) are upserted in one statement. A range query therefore reads
+one PK range, O(buckets), whatever the token count.
+
+Tokens above the watermark (at most ROLLUP_LAG_S plus one interval's worth)
+are added from the raw table at query time by a token_id range scan, in the
+same statement as the bucket read, so counts are exact up to now.
+
+Hourly buckets are kept for SERIES_HOUR_RETENTION_DAYS. Day and month buckets
+are kept forever.
+"""
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.session import engine
+from ..pools.rollups import get_watermark, settled_token_id
+
+logger = logging.getLogger(__name__)
+
+SERIES_JOB = "appreciation_series"
+SERIES_BATCH = int(os.getenv("SERIES_BATCH", "500000"))  # tokens per transaction
+SERIES_INTERVAL_S = float(os.getenv("SERIES_INTERVAL_S", "60"))
+SERIES_HOUR_RETENTION_DAYS = int(os.getenv("SERIES_HOUR_RETENTION_DAYS", "90"))
+SERIES_MAX_BUCKETS = 2000
+
+GRANULARITIES = ("hour", "day", "month")
+SUBJECTS = ("video", "creator")
+DEFAULT_SPAN = {"hour": timedelta(hours=48), "day": timedelta(days=30), "month": timedelta(days=365)}
+
+_UPSERT_SQL = """
+    WITH hourly AS (
+        SELECT t.video_id, v.creator_id, date_trunc('hour', t.used_at, 'UTC') AS hour, count(*) AS n
+        FROM appreciation_tokens t
+        JOIN videos v ON v.id = t.video_id
+        WHERE t.token_id > :lo AND t.token_id <= :hi
+        GROUP BY 1, 2, 3
+    )
+    INSERT INTO appreciation_series (subject, subject_id, granularity, bucket, tok_cnt)
+    SELECT s.subject, s.subject_id, g.granularity, date_trunc(g.granularity, h.hour, 'UTC'), sum(h.n)
+    FROM hourly h
+    CROSS JOIN (VALUES ('hour'), ('day'), ('month')) AS g(granularity)
+    CROSS JOIN LATERAL (VALUES ('video', h.video_id), ('creator', h.creator_id)) AS s(subject, subject_id)
+    WHERE s.subject_id IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (subject, subject_id, granularity, bucket)
+    DO UPDATE SET tok_cnt = appreciation_series.tok_cnt + EXCLUDED.tok_cnt
+"""
+
+# one statement, so the buckets and the tail come from the same snapshot of the watermark
+_QUERY_SQL = """
+    WITH wm AS (
+        SELECT COALESCE((SELECT last_id FROM job_watermarks WHERE name = :job), 0) AS last_id
+    )
+    SELECT bucket, tok_cnt FROM appreciation_series
+    WHERE subject = :subject AND subject_id = :id AND granularity = :granularity
+      AND bucket >= :start AND bucket < :end
+    UNION ALL
+    SELECT date_trunc(:granularity, t.used_at, 'UTC'), count(*)
+    FROM appreciation_tokens t
+    JOIN videos v ON v.id = t.video_id
+    CROSS JOIN wm
+    WHERE t.token_id > wm.last_id AND {subject_filter}
+      AND t.used_at >= :start AND t.used_at < :end
+    GROUP BY 1
+"""
+_SUBJECT_FILTER = {"video": "t.video_id = :id", "creator": "v.creator_id = :id"}
+
+
+def refresh_series() -> int:
+    """Apply tokens above the watermark; returns how many token ids were covered"""
+    covered = 0
+    while True:
+        with engine.begin() as conn:
+            if not conn.execute(text("SELECT pg_try_advisory_xact_lock(hashtext(:job))"), {"job": SERIES_JOB}).scalar():
+                return covered
+            conn.execute(
+                text("INSERT INTO job_watermarks (name, last_id) VALUES (:name, 0) ON CONFLICT (name) DO NOTHING"),
+                {"name": SERIES_JOB},
+            )
+            lo = get_watermark(conn, SERIES_JOB)
+            hi = min(settled_token_id(conn, lo), lo + SERIES_BATCH)
+            if hi <= lo:
+                return covered
+            conn.execute(text(_UPSERT_SQL), {"lo": lo, "hi": hi})
+            conn.execute(
+                text("UPDATE job_watermarks SET last_id = :hi, updated_at = now() WHERE name = :name"),
+                {"hi": hi, "name": SERIES_JOB},
+            )
+        covered += hi - lo
+        logger.info(f"appreciation series advanced {lo} -> {hi}")
+
+
+def prune_hourly() -> int:
+    """Drop hourly buckets past the retention window"""
+    with engine.begin() as conn:
+        n = conn.execute(
+            text("DELETE FROM appreciation_series WHERE granularity = 'hour' AND bucket < now() - make_interval(days => :days)"),
+            {"days": SERIES_HOUR_RETENTION_DAYS},
+        ).rowcount
+    if n:
+        logger.info(f"appreciation series: pruned {n} hourly buckets")
+    return n
+
+
+def refresh_and_prune() -> None:
+    refresh_series()
+    prune_hourly()
+
+
+def _utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+def floor_bucket(ts: datetime, granularity: str) -> datetime:
+    ts = _utc(ts)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_bucket(ts: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return ts + timedelta(hours=1)
+    if granularity == "day":
+        return ts + timedelta(days=1)
+    return ts.replace(year=ts.year + 1, month=1) if ts.month == 12 else ts.replace(month=ts.month + 1)
+
+
+def bucket_range(granularity: str, start: Optional[datetime], end: Optional[datetime]) -> Tuple[datetime, datetime, List[datetime]]:
+    """Aligned [start, end) and every bucket start in it; ValueError if too wide or empty"""
+    end = _utc(end) if end is not None else datetime.now(timezone.utc)
+    aligned = floor_bucket(end, granularity)
+    end = aligned if aligned == end else next_bucket(aligned, granularity)  # a partial last bucket is included
+    start = floor_bucket(start if start is not None else end - DEFAULT_SPAN[granularity], granularity)
+    if start >= end:
+        raise ValueError("start must be before end")
+    buckets = []
+    b = start
+    while b < end:
+        buckets.append(b)
+        if len(buckets) > SERIES_MAX_BUCKETS:
+            raise ValueError(f"range covers more than {SERIES_MAX_BUCKETS} {granularity} buckets")
+        b = next_bucket(b, granularity)
+    return start, end, buckets
+
+
+def query_series(
+    db: Session,
+    subject: str,
+    subject_id: int,
+    granularity: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Tuple[datetime, datetime, List[Tuple[datetime, int]]]:
+    """(start, end, [(bucket, appreciations)]) with empty buckets filled with 0"""
+    start, end, buckets = bucket_range(granularity, start, end)
+    counts: Dict[datetime, int] = {}
+    rows = db.execute(text(_QUERY_SQL.format(subject_filter=_SUBJECT_FILTER[subject])), {
+        "job": SERIES_JOB, "subject": subject, "id": subject_id, "granularity": granularity,
+        "start": start, "end": end,
+    })
+    for bucket, n in rows:
+        counts[bucket] = counts.get(bucket, 0) + n
+    return start, end, [(b, counts.get(b, 0)) for b in buckets]
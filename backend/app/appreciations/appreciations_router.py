@@ -5,12 +5,18 @@ from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy import func, extract
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from database.session import get_db
 from database.models import User, Video, TokenWallet, AppreciationToken
 from .schemas import AppreciateIn, AppreciateOut, ErrorResponse, TopUpResponse
 from ..auth.auth_utils import get_current_user
+from .dedup import might_have_appreciated, record_appreciation, record_check_result
+from ..leaderboards import boards as leaderboards
+from ..videos import trending
+from ..services.wallets import InsufficientTokens, WalletBusy, credit_bonus, spend_token
+from ..services.outbox import emit
 
 # Set up logger
 logging.basicConfig(level=logging.INFO)
@@ -45,7 +51,7 @@ def sha256_hex(ip: str) -> str:
         409: {"description": "Already appreciated", "model": ErrorResponse},
     },
 )
-async def appreciate(
+def appreciate(
     req: Request,
     body: AppreciateIn,
     db: Session = Depends(get_db),
@@ -67,17 +73,22 @@ async def appreciate(
     if not wallet:
         raise HTTPException(status_code=404, detail="wallet not found")
 
-    # 3) Prevent duplicate appreciation (unique per wallet_id + video_id)
-    dup = (
-        db.query(AppreciationToken)
-          .filter(
-              AppreciationToken.user_id == body.user_id,
-              AppreciationToken.video_id == video.id,
-          )
-          .first()
-    )
-    if dup:
-        raise HTTPException(status_code=409, detail="already appreciated")
+    # 3) Prevent duplicate appreciation (unique per user_id + video_id).
+    #    The Bloom filter rules out most first-time taps without a query;
+    #    uniq_user_video_appreciation is the final safeguard at commit.
+    if might_have_appreciated(user.id, video.id):
+        dup = (
+            db.query(AppreciationToken.token_id)
+              .filter(
+                  AppreciationToken.user_id == user.id,
+                  AppreciationToken.video_id == video.id,
+              )
+              .first()
+        )
+        record_check_result(dup is not None)
+        if dup:
+            record_appreciation(user.id, video.id)
+            raise HTTPException(status_code=409, detail="already appreciated")
 
     # 4) Per-creator monthly cap (should we have a monthly cap?)
     month_count = (
@@ -94,13 +105,7 @@ async def appreciate(
     if month_count >= MAX_PER_CREATOR_PER_MONTH:
         raise HTTPException(status_code=400, detail="monthly cap reached for this creator")
 
-    # 5) Ensure wallet has tokens (monthly first, then bonus)
-    monthly = wallet.monthly_budget or 0
-    bonus = wallet.bonus_balance or 0
-    if monthly + bonus < 1:
-        raise HTTPException(status_code=400, detail="insufficient tokens")
-
-    # 6) Record appreciation + deduct
+    # 5) Record appreciation + deduct (monthly first, then bonus)
     client_ip = req.headers.get("x-forwarded-for") or (req.client.host if req.client else "0.0.0.0")
     ip_hash = sha256_hex(client_ip)
 
@@ -112,17 +117,38 @@ async def appreciate(
     )
     db.add(apprec)
 
-    if monthly > 0:
-        wallet.monthly_budget = monthly - 1
-    else:
-        wallet.bonus_balance = bonus - 1
+    # compare-and-set on wallet.version, so parallel taps can't overwrite each other
+    try:
+        monthly, bonus = spend_token(db, wallet.wallet_id)
+    except InsufficientTokens:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="insufficient tokens")
+    except WalletBusy:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="wallet busy, please retry")
 
-    db.commit()
-    db.refresh(wallet)
+    try:
+        db.flush()  # assigns token_id for the event
+        emit(db, "appreciation.created", {
+            "token_id": apprec.token_id,
+            "user_id": user.id,
+            "video_id": video.id,
+            "creator_id": video.creator_id,
+            "source": apprec.source.value if hasattr(apprec.source, "value") else apprec.source,
+        }, key=video.id)
+        db.commit()
+    except IntegrityError:
+        # duplicate the filter didn't know about (e.g. inserted via another worker)
+        db.rollback()
+        record_appreciation(user.id, video.id)
+        raise HTTPException(status_code=409, detail="already appreciated")
+    record_appreciation(user.id, video.id)
+    leaderboards.record_appreciation(video.creator_id, video.id)
+    trending.record_appreciation(video.id)
 
     return AppreciateOut(
         ok=True,
-        remaining_tokens=(wallet.monthly_budget or 0) + (wallet.bonus_balance or 0),
+        remaining_tokens=monthly + bonus,
         creator_monthly_count=month_count + 1,
         message="Appreciation recorded",
     )
@@ -133,24 +159,24 @@ async def topup(
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Find users wallet
-    wallet = db.query(TokenWallet).filter(TokenWallet.user_id == id).first()
-    if not wallet:
-        raise HTTPException(
-            status_code=404,
-            detail="wallet not found"
-        )
     try:
-        # Topup balance
-        wallet.bonus_balance += 1
-
+        # Topup balance (atomic increment, bumps wallet.version)
+        balance = credit_bonus(db, id)
+        if balance is None:
+            db.rollback()
+            raise HTTPException(
+                status_code=404,
+                detail="wallet not found"
+            )
         db.commit()
-        db.refresh()
 
         return TopUpResponse(
-            balance = wallet.bonus_balance + wallet.monthly_budget,
+            balance = balance,
             message = "Wallet topped up!"
         )
+
+    except HTTPException as he:
+        raise he
     
     except Exception as e:
         db.rollback()
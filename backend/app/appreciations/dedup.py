@@ -0,0 +1,149 @@
+# app/appreciations/dedup.py
+"""
+Bloom-filter pre-check for "has this user already appreciated this video?".
+
+Nearly every tap is a first one, so appreciate only runs its duplicate
+query when the filter says the (user_id, video_id) pair might be present.
+The filter is loaded once from appreciation_tokens, in a background thread
+at startup. Each committed appreciation is added to it. Until the load
+finishes, every pair reports "maybe" and takes the DB check.
+
+With the in-process backend, a worker doesn't see the inserts made by other
+workers. A duplicate tap routed to a different worker can then skip the
+query. In that case uniq_user_video_appreciation rejects the insert and
+appreciate still answers 409. With APPRECIATION_BLOOM_BACKEND=redis, one
+shared filter avoids that and is loaded only once.
+
+Sizing (APPRECIATION_BLOOM_CAPACITY, APPRECIATION_BLOOM_ERROR_RATE) and
+the current memory / estimated false-positive rate, as well as how often
+the DB confirmed a "maybe", are reported under "appreciation_bloom" in
+/health/metrics.
+"""
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+from database.session import engine
+from ..services import metrics
+from ..services.bloom import RedisBloomFilter, ScalableBloomFilter
+from ..storage.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+APPRECIATION_BLOOM_BACKEND = os.getenv("APPRECIATION_BLOOM_BACKEND", "memory")  # memory | redis | off
+APPRECIATION_BLOOM_CAPACITY = int(os.getenv("APPRECIATION_BLOOM_CAPACITY", "1000000"))
+APPRECIATION_BLOOM_ERROR_RATE = float(os.getenv("APPRECIATION_BLOOM_ERROR_RATE", "0.01"))
+BLOOM_LOAD_BATCH = 50_000
+
+REDIS_BLOOM_KEY = "bloom:appreciations"
+REDIS_LOADED_KEY = "bloom:appreciations:loaded"
+
+
+def _key(user_id: int, video_id: int) -> str:
+    return f"{user_id}:{video_id}"
+
+
+def _make_filter():
+    if APPRECIATION_BLOOM_BACKEND == "redis":
+        client = get_redis()
+        if client is None:
+            raise RuntimeError("APPRECIATION_BLOOM_BACKEND=redis but REDIS_URL is not set")
+        return RedisBloomFilter(client, REDIS_BLOOM_KEY, APPRECIATION_BLOOM_CAPACITY, APPRECIATION_BLOOM_ERROR_RATE)
+    return ScalableBloomFilter(APPRECIATION_BLOOM_CAPACITY, APPRECIATION_BLOOM_ERROR_RATE)
+
+
+appreciation_filter = _make_filter() if APPRECIATION_BLOOM_BACKEND != "off" else None
+_loaded = threading.Event()
+
+
+def might_have_appreciated(user_id: int, video_id: int) -> bool:
+    """False only if the pair is certainly new; True means 'check the DB'"""
+    if appreciation_filter is None or not _loaded.is_set():
+        return True
+    try:
+        maybe = appreciation_filter.might_contain(_key(user_id, video_id))
+    except Exception as e:
+        logger.warning(f"appreciation bloom check failed: {e}")
+        return True
+    metrics.incr("appreciation_bloom.checks")
+    if not maybe:
+        metrics.incr("appreciation_bloom.skipped_queries")
+    return maybe
+
+
+def record_appreciation(user_id: int, video_id: int) -> None:
+    """Call after the appreciation is committed (or found to exist)"""
+    if appreciation_filter is None:
+        return
+    try:
+        appreciation_filter.add(_key(user_id, video_id))
+    except Exception as e:
+        logger.warning(f"appreciation bloom add failed: {e}")
+
+
+def record_check_result(duplicate: bool) -> None:
+    """Outcome of a DB check the filter asked for: false positives show up here"""
+    metrics.incr("appreciation_bloom.db_duplicates" if duplicate else "appreciation_bloom.false_positives")
+
+
+def load_appreciation_filter() -> None:
+    """Fill the filter from appreciation_tokens (streamed), then enable it"""
+    if appreciation_filter is None:
+        return
+    if isinstance(appreciation_filter, RedisBloomFilter):
+        client = appreciation_filter.client
+        # one worker loads; the others wait for it
+        if client.get(REDIS_LOADED_KEY):
+            _loaded.set()
+            return
+        if not client.set(REDIS_LOADED_KEY + ":lock", "1", nx=True, ex=3600):
+            # somebody else is loading: keep checking the DB until they're done
+            while not client.get(REDIS_LOADED_KEY):
+                time.sleep(5)
+            _loaded.set()
+            return
+    loaded = 0
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=BLOOM_LOAD_BATCH).execute(
+            text("SELECT user_id, video_id FROM appreciation_tokens WHERE user_id IS NOT NULL AND video_id IS NOT NULL")
+        )
+        for rows in result.partitions(BLOOM_LOAD_BATCH):
+            keys = [_key(u, v) for u, v in rows]
+            if isinstance(appreciation_filter, RedisBloomFilter):
+                appreciation_filter.add_many(keys)
+            else:
+                for k in keys:
+                    appreciation_filter.add(k)
+            loaded += len(keys)
+    if isinstance(appreciation_filter, RedisBloomFilter):
+        appreciation_filter.client.set(REDIS_LOADED_KEY, "1")
+    _loaded.set()
+    logger.info(f"appreciation bloom filter loaded with {loaded} pairs: {appreciation_filter.stats()}")
+
+
+def start_loading() -> None:
+    threading.Thread(target=_load_safely, name="appreciation-bloom-load", daemon=True).start()
+
+
+def _load_safely() -> None:
+    try:
+        load_appreciation_filter()
+    except Exception as e:
+        logger.error(f"appreciation bloom load failed, duplicate checks stay on: {e}")
+
+
+def _stats() -> dict:
+    if appreciation_filter is None:
+        return {"backend": "off"}
+    try:
+        stats = appreciation_filter.stats()
+    except Exception as e:
+        return {"error": str(e)}
+    stats["loaded"] = _loaded.is_set()
+    return stats
+
+
+metrics.register_collector("appreciation_bloom", _stats)
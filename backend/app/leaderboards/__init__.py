@@ -0,0 +1 @@
+# leaderboards/__init__.py
\ No newline at end of file
@@ -0,0 +1,352 @@
+# app/leaderboards/boards.py
+"""
+Monthly appreciation leaderboards for creators and videos.
+
+Each period ('YYYY-MM') has two boards, one keyed by creator_id and one by
+video_id. Each board is a sorted set scored by appreciation count. appreciate
+calls record_appreciation() after its commit, which adds 1 on both boards of
+the current month. top() then reads the first K entries without any GROUP BY
+over appreciation_tokens.
+
+Backends (LEADERBOARD_BACKEND):
+  - redis: ZINCRBY / ZREVRANGE on lb:{period}:{kind}, shared by all workers.
+    A board is rebuilt only when its lb:{period}:loaded flag is missing.
+  - memory (default): MemoryLeaderboard, a dict of scores plus a list of
+    (-score, id) kept sorted with bisect. Each worker only sees its own
+    appreciations, so its current-month boards are rebuilt every
+    LEADERBOARD_REFRESH_S.
+
+rebuild() recomputes a period from the daily rollup plus the raw tail
+(month_token_counts). It is used when a board is first read (cold start),
+and by POST /leaderboards/{period}/rebuild. Only the current period and the
+LEADERBOARD_MAX_PERIODS - 1 before it are served (PeriodOutOfRange
+otherwise), so a scan over old or future months can't start a rebuild per
+request, and the memory backend never evicts the current month's boards to
+make room. One rebuild per period runs at a time (a thread lock in
+memory, lb:{period}:lock in Redis); a caller that finds one running serves
+what the board holds meanwhile. Taps recorded while a rebuild runs are also
+kept as a delta (a list in memory, lb:{period}:{kind}:delta in Redis) and
+added onto the fresh counts when they are swapped in, so none are lost. A tap
+that committed just before the counts were read and is recorded just after
+the rebuild started is counted twice until the next rebuild.
+"""
+import bisect
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from database.session import SessionLocal
+from ..pools.rollups import month_token_counts
+from ..pools.settlement import month_bounds
+from ..services import metrics
+from ..storage.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_BACKEND = os.getenv("LEADERBOARD_BACKEND", "memory")  # memory | redis
+LEADERBOARD_REFRESH_S = float(os.getenv("LEADERBOARD_REFRESH_S", "300"))
+LEADERBOARD_MAX_PERIODS = 24  # months served, and memory boards kept per worker
+LEADERBOARD_TTL_S = 400 * 86400  # redis keys expire a good year after the last tap
+LEADERBOARD_REBUILD_LOCK_S = 600  # a crashed rebuild frees its period after this
+REDIS_PREFIX = "lb:"
+REBUILD_CHUNK = 10_000
+
+KINDS = ("creators", "videos")
+
+
+def current_period() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m")
+
+
+class PeriodOutOfRange(LookupError):
+    """The period is in the future or older than LEADERBOARD_MAX_PERIODS months"""
+
+
+def _month_index(period: str) -> int:
+    start, _ = month_bounds(period)
+    return start.year * 12 + start.month - 1
+
+
+def check_period(period: str) -> None:
+    """ValueError unless period is 'YYYY-MM'; PeriodOutOfRange unless it is one of the served months"""
+    age = _month_index(current_period()) - _month_index(period)
+    if not 0 <= age < LEADERBOARD_MAX_PERIODS:
+        raise PeriodOutOfRange(period)
+
+
+class MemoryLeaderboard:
+    """Sorted set: O(log n) search per update (plus a list shift), top K in O(K)"""
+
+    def __init__(self, scores: Optional[Dict[int, int]] = None):
+        self.scores: Dict[int, int] = dict(scores or {})
+        self.order: List[Tuple[int, int]] = sorted((-s, m) for m, s in self.scores.items())
+
+    def incr(self, member: int, by: int = 1) -> int:
+        old = self.scores.get(member)
+        if old is not None:
+            del self.order[bisect.bisect_left(self.order, (-old, member))]
+        new = (old or 0) + by
+        self.scores[member] = new
+        bisect.insort(self.order, (-new, member))
+        return new
+
+    def top(self, limit: int, offset: int = 0) -> List[Tuple[int, int]]:
+        return [(m, -s) for s, m in self.order[offset:offset + limit]]
+
+    def rank(self, member: int) -> Optional[int]:
+        """0-based position, None if the member has no appreciations"""
+        score = self.scores.get(member)
+        if score is None:
+            return None
+        return bisect.bisect_left(self.order, (-score, member))
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+
+def load_counts(period: str) -> Dict[str, Dict[int, int]]:
+    """{kind: {id: appreciations}} for a period, from rollup + raw tail"""
+    start, end = month_bounds(period)
+    creators: Dict[int, int] = {}
+    videos: Dict[int, int] = {}
+    db = SessionLocal()
+    try:
+        counts = month_token_counts(db, start, end)
+        for creator_id, video_id, tok_cnt in db.execute(
+            select(counts.c.creator_id, counts.c.video_id, counts.c.tok_cnt)
+        ):
+            creators[creator_id] = creators.get(creator_id, 0) + int(tok_cnt)
+            videos[video_id] = videos.get(video_id, 0) + int(tok_cnt)
+    finally:
+        db.close()
+    return {"creators": creators, "videos": videos}
+
+
+class MemoryBoards:
+    def __init__(self, max_periods: int = LEADERBOARD_MAX_PERIODS):
+        self.max_periods = max_periods
+        self._boards: "OrderedDict[str, Dict[str, MemoryLeaderboard]]" = OrderedDict()
+        self._deltas: Dict[str, List[Tuple[int, int]]] = {}  # period -> taps recorded during its rebuild
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+
+    def record(self, period: str, creator_id: int, video_id: int) -> None:
+        with self._lock:
+            delta = self._deltas.get(period)
+            if delta is not None:
+                delta.append((creator_id, video_id))
+            boards = self._boards.get(period)
+            if boards is None:
+                return  # not loaded yet; the rebuild on first read will count it
+            boards["creators"].incr(creator_id)
+            boards["videos"].incr(video_id)
+
+    def top(self, period: str, kind: str, limit: int, offset: int) -> List[Tuple[int, int]]:
+        with self._lock:
+            boards = self._boards.get(period)
+            if boards is not None:
+                self._boards.move_to_end(period)
+                return boards[kind].top(limit, offset)
+        self.rebuild(period, only_if_missing=True)
+        with self._lock:
+            boards = self._boards.get(period)
+            return boards[kind].top(limit, offset) if boards is not None else []
+
+    def rebuild(self, period: str, only_if_missing: bool = False) -> bool:
+        """False if skipped (only_if_missing and another caller already loaded it)"""
+        with self._rebuild_lock:
+            with self._lock:
+                if only_if_missing and period in self._boards:
+                    return False
+                self._deltas[period] = []
+            try:
+                counts = load_counts(period)
+            except Exception:
+                with self._lock:
+                    del self._deltas[period]
+                raise
+            boards = {kind: MemoryLeaderboard(scores) for kind, scores in counts.items()}
+            with self._lock:
+                for creator_id, video_id in self._deltas.pop(period):
+                    boards["creators"].incr(creator_id)
+                    boards["videos"].incr(video_id)
+                self._boards[period] = boards
+                self._boards.move_to_end(period)
+                current = current_period()
+                while len(self._boards) > self.max_periods:
+                    del self._boards[next(p for p in self._boards if p != current)]
+        return True
+
+    def loaded_periods(self) -> List[str]:
+        with self._lock:
+            return list(self._boards)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "periods": {p: {k: len(b) for k, b in boards.items()} for p, boards in self._boards.items()},
+            }
+
+
+# KEYS: creators, videos, creators:delta, videos:delta, lock, loaded; ARGV: creator_id, video_id, ttl
+_RECORD_LUA = """
+redis.call('ZINCRBY', KEYS[1], 1, ARGV[1])
+redis.call('ZINCRBY', KEYS[2], 1, ARGV[2])
+if redis.call('EXISTS', KEYS[5]) == 1 then
+  redis.call('ZINCRBY', KEYS[3], 1, ARGV[1])
+  redis.call('ZINCRBY', KEYS[4], 1, ARGV[2])
+  redis.call('EXPIRE', KEYS[3], ARGV[3])
+  redis.call('EXPIRE', KEYS[4], ARGV[3])
+end
+for i, key in ipairs({KEYS[1], KEYS[2], KEYS[6]}) do
+  redis.call('EXPIRE', key, ARGV[3])
+end
+return 1
+"""
+
+# KEYS: (board, rebuilt, delta) per kind, then lock, loaded; ARGV: lock token, ttl
+_SWAP_LUA = """
+local n = #KEYS - 2
+if redis.call('GET', KEYS[n + 1]) ~= ARGV[1] then
+  for i = 1, n, 3 do
+    redis.call('DEL', KEYS[i + 1])
+  end
+  return 0
+end
+for i = 1, n, 3 do
+  redis.call('ZUNIONSTORE', KEYS[i], 2, KEYS[i + 1], KEYS[i + 2])
+  redis.call('DEL', KEYS[i + 1], KEYS[i + 2])
+  redis.call('EXPIRE', KEYS[i], ARGV[2])
+end
+redis.call('SET', KEYS[n + 2], '1', 'EX', ARGV[2])
+redis.call('DEL', KEYS[n + 1])
+return 1
+"""
+
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisBoards:
+    def __init__(self, client, prefix: str = REDIS_PREFIX):
+        self.client = client
+        self.prefix = prefix
+        self._record = client.register_script(_RECORD_LUA)
+        self._swap = client.register_script(_SWAP_LUA)
+        self._release = client.register_script(_RELEASE_LUA)
+
+    def _key(self, period: str, kind: str) -> str:
+        return f"{self.prefix}{period}:{kind}"
+
+    def record(self, period: str, creator_id: int, video_id: int) -> None:
+        keys = [self._key(period, name) for name in
+                ("creators", "videos", "creators:delta", "videos:delta", "lock", "loaded")]
+        self._record(keys=keys, args=[creator_id, video_id, LEADERBOARD_TTL_S])
+
+    def top(self, period: str, kind: str, limit: int, offset: int) -> List[Tuple[int, int]]:
+        if not self.client.exists(self._key(period, "loaded")):
+            self.rebuild(period)  # no-op while another worker holds the lock
+        rows = self.client.zrevrange(self._key(period, kind), offset, offset + limit - 1, withscores=True)
+        return [(int(m), int(s)) for m, s in rows]
+
+    def rebuild(self, period: str) -> bool:
+        """False if another rebuild of the period holds the lock"""
+        token = uuid.uuid4().hex
+        lock = self._key(period, "lock")
+        if not self.client.set(lock, token, nx=True, ex=LEADERBOARD_REBUILD_LOCK_S):
+            return False
+        # record() adds to the delta keys from here on. Whatever they already hold
+        # (e.g. from a crashed rebuild) committed before load_counts() reads, so drop it.
+        self.client.delete(*(self._key(period, kind) + ":delta" for kind in KINDS))
+        try:
+            counts = load_counts(period)
+        except Exception:
+            self._release(keys=[lock], args=[token])
+            raise
+        keys = []
+        for kind in KINDS:
+            key, tmp = self._key(period, kind), self._key(period, kind) + ":rebuild"
+            self.client.delete(tmp)
+            items = list(counts[kind].items())
+            for i in range(0, len(items), REBUILD_CHUNK):
+                self.client.zadd(tmp, dict(items[i:i + REBUILD_CHUNK]))
+            keys += [key, tmp, key + ":delta"]
+        keys += [lock, self._key(period, "loaded")]
+        if not self._swap(keys=keys, args=[token, LEADERBOARD_TTL_S]):
+            logger.warning(f"leaderboard rebuild for {period} outlived its lock; discarded")
+            return False
+        return True
+
+    def loaded_periods(self) -> List[str]:
+        return []  # shared boards see every tap; nothing to refresh
+
+    def stats(self) -> dict:
+        period = current_period()
+        return {
+            "backend": "redis",
+            "current": {kind: self.client.zcard(self._key(period, kind)) for kind in KINDS},
+        }
+
+
+def _make_boards():
+    if LEADERBOARD_BACKEND == "redis":
+        client = get_redis()
+        if client is None:
+            raise RuntimeError("LEADERBOARD_BACKEND=redis but REDIS_URL is not set")
+        return RedisBoards(client)
+    return MemoryBoards()
+
+
+boards = _make_boards()
+
+
+def record_appreciation(creator_id: int, video_id: int) -> None:
+    """Call after the appreciation is committed"""
+    try:
+        boards.record(current_period(), creator_id, video_id)
+    except Exception as e:
+        metrics.incr("leaderboards.errors")
+        logger.warning(f"leaderboard update failed: {e}")
+
+
+def top(period: str, kind: str, limit: int = 10, offset: int = 0) -> List[Tuple[int, int]]:
+    """[(id, appreciations)] best first; ValueError / PeriodOutOfRange, see check_period()"""
+    check_period(period)
+    return boards.top(period, kind, limit, offset)
+
+
+def rebuild(period: str) -> bool:
+    """False if a rebuild of the period was already running"""
+    check_period(period)
+    rebuilt = boards.rebuild(period)
+    if rebuilt:
+        logger.info(f"leaderboards for {period} rebuilt")
+    return rebuilt
+
+
+def refresh_loaded() -> None:
+    """Background job: rebuild this worker's current-month boards so other workers' taps show up"""
+    period = current_period()
+    if period in boards.loaded_periods():
+        rebuild(period)
+
+
+def _stats() -> dict:
+    try:
+        return boards.stats()
+    except Exception as e:
+        return {"error": str(e)}
+
+
+metrics.register_collector("leaderboards", _stats)
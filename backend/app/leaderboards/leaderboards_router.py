@@ -0,0 +1,49 @@
+# app/leaderboards/leaderboards_router.py
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from app.auth.deps import require_admin as get_admin_user
+
+from . import boards
+from .schemas import LeaderboardEntryOut, LeaderboardOut
+
+router = APIRouter(prefix="/leaderboards", tags=["Leaderboards"])
+
+LEADERBOARD_PAGE_MAX = 100
+PERIOD_PATTERN = r"^\d{4}-\d{2}$"
+
+
+@router.get("/{period}", response_model=LeaderboardOut)
+def get_leaderboard(
+    period: str = Path(..., pattern=PERIOD_PATTERN, description="YYYY-MM"),
+    kind: str = Query("creators", pattern=r"^(creators|videos)$"),
+    limit: int = Query(10, ge=1, le=LEADERBOARD_PAGE_MAX),
+    offset: int = Query(0, ge=0),
+):
+    try:
+        rows = boards.top(period, kind, limit + 1, offset)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid period")
+    except boards.PeriodOutOfRange:
+        raise HTTPException(status_code=404, detail="no leaderboard for this period")
+    return LeaderboardOut(
+        period=period,
+        kind=kind,
+        entries=[
+            LeaderboardEntryOut(rank=offset + i + 1, id=member, appreciations=score)
+            for i, (member, score) in enumerate(rows[:limit])
+        ],
+        next_offset=offset + limit if len(rows) > limit else None,
+    )
+
+
+@router.post("/{period}/rebuild")
+def rebuild_leaderboard(
+    period: str = Path(..., pattern=PERIOD_PATTERN, description="YYYY-MM"),
+    _=Depends(get_admin_user),
+):
+    try:
+        rebuilt = boards.rebuild(period)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid period")
+    except boards.PeriodOutOfRange:
+        raise HTTPException(status_code=404, detail="no leaderboard for this period")
+    return {"ok": True, "period": period, "rebuilt": rebuilt}
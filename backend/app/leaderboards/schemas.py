@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class LeaderboardEntryOut(BaseModel):
+    rank: int  # 1-based
+    id: int  # creator_id or video_id, depending on kind
+    appreciations: int
+
+class LeaderboardOut(BaseModel):
+    period: str
+    kind: str
+    entries: List[LeaderboardEntryOut]
+    next_offset: Optional[int] = None
@@ -32,6 +32,15 @@ origins = [
     "*"
 ]
 
+# Replay stored responses for retried token-mutating requests (Idempotency-Key header).
+# Added before CORS so CORS stays outermost and replays get its headers too.
+from .middleware.idempotency import IdempotencyMiddleware
+app.add_middleware(IdempotencyMiddleware)
+
+# Token buckets per user / IP hash on abuse-prone routes; rejects before idempotency and the DB
+from .middleware.rate_limit import RateLimitMiddleware
+app.add_middleware(RateLimitMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -48,6 +57,19 @@ from .appreciations.appreciations_router import router as appreciations_router
 from .videos.video_routers import router as video_router
 from app.pools.pools_router import router as pools_router
 from .ads.ads_router import router as ads_router
+from .leaderboards.leaderboards_router import router as leaderboards_router
+from .analytics.analytics_router import router as analytics_router
+from .services import ai_status_hub, background
+from .services.view_counter import flush_views, VIEW_FLUSH_INTERVAL_S
+from .pools.rollups import refresh_token_rollup, ROLLUP_INTERVAL_S
+from .ads.sessions import sweep_expired_sessions, AD_SWEEP_INTERVAL_S
+from .ads.catalog import load_catalog
+from .appreciations import dedup as appreciation_dedup
+from .leaderboards.boards import refresh_loaded as refresh_leaderboards, LEADERBOARD_REFRESH_S
+from .videos import trending
+from .analytics.series import refresh_and_prune as refresh_appreciation_series, SERIES_INTERVAL_S
+from .services import outbox
+from .services.wallet_reset import reset_wallets, WALLET_RESET_AUTO, WALLET_RESET_INTERVAL_S
 
 # from database import events
 
@@ -58,6 +80,8 @@ app.include_router(appreciations_router)
 app.include_router(video_router)
 app.include_router(pools_router)
 app.include_router(ads_router)
+app.include_router(leaderboards_router)
+app.include_router(analytics_router)
 
 
 # Application startup event
@@ -70,10 +94,32 @@ def startup_event():
     # Create DB Tables
     create_tables()
     logging.info("Tables successfully created.")
+    # Ad catalog snapshot (reloaded on version change)
+    load_catalog()
+    # Bloom filter of (user, video) appreciations, filled in the background
+    appreciation_dedup.start_loading()
+    # Replay recent appreciations into the per-worker trending scores
+    trending.start_seeding()
+    # LISTEN for ai-status NOTIFYs from other workers (if enabled)
+    ai_status_hub.start_listener()
+    # Periodic jobs
+    background.register("view_flush", VIEW_FLUSH_INTERVAL_S, flush_views, run_on_stop=True)
+    background.register("token_rollup", ROLLUP_INTERVAL_S, refresh_token_rollup)
+    background.register("appreciation_series", SERIES_INTERVAL_S, refresh_appreciation_series)
+    background.register("ad_session_sweep", AD_SWEEP_INTERVAL_S, sweep_expired_sessions)
+    background.register("leaderboards", LEADERBOARD_REFRESH_S, refresh_leaderboards)
+    background.register("trending_prune", trending.TRENDING_PRUNE_INTERVAL_S, trending.prune)
+    background.register("outbox_relay", outbox.OUTBOX_RELAY_INTERVAL_S, outbox.relay, run_on_stop=True)
+    background.register("outbox_purge", outbox.OUTBOX_PURGE_INTERVAL_S, outbox.purge_published)
+    if WALLET_RESET_AUTO:
+        background.register("wallet_reset", WALLET_RESET_INTERVAL_S, reset_wallets)
+    background.start_all()
 
 @app.on_event("shutdown")
 def shutdown_event():
     logging.info("Application is shutting down.")
+    ai_status_hub.stop_listener()
+    background.stop_all()
 
 # @app.get("/tokens/balance")
 # def balance(user=Depends(get_current_user), db: Session = Depends(get_db)):
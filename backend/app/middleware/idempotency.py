@@ -0,0 +1,204 @@
+# app/middleware/idempotency.py
+"""
+Idempotency-Key support for the token-mutating endpoints.
+
+A request to one of IDEMPOTENT_ROUTES carrying an `Idempotency-Key` header
+is scoped to (user, method, path, key), where the user id comes from the
+bearer token (decoded and cached the way the rate limiter does it), so a
+retry after a token refresh still finds the first attempt. Then:
+
+  - a stored response for that scope is replayed as is, with
+    `Idempotent-Replayed: true` and without running the endpoint
+  - a duplicate arriving while the first request is still running waits for
+    it: in the same worker on its future, in another worker by polling the
+    in-progress marker for up to IDEMPOTENCY_WAIT_S (then 409)
+  - otherwise the request runs, and its response (anything but a 5xx) is
+    stored for IDEMPOTENCY_TTL_S in the cache backend (in memory, an LRU of
+    its own, so other cache traffic can't evict it)
+
+Reusing a key with a different request body is rejected with 422.
+
+A cache outage never fails a request: before the endpoint runs it is let
+through without idempotency, and after it ran the real response is returned
+even if it couldn't be stored (the error is logged). Backend calls run in the
+threadpool, so a slow Redis round trip doesn't hold up the event loop.
+"""
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import time
+from typing import Dict
+
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from ..services import metrics
+from ..services.cache import MISSING, get_backend
+from .rate_limit import TokenUsers, bearer_token
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL_S = float(os.getenv("IDEMPOTENCY_TTL_S", "86400"))
+IDEMPOTENCY_WAIT_S = float(os.getenv("IDEMPOTENCY_WAIT_S", "10"))
+# in-progress marker lifetime: a worker dying mid-request blocks the key at most this long
+IDEMPOTENCY_LOCK_S = float(os.getenv("IDEMPOTENCY_LOCK_S", "60"))
+IDEMPOTENCY_POLL_S = 0.05
+IDEMPOTENCY_MAX_KEY_LEN = 255
+
+IDEMPOTENT_ROUTES = {
+    ("POST", "/appreciations"),
+    ("POST", "/appreciations/topup"),
+    ("POST", "/ads/complete_ad_watch"),
+}
+
+_STORED_HEADERS = ("content-type",)
+_IN_PROGRESS = "in_progress"
+
+
+def _user_scope(request: Request, tokens: TokenUsers) -> str:
+    token = bearer_token(request.scope)
+    user_id = tokens.user_id(token) if token else None
+    if user_id is not None:
+        return f"user:{user_id}"
+    # no valid token: auth will reject the request, just keep it apart from everyone else's
+    return "auth:" + request.headers.get("authorization", "")
+
+
+def _cache_key(request: Request, key: str, tokens: TokenUsers) -> str:
+    scope = f"{_user_scope(request, tokens)}|{request.method}|{request.url.path}|{key}"
+    return "idem:" + hashlib.sha256(scope.encode()).hexdigest()
+
+
+def _replay(stored: dict) -> Response:
+    headers = dict(stored["headers"])
+    headers["Idempotent-Replayed"] = "true"
+    return Response(content=base64.b64decode(stored["body"]), status_code=stored["status"], headers=headers)
+
+
+def _retry_later(detail: str) -> Response:
+    return JSONResponse({"detail": detail}, status_code=409, headers={"Retry-After": "1"})
+
+
+class IdempotencyMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app):
+        super().__init__(app)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.tokens = TokenUsers()
+
+    async def dispatch(self, request: Request, call_next):
+        key = request.headers.get("idempotency-key")
+        if not key or (request.method, request.url.path.rstrip("/")) not in IDEMPOTENT_ROUTES:
+            return await call_next(request)
+        if len(key) > IDEMPOTENCY_MAX_KEY_LEN:
+            return JSONResponse({"detail": "Idempotency-Key too long"}, status_code=400)
+
+        body = await request.body()
+        # the query string is part of the request too (e.g. /appreciations/topup?id=)
+        fingerprint = hashlib.sha256(request.url.query.encode() + b"|" + body).hexdigest()
+        cache_key = _cache_key(request, key, self.tokens)
+        backend = get_backend("idempotency")
+
+        # same worker: join the in-flight request
+        fut = self._inflight.get(cache_key)
+        if fut is not None:
+            metrics.incr("idempotency.coalesced")
+            try:
+                stored = await asyncio.shield(fut)
+            except RuntimeError:
+                return _retry_later("the original request with this Idempotency-Key failed")
+            return self._answer(stored, fingerprint)
+
+        try:
+            stored = await run_in_threadpool(backend.get, cache_key)
+        except Exception:
+            return await call_next(request)  # cache outage: no idempotency, but no failure either
+        if stored is not MISSING:
+            if stored["state"] == _IN_PROGRESS:
+                # another worker is running it: wait for its response
+                stored = await self._wait_elsewhere(backend, cache_key)
+                if stored is None:
+                    return _retry_later("a request with this Idempotency-Key is still in progress")
+                metrics.incr("idempotency.coalesced")
+            return self._answer(stored, fingerprint)
+
+        try:
+            claimed = await run_in_threadpool(
+                backend.add, cache_key, {"state": _IN_PROGRESS, "fingerprint": fingerprint}, IDEMPOTENCY_LOCK_S
+            )
+        except Exception:
+            return await call_next(request)  # cache outage, as above
+        if not claimed:
+            # lost the race to another worker
+            stored = await self._wait_elsewhere(backend, cache_key)
+            if stored is None:
+                return _retry_later("a request with this Idempotency-Key is still in progress")
+            return self._answer(stored, fingerprint)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = fut
+        stored = None
+        try:
+            response = await call_next(request)
+            content = b"".join([chunk async for chunk in response.body_iterator])
+            stored = {
+                "state": "done",
+                "fingerprint": fingerprint,
+                "status": response.status_code,
+                "headers": {k: v for k, v in response.headers.items() if k.lower() in _STORED_HEADERS},
+                "body": base64.b64encode(content).decode(),
+            }
+            # the endpoint has committed by now: whatever the cache does, return its real response
+            try:
+                if response.status_code >= 500:
+                    await run_in_threadpool(backend.delete, cache_key)  # let the client retry for real
+                else:
+                    await run_in_threadpool(backend.set, cache_key, stored, IDEMPOTENCY_TTL_S)
+            except Exception as e:
+                metrics.incr("idempotency.store_errors")
+                logger.error(f"could not store idempotent response, a retry may run again: {e}")
+            return Response(
+                content=content,
+                status_code=response.status_code,
+                headers=dict(response.headers),
+                media_type=response.media_type,
+            )
+        except BaseException:
+            try:
+                await run_in_threadpool(backend.delete, cache_key)
+            except Exception as e:
+                logger.warning(f"could not clear idempotency marker (expires in {IDEMPOTENCY_LOCK_S:.0f}s): {e}")
+            raise
+        finally:
+            self._inflight.pop(cache_key, None)
+            if stored is not None:
+                fut.set_result(stored)
+            else:
+                fut.set_exception(RuntimeError("idempotent request failed"))
+                fut.exception()  # mark retrieved when nobody joined
+
+    def _answer(self, stored: dict, fingerprint: str) -> Response:
+        if stored["fingerprint"] != fingerprint:
+            return JSONResponse(
+                {"detail": "Idempotency-Key was already used with a different request"},
+                status_code=422,
+            )
+        metrics.incr("idempotency.replayed")
+        return _replay(stored)
+
+    async def _wait_elsewhere(self, backend, cache_key: str):
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_S
+        while time.monotonic() < deadline:
+            await asyncio.sleep(IDEMPOTENCY_POLL_S)
+            try:
+                stored = await run_in_threadpool(backend.get, cache_key)
+            except Exception:
+                return None  # cache outage: tell the client to retry
+            if stored is MISSING:
+                return None  # the other request failed; the client should retry
+            if stored["state"] != _IN_PROGRESS:
+                return stored
+        return None
@@ -0,0 +1,231 @@
+# app/middleware/rate_limit.py
+"""
+Token-bucket rate limiting in front of the abuse-prone routes.
+
+Each route in RATE_LIMIT_POLICIES has a bucket per client IP (keyed by a
+hash, so raw addresses are never stored) and, for authenticated routes, one
+per user id. The user id comes from the bearer token: its signature is
+checked once, then the result is cached by token string. A request is
+rejected with 429 and Retry-After as soon as any of its buckets is empty,
+before routing, auth dependencies or the DB get involved.
+
+Backends:
+  - memory (default): per-worker dict of [tokens, updated_at]
+  - redis (RATE_LIMIT_BACKEND=redis): one Lua script per bucket check,
+    shared by all workers
+
+The client IP is the connection's peer address. X-Forwarded-For is only
+used when RATE_LIMIT_TRUSTED_PROXIES says how many of our own proxies sit in
+front of the app. Each of them appends the address it saw, so the client is
+the N-th entry from the right; anything further left is client-supplied and
+ignored. Without that setting, a client could mint a new IP bucket per
+request just by sending a random header.
+
+If Redis errors, the request is let through (fail open) and counted as
+rate_limit.errors. Routes without a policy pay one dict lookup.
+`python -m scripts.bench_rate_limit` measures the added latency.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from ..services import metrics
+from ..storage.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory | redis
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "200000"))
+# reverse proxies in front of the app that append to X-Forwarded-For (0 = ignore the header)
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+TOKEN_CACHE_SIZE = 10000
+
+
+@dataclass(frozen=True)
+class Policy:
+    rate: float   # tokens added per second
+    burst: int    # bucket size
+
+
+# (method, path) -> {"user": Policy, "ip": Policy}
+RATE_LIMIT_POLICIES: Dict[Tuple[str, str], Dict[str, Policy]] = {
+    ("POST", "/appreciations"): {"user": Policy(rate=2, burst=20), "ip": Policy(rate=10, burst=50)},
+    ("POST", "/ads/start_ad_watch"): {"user": Policy(rate=0.2, burst=5), "ip": Policy(rate=2, burst=20)},
+    ("POST", "/auth/token"): {"ip": Policy(rate=0.2, burst=10)},
+}
+
+
+class MemoryBuckets:
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def take(self, key: str, policy: Policy, now: float) -> float:
+        """0 if a token was taken, else seconds until one is available"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(policy.burst), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(policy.burst, bucket[0] + (now - bucket[1]) * policy.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / policy.rate
+
+
+_TAKE_LUA = """
+local b = redis.call('HMGET', KEYS[1], 't', 'ts')
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens = tonumber(b[1]) or burst
+local ts = tonumber(b[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    def __init__(self, client, prefix: str = "rl:"):
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(_TAKE_LUA)
+
+    def take(self, key: str, policy: Policy, now: float) -> float:
+        return float(self._take(keys=[self.prefix + key], args=[policy.rate, policy.burst, now]))
+
+
+def _make_buckets():
+    if RATE_LIMIT_BACKEND == "redis":
+        client = get_redis()
+        if client is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis but REDIS_URL is not set")
+        return RedisBuckets(client)
+    return MemoryBuckets()
+
+
+def client_ip(scope, trusted_proxies: int = RATE_LIMIT_TRUSTED_PROXIES) -> str:
+    """Peer address, or the right-most X-Forwarded-For hop our trusted proxies vouch for"""
+    if trusted_proxies > 0:
+        hops = []
+        for name, value in scope.get("headers") or ():
+            if name == b"x-forwarded-for":
+                hops.extend(h.strip() for h in value.decode("latin-1").split(","))
+        hops = [h for h in hops if h]
+        if len(hops) >= trusted_proxies:
+            return hops[-trusted_proxies]
+        # shorter chain than our proxies would produce: don't trust any of it
+    client = scope.get("client")
+    return client[0] if client else "0.0.0.0"
+
+
+def _ip_hash(scope) -> str:
+    return hashlib.blake2b(client_ip(scope).encode(), digest_size=8).hexdigest()
+
+
+class TokenUsers:
+    """bearer token -> user id (signature checked once per token), bounded LRU"""
+
+    def __init__(self, size: int = TOKEN_CACHE_SIZE):
+        self.size = size
+        self._cache: "OrderedDict[str, Tuple[Optional[int], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def user_id(self, token: str) -> Optional[int]:
+        now = time.time()
+        with self._lock:
+            hit = self._cache.get(token)
+            if hit is not None and hit[1] > now:
+                return hit[0]
+        try:
+            from jose import jwt
+            from ..auth.auth_utils import ALGORITHM, SECRET_KEY
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            user_id, expires = claims.get("id"), float(claims.get("exp", now + 60))
+        except Exception:
+            user_id, expires = None, now + 60  # bad token: IP bucket only; auth will reject it
+        with self._lock:
+            self._cache[token] = (user_id, expires)
+            if len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+        return user_id
+
+
+def bearer_token(scope) -> Optional[str]:
+    for name, value in scope.get("headers") or ():
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token if scheme.lower() == "bearer" and token else None
+    return None
+
+
+class RateLimitMiddleware:
+    """Pure ASGI, so a limited route costs a few dict operations, not a Request object"""
+
+    def __init__(self, app, policies: Optional[Dict[Tuple[str, str], Dict[str, Policy]]] = None, buckets=None):
+        self.app = app
+        self.policies = RATE_LIMIT_POLICIES if policies is None else policies
+        self.buckets = buckets if buckets is not None else _make_buckets()
+        self.tokens = TokenUsers()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            return await self.app(scope, receive, send)
+        route = (scope["method"], scope["path"].rstrip("/") or "/")
+        policy = self.policies.get(route)
+        if policy is None:
+            return await self.app(scope, receive, send)
+
+        checks = []
+        if "ip" in policy:
+            checks.append((f"ip:{_ip_hash(scope)}:{route[1]}", policy["ip"]))
+        if "user" in policy:
+            token = bearer_token(scope)
+            user_id = self.tokens.user_id(token) if token else None
+            if user_id is not None:
+                checks.append((f"user:{user_id}:{route[1]}", policy["user"]))
+
+        now = time.time()
+        wait = 0.0
+        try:
+            for key, p in checks:
+                wait = max(wait, self.buckets.take(key, p, now))
+        except Exception as e:
+            metrics.incr("rate_limit.errors")
+            logger.warning(f"rate limiter unavailable, letting request through: {e}")
+            wait = 0.0
+
+        if wait > 0:
+            metrics.incr("rate_limit.rejected")
+            return await _reject(send, wait)
+        return await self.app(scope, receive, send)
+
+
+async def _reject(send, wait: float) -> None:
+    body = json.dumps({"detail": "rate limit exceeded"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(wait))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
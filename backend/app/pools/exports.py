@@ -0,0 +1,210 @@
+# app/pools/exports.py
+"""
+Constant-memory exports of a pool's shares.
+
+  - csv:     Postgres `COPY (...) TO STDOUT` in a worker thread, handed to the
+             response through a small bounded queue
+  - arrow:   Arrow IPC stream, one record batch per server-side cursor batch
+  - parquet: one row group per server-side cursor batch
+
+Rows go straight from the database cursor into the response body, without
+building a PoolSummaryOut first. If the client disconnects, the COPY is
+aborted and its connection returned to the pool.
+"""
+import queue
+import threading
+from typing import Iterator
+
+from sqlalchemy import text
+
+from database.session import engine
+
+EXPORT_BATCH_ROWS = 50_000
+COPY_CHUNK_BYTES = 64 * 1024
+COPY_QUEUE_CHUNKS = 16  # at most ~1 MiB buffered between COPY and the client
+
+EXPORT_COLUMNS = ("creator_id", "token_count", "effective_tokens", "share_pct", "payout_amount")
+
+# ordered like the JSON summary; served by ix_pool_shares_pool_payout once it exists
+_SHARES_SQL = """
+    SELECT creator_id, token_count, effective_tokens, share_pct, payout_amount
+    FROM pool_shares WHERE pool_id = :pool_id
+    ORDER BY payout_amount DESC, id
+"""
+
+# same formatting as the old f-string CSV (6 / 6 / 2 decimals)
+_CSV_COPY_SQL = """
+    COPY (
+        SELECT creator_id, token_count,
+               round(effective_tokens::numeric, 6) AS effective_tokens,
+               round(share_pct::numeric, 6) AS share_pct,
+               round(payout_amount::numeric, 2) AS payout_amount
+        FROM pool_shares WHERE pool_id = %(pool_id)s
+        ORDER BY payout_amount DESC, id
+    ) TO STDOUT WITH (FORMAT csv, HEADER)
+"""
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXTENSIONS = {"csv": "csv", "arrow": "arrows", "parquet": "parquet"}
+
+
+class _ExportCancelled(Exception):
+    pass
+
+
+class _QueueWriter:
+    """File-like target for copy_expert: batches rows into chunks on a bounded queue"""
+
+    def __init__(self, q: queue.Queue, cancelled: threading.Event):
+        self.q = q
+        self.cancelled = cancelled
+        self.buf = bytearray()
+
+    def _put(self, item):
+        while True:
+            if self.cancelled.is_set():
+                raise _ExportCancelled()
+            try:
+                self.q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def write(self, data):
+        self.buf += data.encode() if isinstance(data, str) else data
+        if len(self.buf) >= COPY_CHUNK_BYTES:
+            self.flush()
+
+    def flush(self):
+        if self.buf:
+            self._put(bytes(self.buf))
+            self.buf = bytearray()
+
+
+def stream_csv(pool_id: int) -> Iterator[bytes]:
+    q: queue.Queue = queue.Queue(maxsize=COPY_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    done = object()
+
+    def produce():
+        raw = engine.raw_connection()
+        writer = _QueueWriter(q, cancelled)
+        try:
+            cur = raw.cursor()
+            cur.copy_expert(cur.mogrify(_CSV_COPY_SQL, {"pool_id": pool_id}).decode(), writer)
+            writer.flush()
+            raw.rollback()
+        except _ExportCancelled:
+            raw.rollback()
+            return
+        except Exception as e:
+            raw.rollback()
+            try:
+                writer._put(e)
+            except _ExportCancelled:
+                pass
+            return
+        finally:
+            raw.close()
+        writer._put(done)
+
+    threading.Thread(target=produce, name=f"csv-export-{pool_id}", daemon=True).start()
+    try:
+        while True:
+            item = q.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+
+
+class _ChunkSink:
+    """Write-only file object pyarrow writes into; drained after every batch"""
+
+    def __init__(self):
+        self.chunks = []
+        self.pos = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out = b"".join(self.chunks)
+        self.chunks.clear()
+        return out
+
+
+def _iter_batches(pool_id: int):
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=EXPORT_BATCH_ROWS).execute(
+            text(_SHARES_SQL), {"pool_id": pool_id}
+        )
+        for rows in result.partitions(EXPORT_BATCH_ROWS):
+            yield rows
+
+
+def stream_arrow(pool_id: int, fmt: str) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("creator_id", pa.int64()),
+        ("token_count", pa.int64()),
+        ("effective_tokens", pa.float64()),
+        ("share_pct", pa.float64()),
+        ("payout_amount", pa.float64()),
+    ])
+    sink = _ChunkSink()
+    stream = pa.PythonFile(sink, mode="w")
+    writer = pa.ipc.new_stream(stream, schema) if fmt == "arrow" else pq.ParquetWriter(stream, schema)
+    try:
+        for rows in _iter_batches(pool_id):
+            columns = list(zip(*rows))
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema,
+            )
+            if fmt == "arrow":
+                writer.write_batch(batch)
+            else:
+                writer.write_table(pa.Table.from_batches([batch]))
+            yield sink.drain()
+    finally:
+        writer.close()
+    tail = sink.drain()
+    if tail:
+        yield tail
+
+
+def stream_shares(pool_id: int, fmt: str) -> Iterator[bytes]:
+    if fmt == "csv":
+        return stream_csv(pool_id)
+    return stream_arrow(pool_id, fmt)
+
+
+def arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
@@ -0,0 +1,171 @@
+# app/pools/projection.py
+"""
+Live (provisional) pool shares for an open month.
+
+Each worker keeps a snapshot per period built from the daily rollup: absolute
+token counts per (day, video), the video's multiplier, and running
+tok/eff totals per creator. A refresh (at most every PROJECTION_TTL_S) only
+reads rollup rows whose updated_at moved since the last one and applies the
+difference to the affected creators. The raw tail above the rollup watermark
+is small and re-read in full. Both reads happen in one REPEATABLE READ
+snapshot, so a concurrent rollup run can't be counted twice.
+
+Counts are stored as absolute values, which makes re-reading a row harmless.
+Each refresh therefore looks back PROJECTION_LOOKBACK_S to catch rows from
+transactions that committed late. Multipliers (CompensationRule and
+VideoAIScore) are re-read by a full rebuild when the rule changes or every
+PROJECTION_REBUILD_S.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from database.session import engine
+from database import models
+from .rollups import get_watermark
+from .settlement import month_bounds, resolve_multipliers, video_multiplier
+
+PROJECTION_TTL_S = float(os.getenv("PROJECTION_TTL_S", "5"))
+PROJECTION_REBUILD_S = float(os.getenv("PROJECTION_REBUILD_S", "600"))
+PROJECTION_LOOKBACK_S = float(os.getenv("PROJECTION_LOOKBACK_S", "300"))
+MAX_PERIODS = 12
+
+
+class PeriodProjection:
+    def __init__(self, period: str, human_mul: float, ai_mul: float):
+        self.period = period
+        self.multipliers = (human_mul, ai_mul)
+        self.rolled: Dict[Tuple, int] = {}          # (day, video_id) -> tok_cnt
+        self.tail: Dict[int, int] = {}              # video_id -> tok_cnt above the watermark
+        self.video_info: Dict[int, Tuple[int, float]] = {}  # video_id -> (creator_id, multiplier)
+        self.creators: Dict[int, List[float]] = {}  # creator_id -> [tok, eff]
+        self.total_effective = 0.0
+        self.last_seen: Optional[datetime] = None
+        self.refreshed_at = 0.0
+        self.built_at = time.monotonic()
+        self._ranked: Optional[List[int]] = None
+        self.lock = threading.RLock()
+
+    def _apply(self, video_id: int, delta: int) -> None:
+        if not delta:
+            return
+        creator_id, mult = self.video_info[video_id]
+        agg = self.creators.setdefault(creator_id, [0, 0.0])
+        agg[0] += delta
+        agg[1] += delta * mult
+        self.total_effective += delta * mult
+        if agg[0] <= 0:
+            self.creators.pop(creator_id, None)
+        self._ranked = None
+
+    def refresh(self) -> None:
+        start, end = month_bounds(self.period)
+        R = models.TokenDailyRollup
+        T = models.AppreciationToken
+        S = models.VideoAIScore
+        mult = video_multiplier(*self.multipliers).label("mult")
+
+        with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn:
+            since = self.last_seen - timedelta(seconds=PROJECTION_LOOKBACK_S) if self.last_seen else None
+            q = (
+                select(R.day, R.video_id, R.creator_id, R.tok_cnt, R.updated_at, mult)
+                .select_from(R.__table__.outerjoin(S.__table__, S.video_id == R.video_id))
+                .where(R.day >= start.date(), R.day < end.date())
+            )
+            if since is not None:
+                q = q.where(R.updated_at > since)
+            changed = conn.execute(q).all()
+
+            watermark = get_watermark(conn)
+            tail_rows = conn.execute(
+                select(T.video_id, models.Video.creator_id, func.count(T.token_id), mult)
+                .select_from(
+                    T.__table__
+                    .join(models.Video.__table__, models.Video.id == T.video_id)
+                    .outerjoin(S.__table__, S.video_id == T.video_id)
+                )
+                .where(
+                    T.token_id > watermark,
+                    T.used_at >= start,
+                    T.used_at < end,
+                    models.Video.creator_id.isnot(None),
+                )
+                .group_by(T.video_id, models.Video.creator_id, S.human_prob, S.ai_prob)
+            ).all()
+
+        for r in changed:
+            self.video_info.setdefault(r.video_id, (r.creator_id, float(r.mult)))
+            key = (r.day, r.video_id)
+            old = self.rolled.get(key, 0)
+            self.rolled[key] = r.tok_cnt
+            self._apply(r.video_id, r.tok_cnt - old)
+            if self.last_seen is None or r.updated_at > self.last_seen:
+                self.last_seen = r.updated_at
+
+        new_tail = {}
+        for video_id, creator_id, cnt, m in tail_rows:
+            self.video_info.setdefault(video_id, (creator_id, float(m)))
+            new_tail[video_id] = cnt
+        for video_id in set(self.tail) | set(new_tail):
+            self._apply(video_id, new_tail.get(video_id, 0) - self.tail.get(video_id, 0))
+        self.tail = new_tail
+        self.refreshed_at = time.monotonic()
+
+    def ranked(self) -> List[int]:
+        if self._ranked is None:
+            self._ranked = sorted(self.creators, key=lambda c: (-self.creators[c][1], c))
+        return self._ranked
+
+    def share(self, creator_id: int, base_amount: Optional[float]) -> dict:
+        with self.lock:
+            tok, eff = self.creators.get(creator_id, (0, 0.0))
+            total = self.total_effective
+        share_pct = (eff / total) if total > 0 else 0.0
+        return {
+            "creator_id": creator_id,
+            "token_count": int(tok),
+            "effective_tokens": eff,
+            "share_pct": share_pct,
+            "projected_payout": round(base_amount * share_pct, 2) if base_amount is not None else None,
+        }
+
+    def page(self, offset: int, limit: int, base_amount: Optional[float]) -> Tuple[List[dict], int]:
+        """Creators ranked by effective tokens; returns (shares, total creators)"""
+        with self.lock:
+            ranked = self.ranked()
+            return [self.share(c, base_amount) for c in ranked[offset:offset + limit]], len(ranked)
+
+
+_projections: "OrderedDict[str, PeriodProjection]" = OrderedDict()
+_projections_lock = threading.Lock()
+
+
+def get_projection(db: Session, period: str) -> PeriodProjection:
+    """Snapshot for the period, refreshed if older than the TTL"""
+    human_mul, ai_mul = resolve_multipliers(db, period)
+    with _projections_lock:
+        proj = _projections.get(period)
+        stale_rules = proj is not None and proj.multipliers != (human_mul, ai_mul)
+        too_old = proj is not None and time.monotonic() - proj.built_at > PROJECTION_REBUILD_S
+        if proj is None or stale_rules or too_old:
+            proj = PeriodProjection(period, human_mul, ai_mul)
+            _projections[period] = proj
+        _projections.move_to_end(period)
+        while len(_projections) > MAX_PERIODS:
+            _projections.popitem(last=False)
+
+    with proj.lock:
+        if time.monotonic() - proj.refreshed_at > PROJECTION_TTL_S:
+            proj.refresh()
+    return proj
+
+
+def as_of(proj: PeriodProjection) -> datetime:
+    age = time.monotonic() - proj.refreshed_at
+    return datetime.now(tz=timezone.utc) - timedelta(seconds=age)
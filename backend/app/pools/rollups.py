@@ -0,0 +1,201 @@
+# app/pools/rollups.py
+"""
+Daily appreciation-token rollup: token_daily_rollup(day, creator_id, video_id, tok_cnt).
+
+refresh_token_rollup() folds new appreciation_tokens rows into the rollup,
+using a token_id watermark kept in job_watermarks. It only advances past
+tokens older than ROLLUP_LAG_S. A token whose transaction is still open can
+therefore not be skipped, as long as no appreciate transaction runs longer
+than the lag. Tokens above the watermark are the "tail": settlement and
+projections read the rollup for a month and add the tail from the raw table,
+so results are exact without scanning every raw row. The watermark has to be
+read in the same statement as the rollup rows it splits (see month_token_counts).
+
+check_rollup() compares a month of rollup against the raw table, up to the
+watermark. rebuild_rollup() recomputes a month from scratch, e.g. after
+tokens were deleted.
+"""
+import logging
+import os
+from datetime import datetime
+from typing import Tuple
+
+from sqlalchemy import func, select, text, union_all
+from sqlalchemy.orm import Session
+
+from database.session import engine
+from database import models
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_JOB = "token_daily_rollup"
+ROLLUP_LAG_S = int(os.getenv("ROLLUP_LAG_S", "60"))
+ROLLUP_BATCH = int(os.getenv("ROLLUP_BATCH", "500000"))  # tokens per transaction
+ROLLUP_INTERVAL_S = float(os.getenv("ROLLUP_INTERVAL_S", "60"))
+
+_UPSERT_SQL = """
+    INSERT INTO token_daily_rollup (day, creator_id, video_id, tok_cnt, updated_at)
+    SELECT (t.used_at AT TIME ZONE 'UTC')::date, v.creator_id, t.video_id, count(*), now()
+    FROM appreciation_tokens t
+    JOIN videos v ON v.id = t.video_id
+    WHERE t.token_id > :lo AND t.token_id <= :hi AND v.creator_id IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, creator_id, video_id)
+    DO UPDATE SET tok_cnt = token_daily_rollup.tok_cnt + EXCLUDED.tok_cnt, updated_at = now()
+"""
+
+
+def get_watermark(db, name: str = ROLLUP_JOB) -> int:
+    """db: Session or Connection"""
+    return db.execute(
+        text("SELECT last_id FROM job_watermarks WHERE name = :name"), {"name": name}
+    ).scalar() or 0
+
+
+def settled_token_id(conn, lo: int, lag: float = ROLLUP_LAG_S) -> int:
+    """Highest token id such that every token up to it is older than `lag` seconds"""
+    return conn.execute(text("""
+        SELECT COALESCE(
+            (SELECT min(token_id) - 1 FROM appreciation_tokens
+             WHERE token_id > :lo AND used_at >= now() - make_interval(secs => :lag)),
+            (SELECT max(token_id) FROM appreciation_tokens),
+            :lo)
+    """), {"lo": lo, "lag": lag}).scalar()
+
+
+def refresh_token_rollup() -> int:
+    """Apply tokens above the watermark; returns how many token ids were covered"""
+    covered = 0
+    while True:
+        with engine.begin() as conn:
+            # one runner at a time across workers; others just skip this round
+            if not conn.execute(text("SELECT pg_try_advisory_xact_lock(hashtext(:job))"), {"job": ROLLUP_JOB}).scalar():
+                return covered
+            conn.execute(
+                text("INSERT INTO job_watermarks (name, last_id) VALUES (:name, 0) ON CONFLICT (name) DO NOTHING"),
+                {"name": ROLLUP_JOB},
+            )
+            lo = get_watermark(conn)
+            hi = min(settled_token_id(conn, lo), lo + ROLLUP_BATCH)
+            if hi <= lo:
+                return covered
+            conn.execute(text(_UPSERT_SQL), {"lo": lo, "hi": hi})
+            conn.execute(
+                text("UPDATE job_watermarks SET last_id = :hi, updated_at = now() WHERE name = :name"),
+                {"hi": hi, "name": ROLLUP_JOB},
+            )
+        covered += hi - lo
+        logger.info(f"token rollup advanced {lo} -> {hi}")
+
+
+def month_token_counts(db: Session, start: datetime, end: datetime):
+    """
+    Subquery of (creator_id, video_id, tok_cnt) for tokens used in [start, end):
+    rollup days of the month + the raw tail above the watermark.
+
+    The watermark is a scalar subquery, so it is read in the same statement
+    (and snapshot) as the rollup rows. Reading it up front would let a refresh
+    that commits in between count its tokens twice under READ COMMITTED.
+    """
+    R = models.TokenDailyRollup
+    T = models.AppreciationToken
+    W = models.JobWatermark
+    watermark = func.coalesce(
+        select(W.last_id).where(W.name == ROLLUP_JOB).scalar_subquery(), 0
+    )
+
+    rolled = select(R.creator_id, R.video_id, R.tok_cnt.label("tok_cnt")).where(
+        R.day >= start.date(), R.day < end.date()
+    )
+    tail = (
+        select(
+            models.Video.creator_id,
+            T.video_id,
+            func.count(T.token_id).label("tok_cnt"),
+        )
+        .join(models.Video, models.Video.id == T.video_id)
+        .where(
+            T.token_id > watermark,
+            T.used_at >= start,
+            T.used_at < end,
+            models.Video.creator_id.isnot(None),
+        )
+        .group_by(models.Video.creator_id, T.video_id)
+    )
+    both = union_all(rolled, tail).subquery()
+    return (
+        select(
+            both.c.creator_id.label("creator_id"),
+            both.c.video_id.label("video_id"),
+            func.sum(both.c.tok_cnt).label("tok_cnt"),
+        )
+        .group_by(both.c.creator_id, both.c.video_id)
+        .subquery()
+    )
+
+
+def _month_days(start: datetime, end: datetime) -> Tuple:
+    return start.date(), end.date()
+
+
+def check_rollup(db: Session, start: datetime, end: datetime, limit: int = 100) -> dict:
+    """Rows where rollup and raw counts disagree (raw limited to the watermark)"""
+    watermark = get_watermark(db)
+    first_day, end_day = _month_days(start, end)
+    rows = db.execute(text("""
+        WITH raw AS (
+            SELECT (t.used_at AT TIME ZONE 'UTC')::date AS day, v.creator_id, t.video_id, count(*) AS cnt
+            FROM appreciation_tokens t
+            JOIN videos v ON v.id = t.video_id
+            WHERE t.used_at >= :start AND t.used_at < :end
+              AND t.token_id <= :wm AND v.creator_id IS NOT NULL
+            GROUP BY 1, 2, 3
+        ), roll AS (
+            SELECT day, creator_id, video_id, tok_cnt AS cnt
+            FROM token_daily_rollup
+            WHERE day >= :first_day AND day < :end_day
+        )
+        SELECT day, creator_id, video_id, raw.cnt AS raw_cnt, roll.cnt AS rollup_cnt
+        FROM raw FULL OUTER JOIN roll USING (day, creator_id, video_id)
+        WHERE raw.cnt IS DISTINCT FROM roll.cnt
+        ORDER BY day, creator_id, video_id
+        LIMIT :limit
+    """), {
+        "start": start, "end": end, "wm": watermark,
+        "first_day": first_day, "end_day": end_day, "limit": limit,
+    }).all()
+    return {
+        "watermark": watermark,
+        "ok": not rows,
+        "mismatches": [
+            {
+                "day": r.day.isoformat(),
+                "creator_id": r.creator_id,
+                "video_id": r.video_id,
+                "raw_count": r.raw_cnt or 0,
+                "rollup_count": r.rollup_cnt or 0,
+            }
+            for r in rows
+        ],
+    }
+
+
+def rebuild_rollup(start: datetime, end: datetime) -> None:
+    """Recompute the month's rollup rows from the raw table (up to the watermark)"""
+    first_day, end_day = _month_days(start, end)
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:job))"), {"job": ROLLUP_JOB})
+        watermark = get_watermark(conn)
+        conn.execute(
+            text("DELETE FROM token_daily_rollup WHERE day >= :first_day AND day < :end_day"),
+            {"first_day": first_day, "end_day": end_day},
+        )
+        conn.execute(text("""
+            INSERT INTO token_daily_rollup (day, creator_id, video_id, tok_cnt, updated_at)
+            SELECT (t.used_at AT TIME ZONE 'UTC')::date, v.creator_id, t.video_id, count(*), now()
+            FROM appreciation_tokens t
+            JOIN videos v ON v.id = t.video_id
+            WHERE t.used_at >= :start AND t.used_at < :end
+              AND t.token_id <= :wm AND v.creator_id IS NOT NULL
+            GROUP BY 1, 2, 3
+        """), {"start": start, "end": end, "wm": watermark})
@@ -0,0 +1,73 @@
+# app/pools/rules.py
+"""
+Process-local cache of CompensationRule rows by period.
+
+Rules change almost never, so every worker keeps them in a dict, including
+"no rule" answers for periods that fall back to the defaults. upsert_rule
+bumps the "compensation_rules" version stamp in its transaction and calls
+invalidate() after the commit. Other workers see the new stamp within
+VERSION_CHECK_S and drop their dict.
+"""
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from database import models
+from ..services import versions
+
+RULES_VERSION = "compensation_rules"
+
+_rules: Dict[str, Optional[dict]] = {}
+_rules_version: Optional[int] = None
+_lock = threading.Lock()
+
+
+def load_rule(db: Session, period: str) -> Optional[dict]:
+    rule = (
+        db.query(models.CompensationRule)
+        .filter(models.CompensationRule.period == period)
+        .one_or_none()
+    )
+    if rule is None:
+        return None
+    return {
+        "id": rule.id,
+        "period": rule.period,
+        "human_multiplier": rule.human_multiplier,
+        "ai_multiplier": rule.ai_multiplier,
+        "dpv_base": rule.dpv_base,
+    }
+
+
+def get_rule(db: Session, period: str) -> Optional[dict]:
+    """The period's rule as a dict, or None if it has none"""
+    global _rules_version
+    # read the stamp before the row, so a rule committed in between is caught next time
+    version = versions.current(RULES_VERSION)
+    with _lock:
+        if version != _rules_version:
+            _rules.clear()
+            _rules_version = version
+        elif period in _rules:
+            return _rules[period]
+
+    rule = load_rule(db, period)
+    with _lock:
+        if _rules_version == version:
+            _rules[period] = rule
+    return rule
+
+
+def bump_rules_version(db: Session) -> None:
+    """Call in the transaction that changes a rule"""
+    versions.bump(db, RULES_VERSION)
+
+
+def invalidate() -> None:
+    """Call after that transaction commits"""
+    global _rules_version
+    versions.forget(RULES_VERSION)
+    with _lock:
+        _rules.clear()
+        _rules_version = None
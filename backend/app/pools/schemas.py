@@ -1,5 +1,6 @@
 # app/pools/schemas.py
 from pydantic import BaseModel, Field
+from datetime import datetime
 from typing import List, Optional
 
 class CompensationRuleIn(BaseModel):
@@ -24,8 +25,24 @@ class PoolSummaryOut(BaseModel):
     base_amount: float
     total_effective_tokens: float
     shares: List[PoolShareOut]
+    next_cursor: Optional[str] = None  # pass as ?cursor= for the next page
 
 class CloseAndSettleIn(BaseModel):
     period: str = Field(..., pattern=r"^\d{4}-\d{2}$", description="YYYY-MM")
     base_amount: float = Field(..., ge=0, description="Total $ pool amount for the month")
     force_recompute: bool = False  # if True, recompute & overwrite existing settlement (admin-only)
+
+class ProjectionShareOut(BaseModel):
+    creator_id: int
+    token_count: int
+    effective_tokens: float
+    share_pct: float
+    projected_payout: Optional[float] = None  # only when base_amount is given
+
+class PoolProjectionOut(BaseModel):
+    period: str
+    as_of: datetime
+    total_effective_tokens: float
+    total_creators: int
+    shares: List[ProjectionShareOut]
+    next_offset: Optional[int] = None
@@ -0,0 +1,211 @@
+# app/pools/settlement.py
+"""
+Set-based pool settlement.
+
+The whole computation -- per-video multiplier (CASE on VideoAIScore),
+effective tokens per creator, share_pct and payout -- runs inside Postgres
+and lands in pool_shares through one INSERT ... SELECT, so no per-creator
+rows ever pass through Python. The token counts, including the rollup
+watermark they split on, are read by that statement alone, so a rollup
+refresh committing mid-settlement can't count tokens twice
+(scripts/check_settlement_race.py checks this against a database).
+
+Settling a period is serialised by a transaction-scoped advisory lock
+(lock_period). resettle_period() deletes the old pool and inserts the new
+one in the same transaction, so readers see either the old shares or the
+new ones, never an empty pool.
+
+close_period() is what close-and-settle calls. Within one worker, concurrent
+calls for a period share a single computation; across workers, whoever gets
+the lock second sees the pool the first one just committed and returns it.
+"""
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+
+from sqlalchemy import Float, Integer, Numeric, and_, case, cast, func, insert, literal, select, text, update
+from sqlalchemy.orm import Session
+
+from database import models
+from ..services.outbox import emit
+from .rollups import month_token_counts
+from .rules import get_rule, load_rule
+
+DEFAULT_HUMAN_MULTIPLIER = 1.2
+DEFAULT_AI_MULTIPLIER = 0.7
+
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def month_bounds(period: str) -> Tuple[datetime, datetime]:
+    """period: 'YYYY-MM' -> (month_start_utc, month_end_utc)"""
+    dt = datetime.strptime(period, "%Y-%m")
+    # naive -> UTC
+    start = datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+    if dt.month == 12:
+        end = datetime(dt.year + 1, 1, 1, tzinfo=timezone.utc)
+    else:
+        end = datetime(dt.year, dt.month + 1, 1, tzinfo=timezone.utc)
+    return start, end
+
+
+def resolve_multipliers(db: Session, period: str, fresh: bool = False) -> Tuple[float, float]:
+    """
+    (human_multiplier, ai_multiplier) for the period, or the defaults.
+    fresh=True skips the rules cache (whose view of other workers' edits
+    may be up to VERSION_CHECK_S old).
+    """
+    rule = load_rule(db, period) if fresh else get_rule(db, period)
+    human_mul = rule["human_multiplier"] if rule else DEFAULT_HUMAN_MULTIPLIER
+    ai_mul = rule["ai_multiplier"] if rule else DEFAULT_AI_MULTIPLIER
+    return human_mul, ai_mul
+
+
+def video_multiplier(human_mul: float, ai_mul: float):
+    """
+    SQL expression: human or AI multiplier by the more likely class,
+    1.0 when the video has no score row
+    """
+    S = models.VideoAIScore
+    return case(
+        (
+            and_(S.human_prob.isnot(None), S.ai_prob.isnot(None)),
+            case((S.human_prob >= S.ai_prob, literal(human_mul)), else_=literal(ai_mul)),
+        ),
+        else_=literal(1.0),
+    )
+
+
+def creator_totals(db: Session, period: str, human_mul: float, ai_mul: float):
+    """Subquery: (creator_id, tok, eff) for the period"""
+    start, end = month_bounds(period)
+    counts = month_token_counts(db, start, end)
+    S = models.VideoAIScore
+    return (
+        select(
+            counts.c.creator_id.label("creator_id"),
+            func.sum(counts.c.tok_cnt).label("tok"),
+            func.sum(counts.c.tok_cnt * video_multiplier(human_mul, ai_mul)).label("eff"),
+        )
+        .select_from(counts.outerjoin(S, S.video_id == counts.c.video_id))
+        .group_by(counts.c.creator_id)
+        .subquery()
+    )
+
+
+def settle_period(db: Session, period: str, base_amount: float) -> int:
+    """
+    Insert a settled Pool for `period` plus all of its PoolShares.
+    Runs in the caller's transaction (no commit); returns the new pool id.
+    """
+    # payouts are final, so read the rule itself rather than the cache
+    human_mul, ai_mul = resolve_multipliers(db, period, fresh=True)
+    totals = creator_totals(db, period, human_mul, ai_mul)
+
+    pool = models.Pool(
+        period_month=period,
+        base_amount=base_amount,
+        settled=True,
+        settled_at=datetime.now(tz=timezone.utc),
+        total_effective_tokens=0.0,
+    )
+    db.add(pool)
+    db.flush()  # get pool.id
+
+    grand_total = func.sum(totals.c.eff).over()
+    share_pct = case((grand_total > 0, totals.c.eff / grand_total), else_=literal(0.0))
+    shares = select(
+        literal(pool.id),
+        totals.c.creator_id,
+        cast(totals.c.tok, Integer),
+        totals.c.eff,
+        share_pct,
+        cast(func.round(cast(literal(base_amount) * share_pct, Numeric), 2), Float),
+    )
+    db.execute(
+        insert(models.PoolShare).from_select(
+            ["pool_id", "creator_id", "token_count", "effective_tokens", "share_pct", "payout_amount"],
+            shares,
+        )
+    )
+
+    total_effective = (
+        select(func.coalesce(func.sum(models.PoolShare.effective_tokens), 0.0))
+        .where(models.PoolShare.pool_id == pool.id)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(models.Pool)
+        .where(models.Pool.id == pool.id)
+        .values(total_effective_tokens=total_effective)
+    )
+    db.expire(pool)
+    return pool.id
+
+
+def lock_period(db: Session, period: str) -> None:
+    """Wait for the period's settlement lock; released when the transaction ends"""
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"pool_settle:{period}"})
+
+
+def resettle_period(db: Session, period: str, base_amount: float) -> int:
+    """
+    Replace the period's pool (if any) with a freshly settled one.
+    Runs in the caller's transaction, which should hold lock_period().
+    """
+    old_ids = select(models.Pool.id).where(models.Pool.period_month == period).scalar_subquery()
+    db.query(models.PoolShare).filter(models.PoolShare.pool_id.in_(old_ids)).delete(synchronize_session=False)
+    db.query(models.Pool).filter(models.Pool.period_month == period).delete(synchronize_session=False)
+    return settle_period(db, period, base_amount)
+
+
+def emit_settled(db: Session, pool_id: int, period: str, base_amount: float, resettled: bool) -> None:
+    """Queue the pool.settled outbox event in the settling transaction"""
+    emit(db, "pool.settled", {
+        "pool_id": pool_id, "period": period, "base_amount": base_amount, "resettled": resettled,
+    }, key=period)
+
+
+def _close_period_locked(db: Session, period: str, base_amount: float, force: bool,
+                         requested_at: datetime) -> int:
+    lock_period(db, period)
+    existing = (
+        db.query(models.Pool)
+        .filter(models.Pool.period_month == period, models.Pool.settled == True)
+        .one_or_none()
+    )
+    # settled while we waited for the lock -> that result is as fresh as ours would be
+    if existing and (not force or (existing.settled_at and existing.settled_at >= requested_at)):
+        db.rollback()
+        return existing.id
+    pool_id = resettle_period(db, period, base_amount)
+    emit_settled(db, pool_id, period, base_amount, resettled=existing is not None)
+    db.commit()
+    return pool_id
+
+
+def close_period(db: Session, period: str, base_amount: float, force: bool = False) -> int:
+    """Settle the period once (or re-settle with force); returns the pool id. Commits."""
+    requested_at = datetime.now(tz=timezone.utc)
+    with _inflight_lock:
+        fut = _inflight.get(period)
+        leader = fut is None
+        if leader:
+            fut = _inflight[period] = Future()
+    if not leader:
+        return fut.result()
+
+    try:
+        pool_id = _close_period_locked(db, period, base_amount, force, requested_at)
+    except BaseException as e:
+        db.rollback()
+        fut.set_exception(e)
+        raise
+    else:
+        fut.set_result(pool_id)
+        return pool_id
+    finally:
+        with _inflight_lock:
+            _inflight.pop(period, None)
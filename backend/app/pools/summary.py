@@ -0,0 +1,98 @@
+# app/pools/summary.py
+"""
+Paginated, cached summaries of a settled pool.
+
+Shares are paged on (payout_amount DESC, id) using ix_pool_shares_pool_payout,
+continuing with `payout_amount < :p OR (payout_amount = :p AND id > :id)`, so
+deep pages cost the same as the first one.
+
+A settled pool's shares never change: force_recompute deletes the pool and
+settles a new one with a new id. Pages are cached under
+(pool_id, settled_at, cursor, limit). A recompute therefore moves readers to
+new keys, and the old pages just age out. The same identity is the ETag, so a
+client revalidating an unchanged page gets a 304 after a single lookup of the
+pool row.
+"""
+import base64
+import hashlib
+import os
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from database import models
+from ..services.cache import ReadThroughCache
+from .schemas import PoolShareOut, PoolSummaryOut
+
+POOL_SUMMARY_CACHE_TTL_S = float(os.getenv("POOL_SUMMARY_CACHE_TTL_S", "86400"))
+SUMMARY_PAGE_DEFAULT = 100
+SUMMARY_PAGE_MAX = 1000
+
+summary_cache = ReadThroughCache("pool_summary", POOL_SUMMARY_CACHE_TTL_S)
+
+
+def encode_cursor(payout_amount: float, share_id: int) -> str:
+    raw = f"{payout_amount!r}|{share_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        payout_amount, share_id = raw.rsplit("|", 1)
+        return float(payout_amount), int(share_id)
+    except Exception:
+        raise HTTPException(400, "invalid cursor")
+
+
+def _version(pool: models.Pool) -> str:
+    settled = pool.settled_at.timestamp() if pool.settled_at else 0
+    return f"{pool.id}:{settled:.6f}"
+
+
+def summary_etag(pool: models.Pool, cursor: Optional[str], limit: int) -> str:
+    digest = hashlib.sha1(f"{_version(pool)}|{cursor or ''}|{limit}".encode()).hexdigest()[:20]
+    return f'"pool-{pool.id}-{digest}"'
+
+
+def _load_page(db: Session, pool: models.Pool, cursor: Optional[str], limit: int) -> dict:
+    S = models.PoolShare
+    q = db.query(S.id, S.creator_id, S.token_count, S.effective_tokens, S.share_pct, S.payout_amount).filter(
+        S.pool_id == pool.id
+    )
+    if cursor:
+        payout_amount, share_id = decode_cursor(cursor)
+        q = q.filter(or_(S.payout_amount < payout_amount, and_(S.payout_amount == payout_amount, S.id > share_id)))
+    rows = q.order_by(S.payout_amount.desc(), S.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].payout_amount, rows[-1].id)
+
+    return PoolSummaryOut(
+        pool_id=pool.id,
+        period=pool.period_month,
+        base_amount=pool.base_amount,
+        total_effective_tokens=pool.total_effective_tokens,
+        shares=[
+            PoolShareOut(
+                creator_id=r.creator_id,
+                token_count=r.token_count,
+                effective_tokens=r.effective_tokens,
+                share_pct=r.share_pct,
+                payout_amount=r.payout_amount,
+            )
+            for r in rows
+        ],
+        next_cursor=next_cursor,
+    ).model_dump(mode="json")
+
+
+def summary_page(db: Session, pool: models.Pool, cursor: Optional[str] = None,
+                 limit: int = SUMMARY_PAGE_DEFAULT) -> PoolSummaryOut:
+    key = f"{_version(pool)}:{cursor or ''}:{limit}"
+    data = summary_cache.get_or_load(key, lambda: _load_page(db, pool, cursor, limit))
+    return PoolSummaryOut(**data)
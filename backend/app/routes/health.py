@@ -1,7 +1,14 @@
 from fastapi import APIRouter
 
+from ..services import metrics
+
 router = APIRouter(prefix="/health", tags=["health"])
 
 @router.get("")
 def health_check():
-    return {"status": "healthy✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅"}
\ No newline at end of file
+    return {"status": "healthy✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅✅"}
+
+@router.get("/metrics")
+def get_metrics():
+    """Process-local counters/gauges (per worker)"""
+    return metrics.snapshot()
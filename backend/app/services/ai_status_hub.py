@@ -0,0 +1,168 @@
+# app/services/ai_status_hub.py
+"""
+In-process pub/sub for AI-status changes, feeding the SSE stream endpoint.
+
+process_video_ai calls publish_status() after every state change. With a
+single worker that goes straight into the hub. With several workers set
+AI_STATUS_PG_NOTIFY=1: the update is sent with Postgres NOTIFY instead, and
+every worker runs a LISTEN thread that republishes into its own hub, so a
+client connected to any worker gets the event.
+"""
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+import psycopg2
+from sqlalchemy import text
+
+from database.session import engine, LOCAL_DATABASE_URL
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+AI_STATUS_PG_NOTIFY = os.getenv("AI_STATUS_PG_NOTIFY", "0") == "1"
+AI_STATUS_CHANNEL = "ai_status"
+MAX_STREAMS = int(os.getenv("AI_STATUS_MAX_STREAMS", "1000"))
+MAX_STREAMS_PER_VIDEO = int(os.getenv("AI_STATUS_MAX_STREAMS_PER_VIDEO", "20"))
+QUEUE_SIZE = 16
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class HubFull(Exception):
+    pass
+
+
+class AIStatusHub:
+    def __init__(self, max_streams: int = MAX_STREAMS, max_per_video: int = MAX_STREAMS_PER_VIDEO):
+        self.max_streams = max_streams
+        self.max_per_video = max_per_video
+        self._subs: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self._count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def connections(self) -> int:
+        return self._count
+
+    def subscribe(self, video_id: int) -> asyncio.Queue:
+        """Must be called from the event loop; raises HubFull past the limits"""
+        with self._lock:
+            if self._count >= self.max_streams or len(self._subs[video_id]) >= self.max_per_video:
+                metrics.incr("ai_status_stream.rejected")
+                raise HubFull()
+            self._loop = asyncio.get_running_loop()
+            q: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+            self._subs[video_id].add(q)
+            self._count += 1
+        metrics.set_gauge("ai_status_stream.connections", self._count)
+        return q
+
+    def unsubscribe(self, video_id: int, q: asyncio.Queue) -> None:
+        with self._lock:
+            subs = self._subs.get(video_id)
+            if subs and q in subs:
+                subs.discard(q)
+                self._count -= 1
+                if not subs:
+                    del self._subs[video_id]
+        metrics.set_gauge("ai_status_stream.connections", self._count)
+
+    def publish(self, video_id: int, payload: dict) -> None:
+        """Safe to call from the loop or from another thread"""
+        loop = self._loop
+        if loop is None or video_id not in self._subs:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(video_id, payload)
+        else:
+            loop.call_soon_threadsafe(self._deliver, video_id, payload)
+
+    def _deliver(self, video_id: int, payload: dict) -> None:
+        for q in list(self._subs.get(video_id, ())):
+            if q.full():
+                # slow reader: only the latest status matters
+                q.get_nowait()
+            q.put_nowait(payload)
+        metrics.incr("ai_status_stream.events")
+
+
+ai_status_hub = AIStatusHub()
+
+
+def status_payload(video) -> dict:
+    return {
+        "video_id": video.id,
+        "ai_status": video.ai_status,
+        "ai_score": video.ai_score,
+        "ai_label": video.ai_label,
+        "genuinity_score": video.genuinity_score,
+    }
+
+
+def publish_status(*payloads: dict) -> None:
+    """Announce committed status changes to every stream listening for them"""
+    if not AI_STATUS_PG_NOTIFY:
+        for payload in payloads:
+            ai_status_hub.publish(payload["video_id"], payload)
+        return
+    try:
+        with engine.begin() as conn:
+            for payload in payloads:
+                conn.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    {"channel": AI_STATUS_CHANNEL, "payload": json.dumps(payload)},
+                )
+    except Exception as e:
+        # streams fall back to their heartbeat; clients can still poll ai-status
+        logger.error(f"pg_notify for ai status failed: {e}")
+
+
+def _listen_forever(stop: threading.Event) -> None:
+    while not stop.is_set():
+        conn = None
+        try:
+            conn = psycopg2.connect(LOCAL_DATABASE_URL)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {AI_STATUS_CHANNEL};")
+            logger.info("ai status listener connected")
+            while not stop.is_set():
+                if select.select([conn], [], [], 5) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    note = conn.notifies.pop(0)
+                    payload = json.loads(note.payload)
+                    ai_status_hub.publish(payload["video_id"], payload)
+        except Exception as e:
+            logger.error(f"ai status listener error: {e}; reconnecting")
+            stop.wait(2)
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+_listener_stop = threading.Event()
+
+
+def start_listener() -> None:
+    """Start the LISTEN thread (no-op unless AI_STATUS_PG_NOTIFY=1)"""
+    if not AI_STATUS_PG_NOTIFY:
+        return
+    _listener_stop.clear()
+    threading.Thread(target=_listen_forever, args=(_listener_stop,), name="ai-status-listener", daemon=True).start()
+
+
+def stop_listener() -> None:
+    _listener_stop.set()
@@ -0,0 +1,65 @@
+# app/services/background.py
+"""
+Periodic background jobs run in daemon threads (our DB code is synchronous,
+so a thread keeps it off the event loop). Started from the app startup hook,
+stopped -- with one last run -- on shutdown.
+"""
+import logging
+import threading
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    def __init__(self, name: str, interval_s: float, fn: Callable[[], object], run_on_stop: bool = False):
+        self.name = name
+        self.interval_s = interval_s
+        self.fn = fn
+        self.run_on_stop = run_on_stop
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run_once(self):
+        try:
+            self.fn()
+        except Exception as e:
+            logger.error(f"background task {self.name} failed: {e}")
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_s):
+            self._run_once()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=f"task-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self.run_on_stop:
+            self._run_once()
+
+
+_tasks: Dict[str, PeriodicTask] = {}
+
+
+def register(name: str, interval_s: float, fn: Callable[[], object], run_on_stop: bool = False) -> PeriodicTask:
+    task = PeriodicTask(name, interval_s, fn, run_on_stop)
+    _tasks[name] = task
+    return task
+
+
+def start_all():
+    for task in _tasks.values():
+        task.start()
+        logger.info(f"background task {task.name} started (every {task.interval_s}s)")
+
+
+def stop_all():
+    for task in _tasks.values():
+        task.stop()
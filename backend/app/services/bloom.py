@@ -0,0 +1,145 @@
+# app/services/bloom.py
+"""
+Bloom filters for "have we possibly seen this key?" pre-checks.
+
+  - BloomFilter: fixed capacity, bits in a bytearray, k probes by double
+    hashing of one blake2b digest.
+  - ScalableBloomFilter: a chain of BloomFilters. When the last one is full,
+    a new one is added with GROWTH x the capacity and TIGHTENING x the error
+    rate, so the compound false-positive rate stays under the configured
+    one however many keys arrive.
+  - RedisBloomFilter: one fixed-size filter in a Redis bitmap (SETBIT /
+    GETBIT in a pipeline), shared by all workers. Size it with the capacity
+    you expect.
+
+A Bloom filter never gives a false negative for keys that were added. A
+caller can therefore skip its exact check whenever might_contain() is False,
+provided every insert also calls add(). stats() reports memory and the
+false-positive rate estimated from the current fill.
+"""
+import hashlib
+import math
+import threading
+from typing import Dict, List
+
+GROWTH = 2
+TIGHTENING = 0.5
+
+
+def _optimal(capacity: int, error_rate: float):
+    """(bits, hashes) for `capacity` keys at `error_rate`"""
+    bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+    hashes = max(1, int(round(bits / capacity * math.log(2))))
+    return bits, hashes
+
+
+def _probes(key: str, bits: int, hashes: int) -> List[int]:
+    digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bits, self.hashes = _optimal(capacity, error_rate)
+        self.array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def add(self, key: str) -> None:
+        for p in _probes(key, self.bits, self.hashes):
+            self.array[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def might_contain(self, key: str) -> bool:
+        return all(self.array[p >> 3] & (1 << (p & 7)) for p in _probes(key, self.bits, self.hashes))
+
+    def estimated_fp_rate(self) -> float:
+        # (fraction of bits set) ** k, with the fill estimated from the key count
+        fill = 1 - math.exp(-self.hashes * self.count / self.bits)
+        return fill ** self.hashes
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self.array)
+
+
+class ScalableBloomFilter:
+    def __init__(self, initial_capacity: int, error_rate: float):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._filters: List[BloomFilter] = [BloomFilter(initial_capacity, error_rate * (1 - TIGHTENING))]
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            last = self._filters[-1]
+            if last.count >= last.capacity:
+                last = BloomFilter(last.capacity * GROWTH, last.error_rate * TIGHTENING)
+                self._filters.append(last)
+            last.add(key)
+
+    def might_contain(self, key: str) -> bool:
+        filters = self._filters  # appends only; a concurrent add at worst misses the newest key
+        return any(f.might_contain(key) for f in filters)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._filters = [BloomFilter(self.initial_capacity, self.error_rate * (1 - TIGHTENING))]
+
+    def stats(self) -> Dict[str, float]:
+        filters = self._filters
+        p_none = 1.0
+        for f in filters:
+            p_none *= 1 - f.estimated_fp_rate()
+        return {
+            "backend": "memory",
+            "keys": sum(f.count for f in filters),
+            "filters": len(filters),
+            "memory_bytes": sum(f.memory_bytes for f in filters),
+            "configured_fp_rate": self.error_rate,
+            "estimated_fp_rate": 1 - p_none,
+        }
+
+
+class RedisBloomFilter:
+    def __init__(self, client, key: str, capacity: int, error_rate: float):
+        self.client = client
+        self.key = key
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bits, self.hashes = _optimal(capacity, error_rate)
+
+    def add(self, key: str) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for p in _probes(key, self.bits, self.hashes):
+            pipe.setbit(self.key, p, 1)
+        pipe.execute()
+
+    def add_many(self, keys: List[str]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            for p in _probes(key, self.bits, self.hashes):
+                pipe.setbit(self.key, p, 1)
+        pipe.execute()
+
+    def might_contain(self, key: str) -> bool:
+        pipe = self.client.pipeline(transaction=False)
+        for p in _probes(key, self.bits, self.hashes):
+            pipe.getbit(self.key, p)
+        return all(pipe.execute())
+
+    def clear(self) -> None:
+        self.client.delete(self.key)
+
+    def stats(self) -> Dict[str, float]:
+        set_bits = self.client.bitcount(self.key)
+        return {
+            "backend": "redis",
+            "memory_bytes": (self.bits + 7) // 8,
+            "capacity": self.capacity,
+            "configured_fp_rate": self.error_rate,
+            "estimated_fp_rate": (set_bits / self.bits) ** self.hashes,
+        }
@@ -0,0 +1,195 @@
+# app/services/cache.py
+"""
+Read-through cache with TTL + LRU eviction.
+
+Two backends share one small interface (get / set / add / delete):
+  - MemoryCache: process-local OrderedDict, bounded by max_entries (LRU)
+  - RedisCache: shared across workers; values are stored as JSON with EX ttl
+    (eviction is left to the server's maxmemory-policy, e.g. allkeys-lru)
+
+Redis is used when REDIS_URL is set (or CACHE_BACKEND=redis), otherwise the
+in-memory one. In memory, each namespace (get_backend(namespace)) gets its own
+MemoryCache of CACHE_MAX_ENTRIES, so a burst of video reads can't evict
+pool-summary pages or idempotency records. Tests can pass a MemoryCache, or
+RedisCache(fakeredis.FakeRedis()), to set_backend(); it then serves every
+namespace.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+from . import metrics
+from ..storage.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "")  # "", "memory" or "redis"
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+
+MISSING = object()  # returned by backend.get() for absent / expired keys
+
+
+class MemoryCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return MISSING
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key: str, value: Any, ttl: float) -> bool:
+        """set() only if the key is absent (or expired); True if it was set"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] >= time.monotonic():
+                return False
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            return True
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    def __init__(self, client, prefix: str = "cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Any:
+        raw = self.client.get(self.prefix + key)
+        return MISSING if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self.client.set(self.prefix + key, json.dumps(value, default=str), px=max(int(ttl * 1000), 1))
+
+    def add(self, key: str, value: Any, ttl: float) -> bool:
+        return bool(self.client.set(
+            self.prefix + key, json.dumps(value, default=str), px=max(int(ttl * 1000), 1), nx=True
+        ))
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.client.delete(*(self.prefix + k for k in keys))
+
+
+_PER_NAMESPACE = object()  # _backend value: one MemoryCache per namespace
+_backend = None
+_memory_backends: Dict[str, MemoryCache] = {}
+_backend_lock = threading.Lock()
+
+
+def get_backend(namespace: str = ""):
+    """The shared RedisCache, or this namespace's own MemoryCache"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                client = get_redis() if CACHE_BACKEND != "memory" else None
+                if CACHE_BACKEND == "redis" and client is None:
+                    raise RuntimeError("CACHE_BACKEND=redis but REDIS_URL is not set")
+                _backend = RedisCache(client) if client is not None else _PER_NAMESPACE
+    if _backend is not _PER_NAMESPACE:
+        return _backend
+    cache = _memory_backends.get(namespace)
+    if cache is None:
+        with _backend_lock:
+            cache = _memory_backends.setdefault(namespace, MemoryCache())
+    return cache
+
+
+def set_backend(backend) -> None:
+    """Swap the backend (tests / scripts)"""
+    global _backend
+    _backend = backend
+
+
+class ReadThroughCache:
+    """
+    A namespace in the shared backend. get_or_load() returns the cached value
+    or calls loader() (the DB hit), caching anything that isn't None.
+    """
+
+    def __init__(self, namespace: str, ttl: float):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.started_at = time.monotonic()
+        _namespaces[namespace] = self
+
+    def _key(self, key) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get_or_load(self, key, loader: Callable[[], Any]) -> Any:
+        backend = get_backend(self.namespace)
+        try:
+            value = backend.get(self._key(key))
+        except Exception:
+            value = MISSING  # cache outage -> behave like a miss
+        if value is not MISSING:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = loader()
+        if value is not None:
+            try:
+                backend.set(self._key(key), value, self.ttl)
+            except Exception:
+                pass
+        return value
+
+    def invalidate(self, *keys) -> None:
+        """Best effort: on a cache outage the entries simply live out their TTL"""
+        try:
+            get_backend(self.namespace).delete(*(self._key(k) for k in keys))
+        except Exception as e:
+            metrics.incr("cache.invalidate_errors")
+            logger.warning(f"cache invalidate failed for {self.namespace}: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            # every miss is one DB query; compare the two rates to see what the cache saves
+            "requests_per_s": total / elapsed,
+            "db_queries_per_s": self.misses / elapsed,
+        }
+
+
+_namespaces: Dict[str, ReadThroughCache] = {}
+
+metrics.register_collector("cache", lambda: {name: c.stats() for name, c in _namespaces.items()})
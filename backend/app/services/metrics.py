@@ -0,0 +1,49 @@
+# app/services/metrics.py
+"""
+Tiny process-local metrics registry.
+
+Counters only ever go up, gauges hold the last value set, and collectors are
+callables that get polled when a snapshot is taken (for stats that live in
+another object, e.g. a cache or a filter). Everything is exposed through
+GET /health/metrics.
+"""
+import threading
+from typing import Callable, Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+_collectors: Dict[str, Callable[[], dict]] = {}
+
+
+def incr(name: str, value: float = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+
+def get(name: str) -> float:
+    with _lock:
+        return _counters.get(name, _gauges.get(name, 0))
+
+
+def register_collector(name: str, fn: Callable[[], dict]) -> None:
+    """fn() is called on every snapshot; its dict is nested under `name`"""
+    with _lock:
+        _collectors[name] = fn
+
+
+def snapshot() -> dict:
+    with _lock:
+        out = {"counters": dict(_counters), "gauges": dict(_gauges)}
+        collectors = list(_collectors.items())
+    for name, fn in collectors:
+        try:
+            out[name] = fn()
+        except Exception as e:  # a broken collector must not take the endpoint down
+            out[name] = {"error": str(e)}
+    return out
@@ -0,0 +1,283 @@
+# app/services/mp4_metadata.py
+"""
+Streaming ISO-BMFF (MP4) header parser.
+
+Only box headers are looked at: `ftyp` and `moov` are buffered and decoded,
+everything else (notably `mdat`) is skipped without being kept in memory, and
+no frames are ever decoded. The parser can be fed the upload as it streams
+through, or driven with ranged GETs against an object already in S3 so that
+only the header ranges are downloaded.
+"""
+import re
+import struct
+from typing import Any, Dict, List, Optional
+
+from ..storage.s3_client import s3_client, BUCKET_NAME
+
+# moov is normally a few hundred KB; anything far beyond this is not a sane file
+MAX_MOOV_BYTES = 64 * 1024 * 1024
+RANGE_READ_SIZE = 64 * 1024
+
+_CONTAINER_BOXES = {b"trak", b"mdia", b"minf", b"stbl"}
+_BUFFERED_BOXES = {b"ftyp", b"moov"}
+_BOX_TYPE = re.compile(rb"[\x20-\x7e\xa9]{4}")  # printable fourcc ('\xa9' for ©xyz udta boxes)
+
+
+class Mp4ParseError(ValueError):
+    pass
+
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    """Yield (type, payload_start, payload_end) for the boxes in data[start:end]"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                break
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            break
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _read_times(data: bytes, pos: int):
+    """(timescale, duration) from a mvhd/mdhd payload"""
+    version = data[pos]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, pos + 4 + 16)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, pos + 4 + 8)
+    return timescale, duration
+
+
+def _parse_trak(data: bytes, start: int, end: int) -> Dict[str, Any]:
+    track: Dict[str, Any] = {}
+
+    def walk(s, e):
+        for box_type, ps, pe in _iter_boxes(data, s, e):
+            if box_type in _CONTAINER_BOXES:
+                walk(ps, pe)
+            elif box_type == b"tkhd":
+                version = data[ps]
+                # creation/modification/track_id/reserved/duration, then 52 fixed bytes
+                off = ps + 4 + (32 if version == 1 else 20) + 52
+                if off + 8 <= pe:
+                    w, h = struct.unpack_from(">II", data, off)
+                    if w or h:
+                        track["width"], track["height"] = w >> 16, h >> 16
+            elif box_type == b"mdhd":
+                timescale, duration = _read_times(data, ps)
+                if timescale:
+                    track["duration_s"] = round(duration / timescale, 3)
+            elif box_type == b"hdlr":
+                track["type"] = data[ps + 8:ps + 12].decode("latin-1")
+            elif box_type == b"stsd":
+                entries = list(_iter_boxes(data, ps + 8, pe))
+                if entries:
+                    fourcc, es, ee = entries[0]
+                    track["codec"] = fourcc.decode("latin-1")
+                    # visual sample entry: width/height after 24 bytes of fixed fields
+                    if track.get("type") == "vide" and es + 28 <= ee:
+                        w, h = struct.unpack_from(">HH", data, es + 24)
+                        track.setdefault("width", w)
+                        track.setdefault("height", h)
+
+    walk(start, end)
+    return track
+
+
+def parse_moov(data: bytes) -> Dict[str, Any]:
+    duration_s = None
+    tracks: List[Dict[str, Any]] = []
+    for box_type, ps, pe in _iter_boxes(data):
+        if box_type == b"mvhd":
+            timescale, duration = _read_times(data, ps)
+            if timescale:
+                duration_s = round(duration / timescale, 3)
+        elif box_type == b"trak":
+            tracks.append(_parse_trak(data, ps, pe))
+
+    meta: Dict[str, Any] = {"duration_s": duration_s, "tracks": tracks}
+    video = next((t for t in tracks if t.get("type") == "vide"), None)
+    audio = next((t for t in tracks if t.get("type") == "soun"), None)
+    if video:
+        meta["width"] = video.get("width")
+        meta["height"] = video.get("height")
+        meta["video_codec"] = video.get("codec")
+    if audio:
+        meta["audio_codec"] = audio.get("codec")
+    if duration_s is None and video:
+        meta["duration_s"] = video.get("duration_s")
+    return meta
+
+
+def parse_ftyp(data: bytes) -> Dict[str, Any]:
+    if len(data) < 8:
+        return {}
+    brands = [data[i:i + 4].decode("latin-1") for i in range(8, len(data) - 3, 4)]
+    return {"brand": data[:4].decode("latin-1"), "compatible_brands": brands}
+
+
+class Mp4HeaderParser:
+    """
+    Incremental top-level box walker; call feed() with consecutive chunks.
+
+    `done` flips once moov has been parsed (or the stream can't be an MP4),
+    after which further chunks are ignored. `metadata` holds the result.
+    """
+
+    def __init__(self, max_moov_bytes: int = MAX_MOOV_BYTES):
+        self.max_moov_bytes = max_moov_bytes
+        self.position = 0          # absolute offset of the next byte expected
+        self.done = False
+        self.error: Optional[str] = None
+        self._ftyp: Dict[str, Any] = {}
+        self._moov: Optional[Dict[str, Any]] = None
+        self._header = bytearray()
+        self._box_type: Optional[bytes] = None
+        self._body = bytearray()
+        self._body_left = 0        # bytes still to buffer for ftyp/moov
+        self._skip_left = 0        # bytes still to skip for any other box
+
+    @property
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        if self._moov is None:
+            return None
+        return {**self._ftyp, **self._moov}
+
+    @property
+    def skipping(self) -> int:
+        """Bytes the parser will discard next; a ranged reader can jump over them"""
+        return self._skip_left
+
+    @property
+    def bytes_wanted(self) -> int:
+        return self._body_left or 16
+
+    def skip_ahead(self) -> int:
+        """Pretend the skipped payload was fed; returns the new absolute position"""
+        self.position += self._skip_left
+        self._skip_left = 0
+        return self.position
+
+    def _fail(self, reason: str):
+        self.error = reason
+        self.done = True
+
+    def feed(self, chunk: bytes) -> None:
+        view = memoryview(chunk)
+        while view and not self.done:
+            if self._skip_left:
+                n = min(self._skip_left, len(view))
+                self._skip_left -= n
+                self.position += n
+                view = view[n:]
+                continue
+
+            if self._body_left:
+                n = min(self._body_left, len(view))
+                self._body += view[:n]
+                self._body_left -= n
+                self.position += n
+                view = view[n:]
+                if not self._body_left:
+                    self._finish_box()
+                continue
+
+            # reading a box header (8 bytes, or 16 for 64-bit sizes)
+            large = len(self._header) >= 8 and self._header[:4] == b"\x00\x00\x00\x01"
+            need = 16 if large else 8
+            n = min(need - len(self._header), len(view))
+            self._header += view[:n]
+            self.position += n
+            view = view[n:]
+            if len(self._header) == 8 and self._header[:4] == b"\x00\x00\x00\x01":
+                continue  # 64-bit size follows
+            if len(self._header) == need:
+                self._start_box()
+
+    def _start_box(self):
+        header = bytes(self._header)
+        self._header = bytearray()
+        size, box_type = struct.unpack_from(">I4s", header)
+        if size == 1:
+            size = struct.unpack_from(">Q", header, 8)[0]
+
+        if not _BOX_TYPE.fullmatch(box_type):
+            return self._fail("not an ISO-BMFF stream")
+        if size == 0:
+            # box runs to end of file; nothing we care about can follow it
+            if box_type in _BUFFERED_BOXES:
+                return self._fail("unbounded %s box" % box_type.decode("latin-1"))
+            return self._fail("moov box not found before end-of-file box")
+        if size < len(header):
+            return self._fail("corrupt box size")
+
+        payload = size - len(header)
+        if box_type in _BUFFERED_BOXES:
+            if payload > self.max_moov_bytes:
+                return self._fail("%s box too large" % box_type.decode("latin-1"))
+            self._box_type = box_type
+            self._body = bytearray()
+            self._body_left = payload
+            if not payload:
+                self._finish_box()
+        else:
+            self._skip_left = payload
+
+    def _finish_box(self):
+        body = bytes(self._body)
+        self._body = bytearray()
+        try:
+            if self._box_type == b"ftyp":
+                self._ftyp = parse_ftyp(body)
+            elif self._box_type == b"moov":
+                self._moov = parse_moov(body)
+                self.done = True
+        except (struct.error, IndexError) as e:
+            self._fail(f"corrupt {self._box_type.decode('latin-1')}: {e}")
+
+
+def apply_metadata(video, meta: Optional[Dict[str, Any]]) -> None:
+    """Fill Video.duration_s / Video.meta_data from parser output"""
+    if not meta:
+        return
+    if meta.get("duration_s") is not None:
+        video.duration_s = int(round(meta["duration_s"]))
+    video.meta_data = meta
+
+
+def read_s3_metadata(s3_key: str, bucket: str = BUCKET_NAME) -> Dict[str, Any]:
+    """
+    Parse a stored object's headers with ranged GETs: box headers are read,
+    `mdat` and friends are jumped over, and moov is fetched in one range.
+    """
+    parser = Mp4HeaderParser()
+    pos = 0
+    total = None
+    while not parser.done:
+        if parser.skipping:
+            pos = parser.skip_ahead()
+        if total is not None and pos >= total:
+            break
+        length = max(RANGE_READ_SIZE, parser.bytes_wanted)
+        resp = s3_client.get_object(Bucket=bucket, Key=s3_key, Range=f"bytes={pos}-{pos + length - 1}")
+        if total is None:
+            # "bytes 0-65535/12345678"
+            total = int(resp.get("ContentRange", "/0").rsplit("/", 1)[-1] or 0) or None
+        data = resp["Body"].read()
+        if not data:
+            break
+        parser.feed(data)
+        pos += len(data)
+
+    if parser.metadata is None:
+        raise Mp4ParseError(parser.error or "moov box not found")
+    return parser.metadata
@@ -0,0 +1,249 @@
+# app/services/outbox.py
+"""
+Transactional outbox for domain events.
+
+A mutation calls emit(db, topic, payload) before it commits. The event row
+lands in outbox_events in the same transaction as the change, so there is no
+event for a rolled-back change and no committed change without its event.
+Topics:
+  appreciation.created   appreciate
+  ad_watch.completed     complete_ad_watch (app/ads/sessions.py)
+  video.ai_completed     process_video_ai
+  video.ai_failed        process_video_ai
+  pool.settled           close-and-settle (app/pools/settlement.py)
+
+relay() runs as a background job. It claims up to OUTBOX_BATCH unpublished
+rows in id order with FOR UPDATE SKIP LOCKED, so several workers can relay
+at once without waiting on each other. It hands the batch to every sink in
+OUTBOX_SINKS and then stamps published_at, all in one transaction. If a sink
+raises, the batch's attempts are bumped and it is retried on the next run.
+Delivery through the file and redis sinks is therefore at-least-once, and
+order is per relay batch only: consumers should dedupe on event.id.
+
+Sinks:
+  - subscribers: in-process callbacks registered with subscribe(prefix, fn).
+    These are best-effort: a failing callback is logged and counted
+    (outbox.subscriber_errors) and the event is not offered to it again, so
+    one broken callback can't stall the outbox. A callback still sees an
+    event twice if another sink fails the batch. Anything that must not miss
+    an event should consume the file or redis sink instead.
+  - file: appends JSON lines to OUTBOX_FILE_DIR/events-YYYY-MM-DD.jsonl.
+  - redis: XADD to the OUTBOX_STREAM stream (trimmed to about
+    OUTBOX_STREAM_MAXLEN entries). This is the local broker stand-in that
+    consumers read with XREAD / consumer groups from their last id.
+
+purge_published() deletes rows published more than OUTBOX_RETENTION_S ago.
+"""
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, text
+
+from database import models
+from database.session import engine
+from . import metrics
+from ..storage.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_SINKS = [s.strip() for s in os.getenv("OUTBOX_SINKS", "subscribers").split(",") if s.strip()]
+OUTBOX_BATCH = int(os.getenv("OUTBOX_BATCH", "500"))
+OUTBOX_RELAY_INTERVAL_S = float(os.getenv("OUTBOX_RELAY_INTERVAL_S", "1"))
+OUTBOX_RETENTION_S = int(os.getenv("OUTBOX_RETENTION_S", str(7 * 86400)))
+OUTBOX_PURGE_INTERVAL_S = float(os.getenv("OUTBOX_PURGE_INTERVAL_S", "3600"))
+OUTBOX_PURGE_CHUNK = 5000
+OUTBOX_FILE_DIR = os.getenv("OUTBOX_FILE_DIR", "outbox")
+OUTBOX_STREAM = os.getenv("OUTBOX_STREAM", "events")
+OUTBOX_STREAM_MAXLEN = int(os.getenv("OUTBOX_STREAM_MAXLEN", "1000000"))
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    topic: str
+    key: Optional[str]
+    payload: dict
+    created_at: datetime
+
+    def to_json(self) -> str:
+        d = asdict(self)
+        d["created_at"] = self.created_at.isoformat()
+        return json.dumps(d, separators=(",", ":"))
+
+
+def emit(db, topic: str, payload: dict, key=None) -> None:
+    """Queue an event in the caller's transaction (db: Session or Connection); no commit"""
+    db.execute(insert(models.OutboxEvent).values(
+        topic=topic,
+        key=None if key is None else str(key),
+        payload=payload,
+    ))
+    metrics.incr("outbox.emitted")
+
+
+# ---- sinks ----
+class SubscriberSink:
+    def __init__(self):
+        self._subscribers: List[Tuple[str, Callable[[Event], None]]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, prefix: str, fn: Callable[[Event], None]) -> None:
+        """fn(event) for every event whose topic starts with prefix ('' = all); best-effort"""
+        with self._lock:
+            self._subscribers.append((prefix, fn))
+
+    def publish(self, events: List[Event]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for event in events:
+            for prefix, fn in subscribers:
+                if not event.topic.startswith(prefix):
+                    continue
+                try:
+                    fn(event)
+                except Exception as e:
+                    metrics.incr("outbox.subscriber_errors")
+                    logger.warning(f"outbox subscriber for {prefix!r} failed on event {event.id}: {e}")
+
+
+class FileSink:
+    def __init__(self, directory: str = OUTBOX_FILE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def publish(self, events: List[Event]) -> None:
+        day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        with open(os.path.join(self.directory, f"events-{day}.jsonl"), "a", encoding="utf-8") as f:
+            f.write("".join(e.to_json() + "\n" for e in events))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class RedisStreamSink:
+    def __init__(self, client, stream: str = OUTBOX_STREAM, maxlen: int = OUTBOX_STREAM_MAXLEN):
+        self.client = client
+        self.stream = stream
+        self.maxlen = maxlen
+
+    def publish(self, events: List[Event]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for e in events:
+            pipe.xadd(self.stream, {"event": e.to_json()}, maxlen=self.maxlen, approximate=True)
+        pipe.execute()
+
+
+subscribers = SubscriberSink()
+
+
+def subscribe(prefix: str, fn: Callable[[Event], None]) -> None:
+    subscribers.subscribe(prefix, fn)
+
+
+def _make_sinks() -> Dict[str, object]:
+    sinks: Dict[str, object] = {}
+    for name in OUTBOX_SINKS:
+        if name == "subscribers":
+            sinks[name] = subscribers
+        elif name == "file":
+            sinks[name] = FileSink()
+        elif name == "redis":
+            client = get_redis()
+            if client is None:
+                raise RuntimeError("OUTBOX_SINKS includes redis but REDIS_URL is not set")
+            sinks[name] = RedisStreamSink(client)
+        else:
+            raise RuntimeError(f"unknown outbox sink {name!r}")
+    return sinks
+
+
+sinks = _make_sinks()
+
+
+# ---- relay ----
+_CLAIM_SQL = """
+    SELECT id, topic, key, payload, created_at
+    FROM outbox_events
+    WHERE published_at IS NULL
+    ORDER BY id
+    LIMIT :batch
+    FOR UPDATE SKIP LOCKED
+"""
+
+
+def relay_batch(batch: int = OUTBOX_BATCH) -> int:
+    """Publish one batch; returns how many events went out"""
+    with engine.begin() as conn:
+        rows = conn.execute(text(_CLAIM_SQL), {"batch": batch}).all()
+        if not rows:
+            return 0
+        ids = [r.id for r in rows]
+        events = [
+            Event(r.id, r.topic, r.key, r.payload if isinstance(r.payload, dict) else json.loads(r.payload), r.created_at)
+            for r in rows
+        ]
+        try:
+            for sink in sinks.values():
+                sink.publish(events)
+        except Exception as e:
+            metrics.incr("outbox.relay_errors")
+            logger.error(f"outbox relay failed for events {ids[0]}..{ids[-1]}: {e}")
+            conn.execute(
+                text("UPDATE outbox_events SET attempts = attempts + 1 WHERE id = ANY(:ids)"), {"ids": ids}
+            )
+            return 0
+        conn.execute(
+            text("UPDATE outbox_events SET published_at = now(), attempts = attempts + 1 WHERE id = ANY(:ids)"),
+            {"ids": ids},
+        )
+    metrics.incr("outbox.published", len(ids))
+    return len(ids)
+
+
+def relay() -> int:
+    """Background job: drain the outbox batch by batch"""
+    total = 0
+    while True:
+        n = relay_batch()
+        total += n
+        if n < OUTBOX_BATCH:
+            return total
+
+
+def purge_published() -> int:
+    """Delete events published more than OUTBOX_RETENTION_S ago"""
+    removed = 0
+    while True:
+        with engine.begin() as conn:
+            n = conn.execute(text("""
+                DELETE FROM outbox_events
+                WHERE id IN (
+                    SELECT id FROM outbox_events
+                    WHERE published_at IS NOT NULL AND published_at < now() - make_interval(secs => :retention)
+                    LIMIT :chunk
+                )
+            """), {"retention": OUTBOX_RETENTION_S, "chunk": OUTBOX_PURGE_CHUNK}).rowcount
+        removed += n
+        if n < OUTBOX_PURGE_CHUNK:
+            if removed:
+                logger.info(f"outbox: purged {removed} published events")
+            return removed
+
+
+def _stats() -> dict:
+    with engine.connect() as conn:
+        pending, oldest = conn.execute(text(
+            "SELECT count(*), min(created_at) FROM outbox_events WHERE published_at IS NULL"
+        )).one()
+    return {
+        "sinks": list(sinks),
+        "pending": pending,
+        "oldest_pending_s": (datetime.now(timezone.utc) - oldest).total_seconds() if oldest else 0,
+    }
+
+
+metrics.register_collector("outbox", _stats)
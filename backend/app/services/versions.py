@@ -0,0 +1,63 @@
+# app/services/versions.py
+"""
+Version stamps for process-local caches.
+
+A writer calls bump(db, name) in the same transaction as its change. Each
+worker's cache remembers the version it was filled under and compares it
+with current(name) before use. current() reads the cache_versions row at
+most once per VERSION_CHECK_S per name, so other workers notice a change
+within that window and a cache hit otherwise costs a dict lookup.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.session import engine
+
+logger = logging.getLogger(__name__)
+
+VERSION_CHECK_S = float(os.getenv("VERSION_CHECK_S", "1"))
+
+_seen: Dict[str, Tuple[int, float]] = {}  # name -> (version, checked_at)
+_lock = threading.Lock()
+
+
+def bump(db: Session, name: str) -> None:
+    """Advance the version in the caller's transaction; call forget() after the commit"""
+    db.execute(text("""
+        INSERT INTO cache_versions (name, version) VALUES (:name, 1)
+        ON CONFLICT (name) DO UPDATE SET version = cache_versions.version + 1, updated_at = now()
+    """), {"name": name})
+
+
+def forget(name: str) -> None:
+    """Drop the remembered stamp so this worker re-reads it on the next current()"""
+    with _lock:
+        _seen.pop(name, None)
+
+
+def current(name: str) -> int:
+    now = time.monotonic()
+    with _lock:
+        seen = _seen.get(name)
+    if seen is not None and now - seen[1] < VERSION_CHECK_S:
+        return seen[0]
+    try:
+        with engine.connect() as conn:
+            version = conn.execute(
+                text("SELECT version FROM cache_versions WHERE name = :name"), {"name": name}
+            ).scalar() or 0
+    except Exception as e:
+        if seen is None:
+            raise
+        # keep serving the last known version rather than failing hot paths
+        logger.warning(f"version check for {name} failed: {e}")
+        version = seen[0]
+    with _lock:
+        _seen[name] = (version, now)
+    return version
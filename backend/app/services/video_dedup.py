@@ -0,0 +1,142 @@
+# app/services/video_dedup.py
+"""
+Content-hash dedup for uploads.
+
+The upload is hashed chunk by chunk while it is read off the request, then
+rewound so the same spooled file can be streamed to S3. If another video with
+the same SHA-256 already exists we point the new row at its S3 object and
+reuse its inference results instead of uploading / analysing again.
+
+A new row that waits on an in-flight donor ("follower") relies on the donor's
+run to copy results onto it. Both sides hold lock_content() while they look
+at each other: the upload while it picks the donor and inserts, the run's
+final transaction while it looks for pending followers. So either the
+upload sees the finished donor, or the run sees the new pending row.
+
+Only completed results are copied. When a run fails, its followers stay
+pending and claim_rerun() hands the lowest one its own run; the rest keep
+following that one.
+"""
+import hashlib
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.models import Video
+from . import metrics
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+AI_RESULT_FIELDS = ("ai_score", "ai_label", "genuinity_score")
+
+
+async def digest_upload(file: UploadFile, *sinks: Callable[[bytes], None]) -> Tuple[str, int]:
+    """
+    Stream the upload once -> (sha256 hex, size in bytes), then rewind it.
+    Every chunk is also handed to `sinks` (e.g. the MP4 header parser).
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        hasher.update(chunk)
+        size += len(chunk)
+        for sink in sinks:
+            sink(chunk)
+    await file.seek(0)
+    return hasher.hexdigest(), size
+
+
+def lock_content(db: Session, content_sha256: str) -> None:
+    """Serialise donor / follower handoffs for one content hash; released at commit"""
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"video_content:{content_sha256}"})
+
+
+def find_donor(db: Session, content_sha256: str) -> Optional[Video]:
+    """Existing video with the same content: analysed first, then one still being analysed"""
+    return (
+        db.query(Video)
+        .filter(Video.content_sha256 == content_sha256)
+        .order_by(
+            (Video.ai_status == "completed").desc(),
+            Video.ai_status.in_(("pending", "processing")).desc(),
+            Video.id,
+        )
+        .first()
+    )
+
+
+def adopt_donor(video: Video, donor: Optional[Video]) -> bool:
+    """
+    Copy what we can from donor onto the new video.
+    Returns True if the new video still needs its own inference run.
+    """
+    if donor is None:
+        return True
+
+    metrics.incr("videos.dedup.hits")
+    metrics.incr("videos.dedup.bytes_saved", video.file_size or 0)
+
+    if donor.ai_status == "completed":
+        for field in AI_RESULT_FIELDS:
+            setattr(video, field, getattr(donor, field))
+        video.ai_status = "completed"
+        metrics.incr("videos.dedup.inference_skipped")
+        return False
+
+    if donor.ai_status in ("pending", "processing"):
+        # donor's run will fan its result out to every row with this hash
+        video.ai_status = "pending"
+        metrics.incr("videos.dedup.inference_skipped")
+        return False
+
+    # donor failed -> try again for this one
+    return True
+
+
+def _pending_siblings(db: Session, video: Video) -> List[int]:
+    return [
+        vid for (vid,) in db.query(Video.id).filter(
+            Video.content_sha256 == video.content_sha256,
+            Video.id != video.id,
+            Video.ai_status == "pending",
+        ).order_by(Video.id)
+    ]
+
+
+def propagate_results(db: Session, video: Video) -> List[int]:
+    """
+    Copy a completed video's results onto pending rows sharing its content (no commit).
+    Returns the ids that were updated; nothing is copied from a failed run.
+    """
+    if not video.content_sha256 or video.ai_status != "completed":
+        return []
+    lock_content(db, video.content_sha256)
+    sibling_ids = _pending_siblings(db, video)
+    if not sibling_ids:
+        return []
+    values = {field: getattr(video, field) for field in AI_RESULT_FIELDS}
+    values["ai_status"] = video.ai_status
+    db.query(Video).filter(Video.id.in_(sibling_ids)).update(values, synchronize_session=False)
+    return sibling_ids
+
+
+def claim_rerun(db: Session, video: Video) -> Optional[int]:
+    """
+    After `video`'s run failed: mark its lowest pending follower "processing"
+    (no commit) and return its id, to be analysed after the commit. The other
+    followers wait on that run instead.
+    """
+    if not video.content_sha256:
+        return None
+    lock_content(db, video.content_sha256)
+    sibling_ids = _pending_siblings(db, video)
+    if not sibling_ids:
+        return None
+    db.query(Video).filter(Video.id == sibling_ids[0]).update({"ai_status": "processing"}, synchronize_session=False)
+    metrics.incr("videos.dedup.reruns")
+    return sibling_ids[0]
@@ -3,6 +3,10 @@ import asyncio
 from database.session import SessionLocal
 from database.models import Video
 from ..storage.s3_client import s3_client, BUCKET_NAME
+from .video_dedup import claim_rerun, propagate_results
+from ..videos.cache import invalidate_video
+from .ai_status_hub import publish_status, status_payload
+from .outbox import emit
 
 import os 
 
@@ -20,24 +24,60 @@ async def process_video_ai(video_id: int):
         
         video.ai_status = "processing"
         db.commit()
+        _announce(video, [])
         
-        video_data = download_from_s3(video.s3_key)
+        # only the inference and its commit belong in here: cache / notify
+        # problems after a commit must not turn the result into "failed"
+        rerun_id = None
+        try:
+            video_data = download_from_s3(video.s3_key)
+            
+            ai_result = await call_ai_service(video_data, video_id)
+            
+            video.ai_score = extract_confidence(ai_result["deepfake_result"])
+            video.ai_label = determine_label(ai_result)
+            video.genuinity_score = ai_result["genuinity"]
+            video.ai_status = "completed"
+            # re-uploads of the same content waiting on this run
+            sibling_ids = propagate_results(db, video)
+            emit(db, "video.ai_completed", _ai_event(video, sibling_ids), key=video_id)
+            db.commit()
+            
+        except Exception as e:
+            db.rollback()  # drop a half-written result (and its event) before recording the failure
+            video.ai_status = "failed"
+            sibling_ids = []
+            # followers don't inherit the failure: one of them gets its own run
+            rerun_id = claim_rerun(db, video)
+            emit(db, "video.ai_failed", _ai_event(video, sibling_ids), key=video_id)
+            db.commit()
+            print(f"processing failed for video {video_id}: {e}")
         
-        ai_result = await call_ai_service(video_data, video_id)
-        
-        video.ai_score = extract_confidence(ai_result["deepfake_result"])
-        video.ai_label = determine_label(ai_result)
-        video.genuinity_score = ai_result["genuinity"]
-        video.ai_status = "completed"
-        db.commit()
-        
-    except Exception as e:
-        video.ai_status = "failed"
-        db.commit()
-        print(f"processing failed for video {video_id}: {e}")
+        _announce(video, sibling_ids)
+        if rerun_id is not None:
+            await trigger_analysis(rerun_id)
     finally:
         db.close()
 
+def _announce(video: Video, sibling_ids):
+    """Post-commit side effects; cache and notify outages are logged by the callees, not raised"""
+    invalidate_video(video.id, *sibling_ids)
+    _publish_with_siblings(video, sibling_ids)
+
+def _ai_event(video: Video, sibling_ids):
+    return {
+        "video_id": video.id,
+        "creator_id": video.creator_id,
+        "ai_status": video.ai_status,
+        "ai_score": video.ai_score,
+        "ai_label": video.ai_label,
+        "sibling_ids": list(sibling_ids),
+    }
+
+def _publish_with_siblings(video: Video, sibling_ids):
+    payload = status_payload(video)
+    publish_status(payload, *({**payload, "video_id": vid} for vid in sibling_ids))
+
 def download_from_s3(s3_key: str) -> bytes:
     response = s3_client.get_object(Bucket=BUCKET_NAME, Key=s3_key)
     return response['Body'].read()
@@ -0,0 +1,203 @@
+# app/services/view_counter.py
+"""
+Buffered view counting.
+
+Views are added to a counter in memory (or in Redis) and a background
+flusher applies them every VIEW_FLUSH_INTERVAL_S. Each flush is one
+aggregated UPDATE per batch of up to VIEW_FLUSH_BATCH videos:
+
+    UPDATE videos SET view_count = view_count + d.n
+    FROM (VALUES (:id0, :n0), ...) AS d(id, n) WHERE videos.id = d.id
+
+so a viral video costs one row update per interval instead of one per view.
+
+Guarantees
+  - Staleness: Video.view_count lags by at most one interval plus the flush
+    time (and the video cache TTL for GET /videos/{id}).
+  - Memory backend: if a worker dies without shutting down, the views it took
+    since its last flush are lost, i.e. at most one interval's worth. On a
+    clean shutdown the buffer is flushed. A failed flush puts its counts back
+    and retries them on the next interval.
+  - Redis backend (VIEW_COUNTER_BACKEND=redis): counts survive worker crashes.
+    A flush claims the pending hash with RENAME. If the worker dies while
+    holding a claim, another worker picks it up after VIEW_FLUSH_ORPHAN_S.
+    This is at-least-once: a crash after the DB commit but before the claim
+    is deleted counts that batch twice.
+  - Rows are updated in id order, so concurrent flushes from several workers
+    can't deadlock each other.
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Tuple
+
+from sqlalchemy import text
+from redis.exceptions import ResponseError
+
+from database.session import engine
+from . import metrics
+from ..storage.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+VIEW_COUNTER_BACKEND = os.getenv("VIEW_COUNTER_BACKEND", "memory")  # memory | redis
+VIEW_FLUSH_INTERVAL_S = float(os.getenv("VIEW_FLUSH_INTERVAL_S", "5"))
+VIEW_FLUSH_BATCH = 5000
+VIEW_COUNTER_SHARDS = 16
+VIEW_FLUSH_ORPHAN_S = float(os.getenv("VIEW_FLUSH_ORPHAN_S", "300"))
+
+PENDING_KEY = "views:pending"
+CLAIM_PREFIX = "views:flushing:"
+
+
+class ShardedViewCounter:
+    """
+    In-process counter split into shards, so many threads counting the same
+    hot video don't all wait on one lock. Each thread gets the next shard
+    round-robin on first use (thread idents are aligned addresses, so
+    get_ident() % shards would put every thread on the same one).
+    """
+
+    def __init__(self, shards: int = VIEW_COUNTER_SHARDS):
+        self._shards: List[Tuple[threading.Lock, Dict[int, int]]] = [
+            (threading.Lock(), {}) for _ in range(shards)
+        ]
+        self._next_shard = itertools.count()
+        self._local = threading.local()
+
+    def _shard(self) -> Tuple[threading.Lock, Dict[int, int]]:
+        index = getattr(self._local, "index", None)
+        if index is None:
+            index = self._local.index = next(self._next_shard) % len(self._shards)
+        return self._shards[index]
+
+    def record(self, video_id: int, n: int = 1) -> None:
+        lock, counts = self._shard()
+        with lock:
+            counts[video_id] = counts.get(video_id, 0) + n
+
+    def drain(self) -> Dict[int, int]:
+        """Take everything counted so far, leaving the shards empty"""
+        total: Dict[int, int] = {}
+        for lock, shard in self._shards:
+            with lock:
+                counts = dict(shard)
+                shard.clear()
+            for video_id, n in counts.items():
+                total[video_id] = total.get(video_id, 0) + n
+        return total
+
+    def restore(self, counts: Dict[int, int]) -> None:
+        for video_id, n in counts.items():
+            self.record(video_id, n)
+
+    def pending(self) -> int:
+        return sum(sum(c.values()) for _, c in self._shards)
+
+
+class RedisViewCounter:
+    """HINCRBY into one shared hash; flushes claim it atomically with RENAME"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def record(self, video_id: int, n: int = 1) -> None:
+        self.client.hincrby(PENDING_KEY, video_id, n)
+
+    def _claim(self, key: str):
+        claim = f"{CLAIM_PREFIX}{int(time.time())}:{uuid.uuid4().hex}"
+        try:
+            self.client.rename(key, claim)
+        except ResponseError:
+            return None  # nothing pending / someone else got it
+        return claim
+
+    def claims(self) -> List[str]:
+        """Claim the pending hash plus any batch orphaned by a crashed flusher"""
+        out = []
+        claim = self._claim(PENDING_KEY)
+        if claim:
+            out.append(claim)
+        cutoff = time.time() - VIEW_FLUSH_ORPHAN_S
+        for key in self.client.scan_iter(match=CLAIM_PREFIX + "*"):
+            if int(key[len(CLAIM_PREFIX):].split(":", 1)[0]) < cutoff:
+                claim = self._claim(key)
+                if claim:
+                    out.append(claim)
+        return out
+
+    def read(self, claim: str) -> Dict[int, int]:
+        return {int(k): int(v) for k, v in self.client.hgetall(claim).items()}
+
+    def release(self, claim: str) -> None:
+        self.client.delete(claim)
+
+    def pending(self) -> int:
+        return sum(int(v) for v in self.client.hvals(PENDING_KEY))
+
+
+def _make_counter():
+    if VIEW_COUNTER_BACKEND == "redis":
+        client = get_redis()
+        if client is None:
+            raise RuntimeError("VIEW_COUNTER_BACKEND=redis but REDIS_URL is not set")
+        return RedisViewCounter(client)
+    return ShardedViewCounter()
+
+
+view_counter = _make_counter()
+
+
+def record_view(video_id: int) -> None:
+    view_counter.record(video_id)
+    metrics.incr("views.recorded")
+
+
+def apply_view_counts(counts: Dict[int, int]) -> int:
+    """One UPDATE ... FROM (VALUES ...) per batch, all in one transaction"""
+    if not counts:
+        return 0
+    items = sorted(counts.items())
+    with engine.begin() as conn:
+        for start in range(0, len(items), VIEW_FLUSH_BATCH):
+            batch = items[start:start + VIEW_FLUSH_BATCH]
+            values = ", ".join(f"(:id{i}, :n{i})" for i in range(len(batch)))
+            params = {}
+            for i, (video_id, n) in enumerate(batch):
+                params[f"id{i}"] = video_id
+                params[f"n{i}"] = n
+            conn.execute(
+                text(
+                    "UPDATE videos SET view_count = COALESCE(videos.view_count, 0) + d.n "
+                    f"FROM (VALUES {values}) AS d(id, n) WHERE videos.id = d.id"
+                ),
+                params,
+            )
+    return len(items)
+
+
+def flush_views() -> int:
+    """Apply buffered views; returns the number of videos updated"""
+    started = time.perf_counter()
+    updated = 0
+    if isinstance(view_counter, RedisViewCounter):
+        for claim in view_counter.claims():
+            counts = view_counter.read(claim)
+            # on failure the claim stays and is retried once it's orphaned
+            updated += apply_view_counts(counts)
+            view_counter.release(claim)
+            metrics.incr("views.flushed", sum(counts.values()))
+    else:
+        counts = view_counter.drain()
+        try:
+            updated = apply_view_counts(counts)
+        except Exception:
+            view_counter.restore(counts)
+            raise
+        metrics.incr("views.flushed", sum(counts.values()))
+    metrics.set_gauge("views.last_flush_ms", (time.perf_counter() - started) * 1000)
+    metrics.set_gauge("views.last_flush_videos", updated)
+    return updated
@@ -0,0 +1,118 @@
+# app/services/wallet_reset.py
+"""
+Monthly refill of TokenWallet.monthly_budget.
+
+A run for a period walks token_wallets in wallet_id ranges of
+WALLET_RESET_CHUNK:
+
+    UPDATE token_wallets SET monthly_budget = :budget
+    WHERE wallet_id > :lo AND wallet_id <= :hi
+
+Each chunk commits together with the run's checkpoint in wallet_reset_runs,
+so a crashed or interrupted run resumes where it stopped and no wallet is
+refilled twice. A completed period is never applied again. Wallets created
+after the run started already get the default budget.
+
+Between chunks the job sleeps WALLET_RESET_THROTTLE times as long as the
+chunk took (at least WALLET_RESET_MIN_PAUSE_S). This keeps the primary's
+write load and replication lag bounded. One session-level advisory lock
+keeps the run to a single worker.
+"""
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+
+from database.session import engine
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+MONTHLY_BUDGET = int(os.getenv("MONTHLY_BUDGET", "10"))
+WALLET_RESET_CHUNK = int(os.getenv("WALLET_RESET_CHUNK", "10000"))
+WALLET_RESET_THROTTLE = float(os.getenv("WALLET_RESET_THROTTLE", "0.5"))
+WALLET_RESET_MIN_PAUSE_S = float(os.getenv("WALLET_RESET_MIN_PAUSE_S", "0.01"))
+# opt-in: with WALLET_RESET_AUTO=1 every worker checks hourly and applies the new month once
+WALLET_RESET_AUTO = os.getenv("WALLET_RESET_AUTO", "0") == "1"
+WALLET_RESET_INTERVAL_S = float(os.getenv("WALLET_RESET_INTERVAL_S", "3600"))
+
+_LOCK_KEY = "wallet_reset"
+
+
+def current_period() -> str:
+    return datetime.now(tz=timezone.utc).strftime("%Y-%m")
+
+
+def _start_run(conn, period: str, budget: int) -> Optional[dict]:
+    """The period's run row, created if needed; None if it already completed"""
+    conn.execute(text("""
+        INSERT INTO wallet_reset_runs (period, budget, max_wallet_id, last_wallet_id)
+        SELECT :period, :budget, COALESCE(max(wallet_id), 0), 0 FROM token_wallets
+        ON CONFLICT (period) DO NOTHING
+    """), {"period": period, "budget": budget})
+    run = conn.execute(
+        text("SELECT * FROM wallet_reset_runs WHERE period = :period"), {"period": period}
+    ).mappings().one()
+    return None if run["completed_at"] is not None else dict(run)
+
+
+def reset_wallets(period: Optional[str] = None, budget: int = MONTHLY_BUDGET,
+                  chunk: int = WALLET_RESET_CHUNK, throttle: float = WALLET_RESET_THROTTLE) -> dict:
+    """Refill every wallet's monthly budget for `period` (default: this month)"""
+    period = period or current_period()
+    stats = {"period": period, "status": "done", "wallets": 0, "chunks": 0}
+    started = time.perf_counter()
+
+    with engine.connect() as lock_conn:
+        if not lock_conn.execute(text("SELECT pg_try_advisory_lock(hashtext(:key))"), {"key": _LOCK_KEY}).scalar():
+            stats["status"] = "locked"
+            return stats
+        try:
+            with engine.begin() as conn:
+                run = _start_run(conn, period, budget)
+            if run is None:
+                stats["status"] = "already_applied"
+                return stats
+
+            lo, max_id = run["last_wallet_id"], run["max_wallet_id"]
+            if lo:
+                logger.info(f"wallet reset {period}: resuming after wallet {lo} of {max_id}")
+            while lo < max_id:
+                hi = min(lo + chunk, max_id)
+                t0 = time.perf_counter()
+                with engine.begin() as conn:
+                    n = conn.execute(
+                        text(
+                            "UPDATE token_wallets SET monthly_budget = :budget, version = version + 1 "
+                            "WHERE wallet_id > :lo AND wallet_id <= :hi"
+                        ),
+                        {"budget": run["budget"], "lo": lo, "hi": hi},
+                    ).rowcount
+                    conn.execute(
+                        text("UPDATE wallet_reset_runs SET last_wallet_id = :hi WHERE period = :period"),
+                        {"hi": hi, "period": period},
+                    )
+                took = time.perf_counter() - t0
+                lo = hi
+                stats["wallets"] += n
+                stats["chunks"] += 1
+                metrics.incr("wallet_reset.wallets", n)
+                if stats["chunks"] % 100 == 0:
+                    logger.info(f"wallet reset {period}: {lo}/{max_id} ({stats['wallets']} wallets)")
+                time.sleep(max(WALLET_RESET_MIN_PAUSE_S, took * throttle))
+
+            with engine.begin() as conn:
+                conn.execute(
+                    text("UPDATE wallet_reset_runs SET completed_at = now() WHERE period = :period"),
+                    {"period": period},
+                )
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": _LOCK_KEY})
+
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    logger.info(f"wallet reset finished: {stats}")
+    return stats
+
@@ -0,0 +1,86 @@
+# app/services/wallets.py
+"""
+Wallet balance changes without lost updates.
+
+Spending reads the wallet, decides in Python which balance pays (monthly
+first, then bonus), and writes back with a compare-and-set on
+TokenWallet.version:
+
+    UPDATE token_wallets SET monthly_budget = :m, bonus_balance = :b, version = version + 1
+    WHERE wallet_id = :id AND version = :v
+
+If another spend got there first, 0 rows match. The spend re-reads and
+retries, up to WALLET_MAX_RETRIES times with a small jittered backoff, then
+gives up with WalletBusy. Nothing is locked between the read and the write,
+so parallel taps from one user don't queue behind SELECT ... FOR UPDATE.
+Credits are a plain `balance + n` and bump the version too, so they can't
+be lost either. The statements run in the caller's transaction (no commit).
+
+Counters in /health/metrics: wallets.spend.ok, wallets.spend.conflicts
+(failed compare-and-sets), wallets.spend.busy (gave up after retries).
+"""
+import os
+import random
+import time
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from . import metrics
+
+WALLET_MAX_RETRIES = int(os.getenv("WALLET_MAX_RETRIES", "8"))
+WALLET_RETRY_BACKOFF_S = 0.002
+
+
+class InsufficientTokens(Exception):
+    pass
+
+
+class WalletBusy(Exception):
+    """Too many concurrent changes to the same wallet; the client should retry"""
+
+
+def spend_token(db: Session, wallet_id: int, amount: int = 1) -> Tuple[int, int]:
+    """Take `amount` tokens (monthly first); returns the new (monthly_budget, bonus_balance)"""
+    for attempt in range(WALLET_MAX_RETRIES):
+        row = db.execute(
+            text("SELECT monthly_budget, bonus_balance, version FROM token_wallets WHERE wallet_id = :id"),
+            {"id": wallet_id},
+        ).one()
+        monthly, bonus = row.monthly_budget or 0, row.bonus_balance or 0
+        if monthly + bonus < amount:
+            raise InsufficientTokens()
+        from_monthly = min(monthly, amount)
+        new_monthly, new_bonus = monthly - from_monthly, bonus - (amount - from_monthly)
+
+        updated = db.execute(
+            text("""
+                UPDATE token_wallets
+                SET monthly_budget = :m, bonus_balance = :b, version = version + 1
+                WHERE wallet_id = :id AND version = :v
+            """),
+            {"m": new_monthly, "b": new_bonus, "id": wallet_id, "v": row.version},
+        ).rowcount
+        if updated:
+            metrics.incr("wallets.spend.ok")
+            return new_monthly, new_bonus
+
+        metrics.incr("wallets.spend.conflicts")
+        time.sleep(random.uniform(0, WALLET_RETRY_BACKOFF_S * (attempt + 1)))
+
+    metrics.incr("wallets.spend.busy")
+    raise WalletBusy()
+
+
+def credit_bonus(db: Session, user_id: int, amount: int = 1) -> Optional[int]:
+    """Add to the user's bonus balance; returns the new total balance, None without a wallet"""
+    return db.execute(
+        text("""
+            UPDATE token_wallets
+            SET bonus_balance = bonus_balance + :n, version = version + 1
+            WHERE user_id = :user_id
+            RETURNING bonus_balance + monthly_budget
+        """),
+        {"n": amount, "user_id": user_id},
+    ).scalar()
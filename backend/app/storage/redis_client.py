@@ -0,0 +1,37 @@
+import os
+import threading
+
+import redis
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+_client = None
+_bytes_client = None
+_lock = threading.Lock()
+
+
+def get_redis():
+    """
+    Shared Redis client, or None when REDIS_URL isn't set.
+    Callers fall back to their in-process backend in that case.
+    """
+    global _client
+    if not REDIS_URL:
+        return None
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    return _client
+
+
+def get_redis_bytes():
+    """Like get_redis(), but returns raw bytes (for bitmaps and other binary values)"""
+    global _bytes_client
+    if not REDIS_URL:
+        return None
+    if _bytes_client is None:
+        with _lock:
+            if _bytes_client is None:
+                _bytes_client = redis.Redis.from_url(REDIS_URL, decode_responses=False)
+    return _bytes_client
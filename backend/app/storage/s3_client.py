@@ -19,10 +19,12 @@ s3_client = boto3.client(
     region_name=AWS_REGION
 )
 
-async def upload_video_to_s3(file_content: bytes, filename, user_id):
+async def upload_video_to_s3(file_obj: IO[bytes], filename, user_id):
     """
     Upload video to S3 & return s3 key
-    
+
+    file_obj is streamed (multipart for large files), so the video never has
+    to be held in memory as a single bytes object.
     """
     try:
         # unqiue s3 key --> user_id/{unique_hash}
@@ -30,11 +32,11 @@ async def upload_video_to_s3(file_content: bytes, filename, user_id):
         s3_key = f"videos/{user_id}/{uuid.uuid4()}.{file_extension}"
         
         # upload 
-        s3_client.put_object(
-            Bucket=BUCKET_NAME,
-            Key=s3_key,
-            Body=file_content,
-            ContentType=f"video/{file_extension}"
+        s3_client.upload_fileobj(
+            file_obj,
+            BUCKET_NAME,
+            s3_key,
+            ExtraArgs={"ContentType": f"video/{file_extension}"},
         )
         
         # unqiue S3 url each correpsonding to a 
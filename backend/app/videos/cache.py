@@ -0,0 +1,19 @@
+# app/videos/cache.py
+import os
+
+from ..services.cache import ReadThroughCache
+
+VIDEO_CACHE_TTL_S = float(os.getenv("VIDEO_CACHE_TTL_S", "60"))
+# short: other workers with the in-memory backend only see invalidations via expiry
+AI_STATUS_CACHE_TTL_S = float(os.getenv("AI_STATUS_CACHE_TTL_S", "5"))
+
+video_cache = ReadThroughCache("video", VIDEO_CACHE_TTL_S)
+ai_status_cache = ReadThroughCache("video_ai_status", AI_STATUS_CACHE_TTL_S)
+
+
+def invalidate_video(*video_ids: int) -> None:
+    """Call after committing anything that changes a video's detail / AI status"""
+    if not video_ids:
+        return
+    video_cache.invalidate(*video_ids)
+    ai_status_cache.invalidate(*video_ids)
@@ -0,0 +1,101 @@
+# app/videos/feed.py
+"""
+Keyset-paginated video feed.
+
+Pages are ordered newest first on (created_at, id) and continue with
+`(created_at, id) < (:cursor_created_at, :cursor_id)`, so page N costs the
+same as page 1 (no OFFSET). Only the requested columns are selected; the
+default projection is covered by the ix_videos_*feed indexes.
+"""
+import base64
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from database.models import Video, User
+
+FEED_FIELDS = (
+    "id", "title", "description", "creator_id", "creator_username", "duration_s",
+    "view_count", "ai_status", "ai_score", "ai_label", "created_at",
+)
+DEFAULT_FEED_FIELDS = (
+    "id", "title", "creator_id", "creator_username", "duration_s",
+    "view_count", "ai_score", "ai_label", "created_at",
+)
+
+
+def encode_cursor(created_at: datetime, video_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{video_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, video_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(video_id)
+    except Exception:
+        raise HTTPException(400, "invalid cursor")
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return list(DEFAULT_FEED_FIELDS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = sorted(set(requested) - set(FEED_FIELDS))
+    if unknown:
+        raise HTTPException(400, f"unknown fields: {', '.join(unknown)}")
+    # id is always returned so items can be addressed
+    return ["id"] + [f for f in requested if f != "id"]
+
+
+def _usernames(db: Session, creator_ids: Iterable[int]) -> dict:
+    ids = {i for i in creator_ids if i is not None}
+    if not ids:
+        return {}
+    return dict(db.query(User.id, User.username).filter(User.id.in_(ids)).all())
+
+
+def fetch_feed_page(
+    db: Session,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    creator_id: Optional[int] = None,
+    ai_label: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    fields = fields or list(DEFAULT_FEED_FIELDS)
+    # created_at/id are needed for the cursor; creator_id for the username lookup
+    columns = {"id", "created_at"} | {f for f in fields if f != "creator_username"}
+    if "creator_username" in fields:
+        columns.add("creator_id")
+    selected = [getattr(Video, c) for c in sorted(columns)]
+
+    q = db.query(*selected)
+    if creator_id is not None:
+        q = q.filter(Video.creator_id == creator_id)
+    if ai_label is not None:
+        q = q.filter(Video.ai_label == ai_label)
+    if cursor:
+        c_created_at, c_id = decode_cursor(cursor)
+        q = q.filter(tuple_(Video.created_at, Video.id) < tuple_(c_created_at, c_id))
+    rows = q.order_by(Video.created_at.desc(), Video.id.desc()).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # one batched lookup for the whole page instead of a join / query per row
+    names = _usernames(db, (r.creator_id for r in rows)) if "creator_username" in fields else {}
+
+    items = []
+    for r in rows:
+        item = {}
+        for f in fields:
+            item[f] = names.get(r.creator_id) if f == "creator_username" else getattr(r, f)
+        items.append(item)
+
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+    return items, next_cursor
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import List, Optional
 
 class VideoUploadRequest(BaseModel):
     title: str = Field(..., max_length=100)
@@ -20,4 +21,31 @@ class VideoResponse(BaseModel):
 class VideoUploadResponse(BaseModel):
     video_id: int
     title: str
-    message: str = "video uploaded successfully"
\ No newline at end of file
+    message: str = "video uploaded successfully"
+
+class VideoFeedItem(BaseModel):
+    # every field is optional: only the ones asked for via ?fields= are returned
+    id: int
+    title: str | None = None
+    description: str | None = None
+    creator_id: int | None = None
+    creator_username: str | None = None
+    duration_s: int | None = None
+    view_count: int | None = None
+    ai_status: str | None = None
+    ai_score: float | None = None
+    ai_label: str | None = None
+    created_at: datetime | None = None
+
+class VideoFeedPage(BaseModel):
+    items: List[VideoFeedItem]
+    next_cursor: Optional[str] = None
+
+class TrendingVideoOut(BaseModel):
+    video_id: int
+    score: float  # decayed appreciation + view weight as of `as_of`
+
+class TrendingPage(BaseModel):
+    as_of: datetime
+    half_life_s: float
+    items: List[TrendingVideoOut]
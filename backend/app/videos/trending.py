@@ -0,0 +1,258 @@
+# app/videos/trending.py
+"""
+Trending videos: exponentially decayed appreciation + view momentum.
+
+A video's score at time t is  sum(w_i * exp(-LAMBDA * (t - t_i)))  over its
+events, where w is TRENDING_APPRECIATION_WEIGHT or TRENDING_VIEW_WEIGHT and
+LAMBDA = ln 2 / TRENDING_HALF_LIFE_S. Each video stores one number:
+
+    log_score = log(sum(w_i * exp(LAMBDA * t_i)))
+
+so the decay never has to be applied to stored rows. An event is a single
+logaddexp. Because every video shares the exp(-LAMBDA * t) factor, ordering
+by log_score is ordering by the current score, and the current score is just
+exp(log_score - LAMBDA * now) when shown.
+
+Backends (TRENDING_BACKEND):
+  - memory (default): log_score per video, plus a bounded min-heap of the
+    TRENDING_HEAP_SIZE best. Scores only ever grow, so the heap always holds
+    the exact top TRENDING_HEAP_SIZE. A video outside it re-enters when an
+    event lifts it above the heap's minimum. Stale heap entries are skipped
+    and compacted away. Each worker only sees the events it handles, and at
+    startup seed_from_db() replays recent appreciations (views have no
+    timestamps in the DB).
+  - redis: a ZSET scored by log_score, updated by a small Lua script and
+    shared by all workers. top() is ZREVRANGE.
+
+Both cost O(1) (heap: O(log TRENDING_HEAP_SIZE)) per event, and top() never
+touches the DB. prune() drops videos whose score has decayed below
+TRENDING_MIN_SCORE, so memory follows the active set rather than every video
+ever seen.
+"""
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from sqlalchemy import text
+
+from database.session import engine
+from ..services import metrics
+from ..storage.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+TRENDING_BACKEND = os.getenv("TRENDING_BACKEND", "memory")  # memory | redis | off
+TRENDING_HALF_LIFE_S = float(os.getenv("TRENDING_HALF_LIFE_S", str(6 * 3600)))
+TRENDING_APPRECIATION_WEIGHT = float(os.getenv("TRENDING_APPRECIATION_WEIGHT", "10"))
+TRENDING_VIEW_WEIGHT = float(os.getenv("TRENDING_VIEW_WEIGHT", "1"))
+TRENDING_HEAP_SIZE = int(os.getenv("TRENDING_HEAP_SIZE", "500"))
+TRENDING_MIN_SCORE = float(os.getenv("TRENDING_MIN_SCORE", "0.01"))
+TRENDING_PRUNE_INTERVAL_S = float(os.getenv("TRENDING_PRUNE_INTERVAL_S", "600"))
+TRENDING_SEED_HALF_LIVES = 4  # older appreciations are worth < 1/16 of a fresh one
+
+LAMBDA = math.log(2) / TRENDING_HALF_LIFE_S
+EPOCH = 1_700_000_000  # keeps LAMBDA * t small; any fixed instant works
+REDIS_KEY = "trending:videos"
+
+
+def _log_weight(weight: float, ts: float) -> float:
+    return math.log(weight) + LAMBDA * (ts - EPOCH)
+
+
+def _logaddexp(a: float, b: float) -> float:
+    hi, lo = (a, b) if a >= b else (b, a)
+    return hi + math.log1p(math.exp(lo - hi))
+
+
+def current_score(log_score: float, now: float) -> float:
+    return math.exp(log_score - LAMBDA * (now - EPOCH))
+
+
+class MemoryTrending:
+    def __init__(self, heap_size: int = TRENDING_HEAP_SIZE):
+        self.heap_size = heap_size
+        self.scores: Dict[int, float] = {}
+        self._heap: List[Tuple[float, int]] = []  # (log_score, video_id), may hold stale entries
+        self._in_heap: Dict[int, float] = {}  # video_id -> log_score of its live heap entry
+        self._lock = threading.Lock()
+
+    def add(self, video_id: int, weight: float, ts: float) -> None:
+        x = _log_weight(weight, ts)
+        with self._lock:
+            old = self.scores.get(video_id)
+            s = x if old is None else _logaddexp(old, x)
+            self.scores[video_id] = s
+            if video_id in self._in_heap:
+                self._in_heap[video_id] = s
+                heapq.heappush(self._heap, (s, video_id))  # older entry goes stale
+            elif len(self._in_heap) < self.heap_size:
+                self._in_heap[video_id] = s
+                heapq.heappush(self._heap, (s, video_id))
+            elif s > self._heap_min():
+                _, evicted = heapq.heappop(self._heap)
+                del self._in_heap[evicted]
+                self._in_heap[video_id] = s
+                heapq.heappush(self._heap, (s, video_id))
+            if len(self._heap) > 2 * self.heap_size:
+                self._compact()
+
+    def _heap_min(self) -> float:
+        """Smallest live entry; drops stale ones from the top on the way"""
+        while self._heap:
+            s, video_id = self._heap[0]
+            if self._in_heap.get(video_id) == s:
+                return s
+            heapq.heappop(self._heap)
+        return -math.inf
+
+    def _compact(self) -> None:
+        self._heap = [(s, v) for v, s in self._in_heap.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, limit: int) -> List[Tuple[int, float]]:
+        """[(video_id, log_score)] best first; O(K log K) over the bounded heap"""
+        with self._lock:
+            best = heapq.nlargest(limit, self._in_heap.items(), key=lambda kv: kv[1])
+        return best
+
+    def prune(self, min_log_score: float) -> int:
+        with self._lock:
+            dead = [v for v, s in self.scores.items() if s < min_log_score]
+            for v in dead:
+                del self.scores[v]
+                self._in_heap.pop(v, None)
+            if dead:
+                self._compact()
+        return len(dead)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "videos": len(self.scores), "heap": len(self._in_heap)}
+
+
+_ADD_LUA = """
+local old = redis.call('ZSCORE', KEYS[1], ARGV[1])
+local x = tonumber(ARGV[2])
+if old then
+  old = tonumber(old)
+  local hi, lo = math.max(old, x), math.min(old, x)
+  x = hi + math.log(1 + math.exp(lo - hi))
+end
+redis.call('ZADD', KEYS[1], x, ARGV[1])
+return 1
+"""
+
+
+class RedisTrending:
+    def __init__(self, client, key: str = REDIS_KEY):
+        self.client = client
+        self.key = key
+        self._add = client.register_script(_ADD_LUA)
+
+    def add(self, video_id: int, weight: float, ts: float) -> None:
+        self._add(keys=[self.key], args=[video_id, repr(_log_weight(weight, ts))])
+
+    def top(self, limit: int) -> List[Tuple[int, float]]:
+        return [(int(v), s) for v, s in self.client.zrevrange(self.key, 0, limit - 1, withscores=True)]
+
+    def prune(self, min_log_score: float) -> int:
+        return self.client.zremrangebyscore(self.key, "-inf", f"({min_log_score!r}")
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "videos": self.client.zcard(self.key)}
+
+
+def _make_trending():
+    if TRENDING_BACKEND == "redis":
+        client = get_redis()
+        if client is None:
+            raise RuntimeError("TRENDING_BACKEND=redis but REDIS_URL is not set")
+        return RedisTrending(client)
+    return MemoryTrending()
+
+
+trending = _make_trending() if TRENDING_BACKEND != "off" else None
+
+
+def _record(video_id: int, weight: float) -> None:
+    if trending is None:
+        return
+    try:
+        trending.add(video_id, weight, time.time())
+    except Exception as e:
+        metrics.incr("trending.errors")
+        logger.warning(f"trending update failed: {e}")
+
+
+def record_appreciation(video_id: int) -> None:
+    _record(video_id, TRENDING_APPRECIATION_WEIGHT)
+
+
+def record_view(video_id: int) -> None:
+    _record(video_id, TRENDING_VIEW_WEIGHT)
+
+
+def top(limit: int) -> List[Tuple[int, float]]:
+    """[(video_id, current score)] best first"""
+    if trending is None:
+        return []
+    now = time.time()
+    return [(v, current_score(s, now)) for v, s in trending.top(limit)]
+
+
+def prune() -> int:
+    """Background job: forget videos whose score decayed below TRENDING_MIN_SCORE"""
+    if trending is None:
+        return 0
+    dropped = trending.prune(_log_weight(TRENDING_MIN_SCORE, time.time()))
+    if dropped:
+        logger.info(f"trending: pruned {dropped} cold videos")
+    return dropped
+
+
+def seed_from_db() -> None:
+    """Replay recent appreciations into a cold per-worker engine"""
+    if not isinstance(trending, MemoryTrending):
+        return  # the shared ZSET outlives workers
+    window = TRENDING_SEED_HALF_LIVES * TRENDING_HALF_LIFE_S
+    seeded = 0
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT video_id, extract(epoch FROM date_trunc('minute', used_at)) AS ts, count(*) AS n
+            FROM appreciation_tokens
+            WHERE used_at >= now() - make_interval(secs => :window) AND video_id IS NOT NULL
+            GROUP BY 1, 2
+        """), {"window": window})
+        for video_id, ts, n in rows:
+            trending.add(video_id, n * TRENDING_APPRECIATION_WEIGHT, float(ts))
+            seeded += n
+    logger.info(f"trending seeded with {seeded} recent appreciations")
+
+
+def start_seeding() -> None:
+    threading.Thread(target=_seed_safely, name="trending-seed", daemon=True).start()
+
+
+def _seed_safely() -> None:
+    try:
+        seed_from_db()
+    except Exception as e:
+        logger.error(f"trending seed failed, starting cold: {e}")
+
+
+def _stats() -> dict:
+    if trending is None:
+        return {"backend": "off"}
+    try:
+        stats = trending.stats()
+    except Exception as e:
+        return {"error": str(e)}
+    stats["half_life_s"] = TRENDING_HALF_LIFE_S
+    return stats
+
+
+metrics.register_collector("trending", _stats)
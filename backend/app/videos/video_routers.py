@@ -1,4 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from database.session import get_db
 from database.models import Video, User
@@ -6,11 +13,54 @@ from ..auth.auth_utils import get_current_user
 from ..storage.s3_client import upload_video_to_s3, generate_presigned_url
 
 from ..services.video_inference import trigger_analysis
+from ..services.video_dedup import digest_upload, find_donor, adopt_donor, lock_content
+from ..services.mp4_metadata import Mp4HeaderParser, apply_metadata
+from ..services.view_counter import record_view
+from ..services.ai_status_hub import ai_status_hub, HubFull, TERMINAL_STATUSES, status_payload
 
-from .schemas import VideoUploadResponse, VideoResponse
+from .schemas import VideoUploadResponse, VideoResponse, VideoFeedItem, VideoFeedPage, TrendingPage, TrendingVideoOut
+from .feed import fetch_feed_page, parse_fields, FEED_FIELDS
+from .cache import video_cache, ai_status_cache, invalidate_video
+from . import trending
 
 router = APIRouter(prefix="/videos", tags=["Videos"])
 
+AI_STATUS_HEARTBEAT_S = float(os.getenv("AI_STATUS_HEARTBEAT_S", "15"))
+AI_STATUS_STREAM_MAX_S = float(os.getenv("AI_STATUS_STREAM_MAX_S", "600"))  # client reconnects after this
+AI_STATUS_RETRY_MS = 3000
+
+@router.get("", response_model=VideoFeedPage, response_model_exclude_unset=True)
+def list_videos(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    creator_id: Optional[int] = None,
+    ai_label: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=f"comma-separated subset of: {', '.join(FEED_FIELDS)}"),
+    db: Session = Depends(get_db),
+):
+    items, next_cursor = fetch_feed_page(
+        db,
+        limit=limit,
+        cursor=cursor,
+        creator_id=creator_id,
+        ai_label=ai_label,
+        fields=parse_fields(fields),
+    )
+    return VideoFeedPage(items=[VideoFeedItem(**i) for i in items], next_cursor=next_cursor)
+
+# declared before /{video_id} so "trending" isn't parsed as an id
+@router.get("/trending", response_model=TrendingPage)
+def trending_videos(limit: int = Query(20, ge=1, le=100)):
+    """
+    Videos ranked by exponentially decayed appreciations and views, served
+    from memory/Redis without touching the DB (see app/videos/trending.py).
+    """
+    return TrendingPage(
+        as_of=datetime.now(timezone.utc),
+        half_life_s=trending.TRENDING_HALF_LIFE_S,
+        items=[TrendingVideoOut(video_id=v, score=s) for v, s in trending.top(limit)],
+    )
+
 @router.post("/upload", response_model=VideoUploadResponse)
 async def upload_video(
     title: str = Form(...),
@@ -23,11 +73,18 @@ async def upload_video(
     if not file.filename.lower().endswith('.mp4'):
         raise HTTPException(400, "only .mp4 supported")
     
-    file_content = await file.read()
+    # hash + parse MP4 headers while reading; the spooled file is rewound for the S3 upload
+    mp4 = Mp4HeaderParser()
+    content_sha256, file_size = await digest_upload(file, mp4.feed)
     
     try:
-        # updated to get s3 url 
-        s3_key, s3_url = await upload_video_to_s3(file_content, file.filename, user.id)
+        donor = find_donor(db, content_sha256)
+        if donor:
+            # same bytes already stored -> reuse the object, skip the upload
+            s3_key, s3_url = donor.s3_key, donor.s3_url
+        else:
+            # updated to get s3 url 
+            s3_key, s3_url = await upload_video_to_s3(file.file, file.filename, user.id)
         
         # Create video record with both s3_key and s3_url
         video = Video(
@@ -36,15 +93,25 @@ async def upload_video(
             description=description,
             s3_key=s3_key,
             s3_url=s3_url,
-            file_size=len(file_content),
+            file_size=file_size,
+            content_sha256=content_sha256,
             upload_status="completed"
         )
+        apply_metadata(video, mp4.metadata)
+        if donor:
+            # pick the donor again under the content lock: a run finishing after the
+            # lookup above would otherwise miss this row and leave it pending forever
+            lock_content(db, content_sha256)
+            donor = find_donor(db, content_sha256)
+        needs_inference = adopt_donor(video, donor)
         
         db.add(video)
         db.commit()
         db.refresh(video)
+        invalidate_video(video.id)
         
-        await trigger_analysis(video.id)
+        if needs_inference:
+            await trigger_analysis(video.id)
 
         return VideoUploadResponse(
             video_id=video.id,
@@ -55,11 +122,10 @@ async def upload_video(
         db.rollback()
         raise HTTPException(500, f"upload failed {str(e)}")
 
-@router.get("/{video_id}", response_model=VideoResponse)
-def get_video(video_id: int, db: Session = Depends(get_db)):
+def _load_video(video_id: int, db: Session):
     video = db.query(Video).join(User).filter(Video.id == video_id).first()
     if not video:
-        raise HTTPException(404, "video not found")
+        return None
     
     return VideoResponse(
         id=video.id,
@@ -72,7 +138,15 @@ def get_video(video_id: int, db: Session = Depends(get_db)):
         ai_score=video.ai_score,
         ai_label=video.ai_label,
         created_at=video.created_at
-    )
+    ).model_dump(mode="json")
+
+@router.get("/{video_id}", response_model=VideoResponse)
+def get_video(video_id: int, db: Session = Depends(get_db)):
+    data = video_cache.get_or_load(video_id, lambda: _load_video(video_id, db))
+    if not data:
+        raise HTTPException(404, "video not found")
+    
+    return VideoResponse(**data)
 
 @router.get("/{video_id}/url")
 def get_video_url(video_id: int, db: Session = Depends(get_db)):
@@ -86,16 +160,84 @@ def get_video_url(video_id: int, db: Session = Depends(get_db)):
         "presigned_url": generate_presigned_url(video.s3_key)  # temporary URL if needed
     }
 
-@router.get("/{video_id}/ai-status")
-def get_ai_status(video_id: int, db: Session = Depends(get_db)):
+def _load_ai_status(video_id: int, db: Session):
     video = db.get(Video, video_id)
     if not video:
+        return None
+    
+    return status_payload(video)
+
+@router.get("/{video_id}/ai-status")
+def get_ai_status(video_id: int, db: Session = Depends(get_db)):
+    status = ai_status_cache.get_or_load(video_id, lambda: _load_ai_status(video_id, db))
+    if not status:
         raise HTTPException(404, "vid not found")
     
-    return {
-        "video_id": video.id,
-        "ai_status": video.ai_status,
-        "ai_score": video.ai_score,
-        "ai_label": video.ai_label,
-        "genuinity_score": video.genuinity_score
-    }
\ No newline at end of file
+    return status
+
+@router.post("/{video_id}/views", status_code=202)
+def record_video_view(video_id: int, db: Session = Depends(get_db)):
+    """
+    Count one view. Buffered in memory/Redis and applied to view_count by a
+    background flush (see app/services/view_counter.py for the guarantees).
+    Unknown ids are rejected first, so they can't grow the view buffer or the
+    trending set; the check is served by video_cache for live videos.
+    """
+    if not video_cache.get_or_load(video_id, lambda: _load_video(video_id, db)):
+        raise HTTPException(404, "video not found")
+    record_view(video_id)
+    trending.record_view(video_id)
+    return {"video_id": video_id, "queued": True}
+
+@router.get("/{video_id}/ai-status/stream")
+async def stream_ai_status(video_id: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Server-sent events: the current status first, then one `ai-status` event
+    per state change until it is completed/failed. A comment line is sent
+    every AI_STATUS_HEARTBEAT_S so proxies keep the connection open.
+    """
+    try:
+        # subscribe before reading the snapshot so no update can fall in between
+        queue = ai_status_hub.subscribe(video_id)
+    except HubFull:
+        raise HTTPException(503, "too many ai-status streams", headers={"Retry-After": "5"})
+    
+    try:
+        status = await run_in_threadpool(_load_ai_status, video_id, db)  # sync Session: keep it off the loop
+    except Exception:
+        ai_status_hub.unsubscribe(video_id, queue)
+        raise
+    if not status:
+        ai_status_hub.unsubscribe(video_id, queue)
+        raise HTTPException(404, "vid not found")
+
+    def _event(payload):
+        return f"event: ai-status\ndata: {json.dumps(payload)}\n\n"
+
+    async def _events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + AI_STATUS_STREAM_MAX_S
+        try:
+            yield f"retry: {AI_STATUS_RETRY_MS}\n"
+            yield _event(status)
+            if status["ai_status"] in TERMINAL_STATUSES:
+                return
+            while loop.time() < deadline:
+                if await request.is_disconnected():
+                    return
+                try:
+                    payload = await asyncio.wait_for(queue.get(), AI_STATUS_HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield _event(payload)
+                if payload["ai_status"] in TERMINAL_STATUSES:
+                    return
+        finally:
+            ai_status_hub.unsubscribe(video_id, queue)
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
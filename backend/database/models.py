@@ -1,5 +1,5 @@
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, JSON, Enum, UniqueConstraint, Boolean, func
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, ForeignKey, Float, JSON, Enum, UniqueConstraint, Boolean, Index, func, DDL, event
 import enum
 from .session import Base
 from datetime import datetime, timezone
@@ -29,10 +29,13 @@ class TokenWallet(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     monthly_budget = Column(Integer, default=10)
     bonus_balance = Column(Integer, default=10) # Per month
+    version = Column(Integer, nullable=False, default=0, server_default="0")  # bumped on every balance change (app/services/wallets.py)
 
     # Relationships
     user = relationship("User", back_populates="wallet")
 
+FEED_INCLUDE_COLUMNS = ["creator_id", "title", "ai_label", "ai_score", "view_count", "duration_s"]
+
 class Video(Base):
     __tablename__ = "videos"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -48,9 +51,10 @@ class Video(Base):
     ai_score = Column(Float, default=0.0) # added AI scores 
     ai_label = Column(String) 
     meta_data = Column(JSON)
-    s3_key = Column(String, unique=True, nullable=False)
+    s3_key = Column(String, nullable=False, index=True)  # shared by re-uploads of the same content
     s3_url = Column(String, nullable=False)  # added S3 url 
     file_size = Column(Integer)
+    content_sha256 = Column(String(64), index=True)  # hex digest of the uploaded bytes
     upload_status = Column(String, default="pending")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -58,6 +62,13 @@ class Video(Base):
     creator = relationship("User", back_populates="videos")
     appreciation_tokens = relationship("AppreciationToken", back_populates="video", passive_deletes=True)
 
+    # Keyset feed on (created_at, id); INCLUDE makes the default projection index-only
+    __table_args__ = (
+        Index("ix_videos_feed", "created_at", "id", postgresql_include=FEED_INCLUDE_COLUMNS),
+        Index("ix_videos_creator_feed", "creator_id", "created_at", "id", postgresql_include=FEED_INCLUDE_COLUMNS),
+        Index("ix_videos_label_feed", "ai_label", "created_at", "id", postgresql_include=FEED_INCLUDE_COLUMNS),
+    )
+
 class AppreciationToken(Base):
     __tablename__ = "appreciation_tokens"
     token_id = Column(Integer, primary_key=True, autoincrement=True)
@@ -78,10 +89,26 @@ class Ad(Base):
     ad_id = Column(Integer, primary_key=True, autoincrement=True)
     title = Column(String, unique=True, nullable=False)
     duration = Column(Integer, nullable=False)
+    weight = Column(Float, nullable=False, default=1.0, server_default="1")  # relative serving weight; 0 = paused
 
     # Relationships
     ad_sessions = relationship("AdSession", back_populates="ad", passive_deletes=True)
 
+# any change to ads bumps the catalog version, so workers reload their snapshot (app/ads/catalog.py)
+AD_CATALOG_TRIGGER_DDL = """
+CREATE OR REPLACE FUNCTION bump_ad_catalog_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO cache_versions (name, version) VALUES ('ad_catalog', 1)
+    ON CONFLICT (name) DO UPDATE SET version = cache_versions.version + 1, updated_at = now();
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER ads_bump_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON ads
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_ad_catalog_version();
+"""
+event.listen(Ad.__table__, "after_create", DDL(AD_CATALOG_TRIGGER_DDL).execute_if(dialect="postgresql"))
+
 class AdSession(Base):
     __tablename__ = "ad_session"
     session_id = Column(Integer, primary_key=True, autoincrement=True)
@@ -96,6 +123,12 @@ class AdSession(Base):
     ad = relationship("Ad", back_populates="ad_sessions")
     user = relationship("User", back_populates="ad_sessions")
 
+    # open sessions only: start_ad_watch's duplicate check and the expiry sweeper
+    __table_args__ = (
+        Index("ix_ad_session_open", "user_id", "ad_id", postgresql_where=(is_completed == False)),
+        Index("ix_ad_session_open_started", "started_at", postgresql_where=(is_completed == False)),
+    )
+
 
 # class Comment(Base):
 #     __tablename__ = "comments"
@@ -153,4 +186,71 @@ class PoolShare(Base):
     share_pct = Column(Float, default=0.0)
     payout_amount = Column(Float, default=0.0)
 
-    __table_args__ = (UniqueConstraint("pool_id", "creator_id", name="uq_poolshare_pool_creator"),)
+    __table_args__ = (
+        UniqueConstraint("pool_id", "creator_id", name="uq_poolshare_pool_creator"),
+        # summary pages: ORDER BY payout_amount DESC, id within a pool
+        Index("ix_pool_shares_pool_payout", pool_id, payout_amount.desc(), id),
+    )
+
+# --- Pre-aggregated appreciation counts (maintained incrementally, see app/pools/rollups.py) ---
+class TokenDailyRollup(Base):
+    __tablename__ = "token_daily_rollup"
+    day = Column(Date, primary_key=True)  # UTC day of used_at
+    creator_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    video_id = Column(Integer, ForeignKey("videos.id", ondelete="CASCADE"), primary_key=True)
+    tok_cnt = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+# --- Progress markers for incremental jobs ---
+class JobWatermark(Base):
+    __tablename__ = "job_watermarks"
+    name = Column(String, primary_key=True)
+    last_id = Column(BigInteger, nullable=False, default=0)  # highest source id already applied
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# --- Version stamps for process-local caches (see app/services/versions.py) ---
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+    name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# --- Monthly wallet budget refills (see app/services/wallet_reset.py) ---
+class WalletResetRun(Base):
+    __tablename__ = "wallet_reset_runs"
+    period = Column(String(7), primary_key=True)  # 'YYYY-MM'
+    budget = Column(Integer, nullable=False)
+    max_wallet_id = Column(Integer, nullable=False)  # upper bound fixed when the run starts
+    last_wallet_id = Column(Integer, nullable=False, default=0)  # checkpoint: refilled up to here
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True))
+
+# --- Appreciation time series per video / creator (see app/analytics/series.py) ---
+class AppreciationSeries(Base):
+    __tablename__ = "appreciation_series"
+    subject = Column(String(7), primary_key=True)  # 'video' | 'creator'
+    subject_id = Column(Integer, primary_key=True)  # videos.id or users.id
+    granularity = Column(String(5), primary_key=True)  # 'hour' | 'day' | 'month'
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # UTC start of the bucket
+    tok_cnt = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # retention sweep of old hourly buckets
+        Index("ix_appreciation_series_hour_bucket", "bucket", postgresql_where=(granularity == "hour")),
+    )
+
+# --- Transactional outbox: events written with the change, relayed later (see app/services/outbox.py) ---
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    topic = Column(String, nullable=False)  # e.g. 'appreciation.created'
+    key = Column(String)  # ordering / partition hint for sinks, e.g. the video id
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    published_at = Column(DateTime(timezone=True))  # NULL until every sink took it
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        Index("ix_outbox_events_pending", "id", postgresql_where=(published_at.is_(None))),
+        Index("ix_outbox_events_published", "published_at", postgresql_where=(published_at.isnot(None))),
+    )
@@ -0,0 +1 @@
+# scripts/__init__.py
\ No newline at end of file
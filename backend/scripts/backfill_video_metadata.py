@@ -0,0 +1,77 @@
+# scripts/backfill_video_metadata.py
+"""
+Backfill Video.duration_s / Video.meta_data for videos uploaded before the
+MP4 header parser existed. Only the box headers of each object are fetched
+(ranged GETs), never the full file.
+
+Usage (from backend/):
+    python -m scripts.backfill_video_metadata --batch-size 200 --workers 8
+"""
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from database.session import SessionLocal
+from database.models import Video
+from app.services.mp4_metadata import read_s3_metadata, apply_metadata
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _fetch(s3_key: str):
+    try:
+        return read_s3_metadata(s3_key), None
+    except Exception as e:
+        return None, str(e)
+
+
+def backfill(batch_size: int = 200, workers: int = 8, limit: int = 0) -> dict:
+    stats = {"scanned": 0, "updated": 0, "failed": 0}
+    last_id = 0
+    db = SessionLocal()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                # keyset over id so each batch is an index range scan
+                videos = (
+                    db.query(Video)
+                    .filter(Video.id > last_id, Video.meta_data.is_(None))
+                    .order_by(Video.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                if not videos:
+                    break
+                last_id = videos[-1].id
+
+                # dedup'd rows share an object; read each key once
+                keys = list({v.s3_key for v in videos})
+                results = dict(zip(keys, pool.map(_fetch, keys)))
+                for v in videos:
+                    meta, error = results[v.s3_key]
+                    if meta is None:
+                        # record the failure so the row isn't retried forever
+                        v.meta_data = {"parse_error": error}
+                        stats["failed"] += 1
+                    else:
+                        apply_metadata(v, meta)
+                        stats["updated"] += 1
+                db.commit()
+
+                stats["scanned"] += len(videos)
+                logger.info(f"backfill: {stats} (last id {last_id})")
+                if limit and stats["scanned"] >= limit:
+                    break
+    finally:
+        db.close()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8, help="parallel S3 range readers")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many videos (0 = all)")
+    args = parser.parse_args()
+    print(backfill(args.batch_size, args.workers, args.limit))
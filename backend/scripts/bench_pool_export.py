@@ -0,0 +1,87 @@
+# scripts/bench_pool_export.py
+"""
+Pool export: time to first byte, total time, bytes and peak Python memory
+for the old path (every PoolShare loaded and sorted in Python, then an
+f-string CSV) against the cursor-backed exports in app.pools.exports.
+
+Reuses the bench_settlement seed (bench-settle-* creators in --period,
+default 1999-01) and settles that period once before measuring.
+
+Usage (from backend/):
+    python -m scripts.bench_pool_export --creators 1000000
+    python -m scripts.bench_pool_export --cleanup
+"""
+import argparse
+import time
+import tracemalloc
+
+from database.session import SessionLocal
+from database import models
+from database.db import create_tables
+from app.pools.exports import arrow_available, stream_shares
+from app.pools.settlement import settle_period
+from scripts.bench_settlement import cleanup, cleanup_pool, seed
+
+
+def legacy_csv(pool_id: int):
+    db = SessionLocal()
+    try:
+        shares = (
+            db.query(models.PoolShare)
+            .filter(models.PoolShare.pool_id == pool_id)
+            .order_by(models.PoolShare.payout_amount.desc())
+            .all()
+        )
+    finally:
+        db.close()
+    yield b"creator_id,token_count,effective_tokens,share_pct,payout_amount\n"
+    for s in shares:
+        yield f"{s.creator_id},{s.token_count},{s.effective_tokens:.6f},{s.share_pct:.6f},{s.payout_amount:.2f}\n".encode()
+
+
+def measure(name: str, chunks) -> None:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    ttfb = None
+    total = 0
+    for chunk in chunks:
+        if ttfb is None:
+            ttfb = time.perf_counter() - t0
+        total += len(chunk)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:>12}: ttfb {(ttfb or 0) * 1000:8.1f} ms   total {elapsed:7.2f} s   "
+        f"{total / 2**20:8.1f} MiB   peak python memory {peak / 2**20:8.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--creators", type=int, default=1_000_000)
+    parser.add_argument("--period", default="1999-01")
+    parser.add_argument("--cleanup", action="store_true", help="delete the bench rows and exit")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup(args.period)
+    else:
+        create_tables()
+        seed(args.creators, args.period)
+        cleanup_pool(args.period)
+        db = SessionLocal()
+        try:
+            pool_id = settle_period(db, args.period, 1_000_000.0)
+            db.commit()
+        finally:
+            db.close()
+
+        measure("legacy csv", legacy_csv(pool_id))
+        measure("copy csv", stream_shares(pool_id, "csv"))
+        if arrow_available():
+            measure("arrow", stream_shares(pool_id, "arrow"))
+            measure("parquet", stream_shares(pool_id, "parquet"))
+        else:
+            print("pyarrow not installed; skipping arrow/parquet")
+        cleanup_pool(args.period)
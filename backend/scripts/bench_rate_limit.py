@@ -0,0 +1,92 @@
+# scripts/bench_rate_limit.py
+"""
+Latency the rate limiter adds per request, in microseconds.
+
+Drives RateLimitMiddleware directly with ASGI scopes (no server, no
+network) around a no-op app, and compares it with calling the app bare:
+  - unlimited route (policy lookup only)
+  - limited route, IP bucket only
+  - limited route, IP + user bucket (cached bearer token)
+for the memory backend, and for Redis too when REDIS_URL is set.
+
+Usage (from backend/):
+    python -m scripts.bench_rate_limit --requests 200000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from app.middleware.rate_limit import MemoryBuckets, Policy, RateLimitMiddleware, RedisBuckets
+from app.storage.redis_client import get_redis
+
+POLICIES = {
+    ("POST", "/limited-ip"): {"ip": Policy(rate=1e9, burst=10**9)},
+    ("POST", "/limited-user"): {"user": Policy(rate=1e9, burst=10**9), "ip": Policy(rate=1e9, burst=10**9)},
+}
+
+
+async def _noop_app(scope, receive, send):
+    return None
+
+
+async def _send(message):
+    return None
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+def _scope(path: str, ip_index: int) -> dict:
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "headers": [(b"authorization", b"Bearer bench-token")],
+        "client": (f"10.0.{ip_index // 256 % 256}.{ip_index % 256}", 1234),
+    }
+
+
+async def _time(app, path: str, n: int) -> list:
+    scopes = [_scope(path, i % 1000) for i in range(1000)]
+    samples = []
+    for i in range(n):
+        t0 = time.perf_counter_ns()
+        await app(scopes[i % 1000], _receive, _send)
+        samples.append(time.perf_counter_ns() - t0)
+    return samples
+
+
+def _report(name: str, samples: list, baseline: float) -> None:
+    samples.sort()
+    mean = statistics.fmean(samples) / 1000
+    p99 = samples[int(len(samples) * 0.99)] / 1000
+    print(f"{name:>34}: mean {mean:7.2f} us  p99 {p99:7.2f} us  (+{mean - baseline:6.2f} us over bare app)")
+
+
+async def main(n: int) -> None:
+    bare = statistics.fmean(await _time(_noop_app, "/x", n)) / 1000
+    print(f"{'bare app':>34}: mean {bare:7.2f} us")
+
+    backends = [("memory", MemoryBuckets())]
+    client = get_redis()
+    if client is not None:
+        backends.append(("redis", RedisBuckets(client, prefix=f"rl-bench:{os.getpid()}:")))
+
+    for name, buckets in backends:
+        mw = RateLimitMiddleware(_noop_app, policies=POLICIES, buckets=buckets)
+        # pre-resolve the bench token so the user bucket is exercised without a JWT secret
+        mw.tokens._cache["bench-token"] = (42, time.time() + 3600)
+        count = n if name == "memory" else max(n // 20, 1000)
+        _report(f"{name}: unlimited route", await _time(mw, "/unlimited", count), bare)
+        _report(f"{name}: ip bucket", await _time(mw, "/limited-ip", count), bare)
+        _report(f"{name}: ip + user buckets", await _time(mw, "/limited-user", count), bare)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,141 @@
+# scripts/bench_settlement.py
+"""
+Settlement time and Python memory: set-based settle_period() vs the old
+path (aggregate rows fetched into Python, multipliers picked in a loop,
+PoolShare objects built and bulk_save_objects'd).
+
+Seeds --creators bench users, one video each, one rollup row per video
+in --period (default 1999-01, so real pools are never touched), and AI
+scores for half of the videos.
+
+Usage (from backend/):
+    python -m scripts.bench_settlement --creators 1000000
+    python -m scripts.bench_settlement --cleanup
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from sqlalchemy import text
+
+from database.session import SessionLocal, engine
+from database.db import create_tables
+from database import models
+from app.pools.rollups import month_token_counts
+from app.pools.settlement import month_bounds, resolve_multipliers, settle_period
+
+
+def seed(creators: int, period: str) -> None:
+    start, _ = month_bounds(period)
+    with engine.begin() as conn:
+        have = conn.execute(text("SELECT count(*) FROM users WHERE username LIKE 'bench-settle-%'")).scalar()
+        if have >= creators:
+            return
+        conn.execute(text("""
+            INSERT INTO users (username, email, password_hash)
+            SELECT 'bench-settle-' || g, 'bench-settle-' || g || '@example.com', 'x'
+            FROM generate_series(:lo, :hi) g
+        """), {"lo": have + 1, "hi": creators})
+        conn.execute(text("""
+            INSERT INTO videos (creator_id, title, s3_key, s3_url, upload_status, ai_status)
+            SELECT u.id, 'bench-settle-' || u.id, 'bench-settle/' || u.id, '', 'completed', 'completed'
+            FROM users u LEFT JOIN videos v ON v.title = 'bench-settle-' || u.id
+            WHERE u.username LIKE 'bench-settle-%' AND v.id IS NULL
+        """))
+        conn.execute(text("""
+            INSERT INTO token_daily_rollup (day, creator_id, video_id, tok_cnt)
+            SELECT :day, v.creator_id, v.id, 1 + (v.id % 50)
+            FROM videos v WHERE v.title LIKE 'bench-settle-%'
+            ON CONFLICT DO NOTHING
+        """), {"day": start.date()})
+        conn.execute(text("""
+            INSERT INTO video_ai_scores (video_id, human_prob, ai_prob)
+            SELECT v.id, r, 1 - r FROM (SELECT id, random() AS r FROM videos
+                                        WHERE title LIKE 'bench-settle-%' AND id % 2 = 0) v
+            ON CONFLICT DO NOTHING
+        """))
+        conn.execute(text("ANALYZE users; ANALYZE videos; ANALYZE token_daily_rollup; ANALYZE video_ai_scores"))
+
+
+def cleanup(period: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM pools WHERE period_month = :p"), {"p": period})
+        # videos, rollup and score rows cascade
+        conn.execute(text("DELETE FROM users WHERE username LIKE 'bench-settle-%'"))
+
+
+def legacy_settle(db, period: str, base_amount: float) -> int:
+    """The pre-set-based close_and_settle body"""
+    start, end = month_bounds(period)
+    Sub = month_token_counts(db, start, end)
+    rows = (
+        db.query(Sub.c.creator_id, Sub.c.video_id, Sub.c.tok_cnt,
+                 models.VideoAIScore.human_prob, models.VideoAIScore.ai_prob)
+        .outerjoin(models.VideoAIScore, models.VideoAIScore.video_id == Sub.c.video_id)
+        .all()
+    )
+    human_mul, ai_mul = resolve_multipliers(db, period)
+    creator_buckets: Dict[int, Dict[str, float]] = {}
+    for r in rows:
+        mult = 1.0
+        if r.human_prob is not None and r.ai_prob is not None:
+            mult = human_mul if (r.human_prob >= r.ai_prob) else ai_mul
+        d = creator_buckets.setdefault(r.creator_id, {"tok": 0.0, "eff": 0.0})
+        d["tok"] += float(r.tok_cnt)
+        d["eff"] += float(r.tok_cnt) * mult
+    total_effective = sum(v["eff"] for v in creator_buckets.values())
+    pool = models.Pool(period_month=period, base_amount=base_amount, settled=True,
+                       settled_at=datetime.now(tz=timezone.utc), total_effective_tokens=total_effective)
+    db.add(pool)
+    db.flush()
+    shares: List[models.PoolShare] = []
+    for creator_id, agg in creator_buckets.items():
+        share_pct = (agg["eff"] / total_effective) if total_effective > 0 else 0.0
+        shares.append(models.PoolShare(
+            pool_id=pool.id, creator_id=creator_id, token_count=int(agg["tok"]),
+            effective_tokens=agg["eff"], share_pct=share_pct,
+            payout_amount=round(base_amount * share_pct, 2),
+        ))
+    db.bulk_save_objects(shares)
+    return pool.id
+
+
+def measure(name: str, fn, period: str, base_amount: float) -> None:
+    cleanup_pool(period)
+    db = SessionLocal()
+    try:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        fn(db, period, base_amount)
+        db.commit()
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        db.close()
+    print(f"{name:>10}: {elapsed:8.2f} s   peak python memory {peak / 2**20:8.1f} MiB")
+
+
+def cleanup_pool(period: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM pools WHERE period_month = :p"), {"p": period})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--creators", type=int, default=1_000_000)
+    parser.add_argument("--period", default="1999-01")
+    parser.add_argument("--base-amount", type=float, default=1_000_000.0)
+    parser.add_argument("--cleanup", action="store_true", help="delete the bench rows and exit")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup(args.period)
+    else:
+        create_tables()
+        seed(args.creators, args.period)
+        measure("legacy", legacy_settle, args.period, args.base_amount)
+        measure("set-based", settle_period, args.period, args.base_amount)
+        cleanup_pool(args.period)
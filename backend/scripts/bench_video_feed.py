@@ -0,0 +1,109 @@
+# scripts/bench_video_feed.py
+"""
+Benchmark the keyset video feed against OFFSET paging at increasing depth.
+
+Seeds --rows synthetic videos (titles 'bench-feed-*', spread over 1000 bench
+creators) unless they already exist, then times one page at each depth.
+Keyset latency should stay flat while OFFSET grows with depth.
+
+Usage (from backend/):
+    python -m scripts.bench_video_feed --rows 2000000
+    python -m scripts.bench_video_feed --cleanup
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+
+from database.session import SessionLocal, engine
+from database.db import create_tables
+from app.videos.feed import fetch_feed_page, encode_cursor
+
+BENCH_CREATORS = 1000
+
+
+def seed(rows: int, batch: int = 200_000) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO users (username, email, password_hash)
+            SELECT 'bench-creator-' || g, 'bench-creator-' || g || '@example.com', 'x'
+            FROM generate_series(1, :n) g
+            ON CONFLICT DO NOTHING
+        """), {"n": BENCH_CREATORS})
+        have = conn.execute(text("SELECT count(*) FROM videos WHERE title LIKE 'bench-feed-%'")).scalar()
+    first_creator = None
+    with engine.connect() as conn:
+        first_creator = conn.execute(
+            text("SELECT min(id) FROM users WHERE username LIKE 'bench-creator-%'")
+        ).scalar()
+
+    for start in range(have + 1, rows + 1, batch):
+        end = min(start + batch - 1, rows)
+        with engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO videos (creator_id, title, s3_key, s3_url, ai_status, ai_label, ai_score,
+                                    view_count, upload_status, created_at)
+                SELECT :first + (g % :creators), 'bench-feed-' || g, 'bench/' || g || '.mp4', '',
+                       'completed', CASE WHEN g % 3 = 0 THEN 'FAKE' ELSE 'REAL' END, random(),
+                       0, 'completed', now() - make_interval(secs => g)
+                FROM generate_series(:start, :end) g
+            """), {"first": first_creator, "creators": BENCH_CREATORS, "start": start, "end": end})
+        print(f"seeded {end}/{rows}")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE videos"))
+
+
+def cleanup() -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM videos WHERE title LIKE 'bench-feed-%'"))
+        conn.execute(text("DELETE FROM users WHERE username LIKE 'bench-creator-%'"))
+
+
+def _time(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def run(rows: int, page_size: int, repeat: int) -> None:
+    db = SessionLocal()
+    try:
+        depths = [d for d in (0, 1_000, 10_000, 100_000, 1_000_000, 5_000_000) if d < rows]
+        print(f"{'depth':>10} {'keyset ms':>10} {'offset ms':>10}")
+        for depth in depths:
+            cursor = None
+            if depth:
+                # cursor for the row just before this depth (setup, not timed)
+                row = db.execute(text(
+                    "SELECT created_at, id FROM videos ORDER BY created_at DESC, id DESC OFFSET :d LIMIT 1"
+                ), {"d": depth - 1}).one()
+                cursor = encode_cursor(row.created_at, row.id)
+
+            keyset_ms = _time(lambda: fetch_feed_page(db, limit=page_size, cursor=cursor), repeat)
+            offset_ms = _time(lambda: db.execute(text(
+                "SELECT id, title, creator_id, duration_s, view_count, ai_score, ai_label, created_at "
+                "FROM videos ORDER BY created_at DESC, id DESC OFFSET :d LIMIT :n"
+            ), {"d": depth, "n": page_size}).all(), repeat)
+            print(f"{depth:>10} {keyset_ms:>10.2f} {offset_ms:>10.2f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--cleanup", action="store_true", help="delete the bench rows and exit")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+    else:
+        create_tables()
+        seed(args.rows)
+        run(args.rows, args.page_size, args.repeat)
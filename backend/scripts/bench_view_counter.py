@@ -0,0 +1,105 @@
+# scripts/bench_view_counter.py
+"""
+Throughput of view recording for a single hot video.
+
+Compares the sharded in-process counter with a single-lock counter, and with
+--db also a naive per-view `UPDATE videos SET view_count = view_count + 1`
+against one buffered flush.
+
+On a GIL build of CPython the two in-process counters come out about even
+(roughly 2M views/s each): only the thread holding the GIL can be inside
+either lock, so the single lock is rarely contended. Sharding pays off on
+free-threaded builds. The run prints how many shards were used, so a broken
+shard assignment shows up as "1 of 16".
+
+Usage (from backend/):
+    python -m scripts.bench_view_counter --threads 16 --views 200000
+    python -m scripts.bench_view_counter --db --video-id 1 --views 5000
+"""
+import argparse
+import threading
+import time
+
+from sqlalchemy import text
+
+from database.session import engine
+from app.services.view_counter import ShardedViewCounter, apply_view_counts
+
+
+class SingleLockCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, video_id, n=1):
+        with self._lock:
+            self._counts[video_id] = self._counts.get(video_id, 0) + n
+
+    def drain(self):
+        with self._lock:
+            out, self._counts = self._counts, {}
+        return out
+
+
+def _hammer(record, video_id: int, threads: int, per_thread: int) -> float:
+    def worker():
+        for _ in range(per_thread):
+            record(video_id)
+
+    ts = [threading.Thread(target=worker) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return time.perf_counter() - t0
+
+
+def bench_memory(threads: int, views: int) -> None:
+    per_thread = views // threads
+    for name, counter in (("single-lock", SingleLockCounter()), ("sharded", ShardedViewCounter())):
+        elapsed = _hammer(counter.record, 1, threads, per_thread)
+        used = ""
+        if isinstance(counter, ShardedViewCounter):
+            used = f", {sum(1 for _, c in counter._shards if c)} of {len(counter._shards)} shards used"
+        counted = counter.drain().get(1, 0)
+        assert counted == per_thread * threads, (name, counted)
+        print(f"{name:>12}: {counted / elapsed:,.0f} views/s ({threads} threads{used})")
+
+
+def bench_db(video_id: int, threads: int, views: int) -> None:
+    per_thread = max(views // threads, 1)
+
+    def naive(vid):
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE videos SET view_count = COALESCE(view_count, 0) + 1 WHERE id = :id"), {"id": vid})
+
+    elapsed = _hammer(naive, video_id, threads, per_thread)
+    print(f"{'naive UPDATE':>12}: {per_thread * threads / elapsed:,.0f} views/s ({threads} threads)")
+
+    counter = ShardedViewCounter()
+    elapsed = _hammer(counter.record, video_id, threads, per_thread)
+    t0 = time.perf_counter()
+    apply_view_counts(counter.drain())
+    elapsed += time.perf_counter() - t0
+    print(f"{'buffered':>12}: {per_thread * threads / elapsed:,.0f} views/s incl. one flush")
+
+    with engine.begin() as conn:
+        # undo the benchmark's views
+        conn.execute(
+            text("UPDATE videos SET view_count = view_count - :n WHERE id = :id"),
+            {"n": 2 * per_thread * threads, "id": video_id},
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--views", type=int, default=200_000)
+    parser.add_argument("--db", action="store_true", help="also benchmark against Postgres")
+    parser.add_argument("--video-id", type=int, default=1)
+    args = parser.parse_args()
+
+    bench_memory(args.threads, args.views)
+    if args.db:
+        bench_db(args.video_id, args.threads, args.views)
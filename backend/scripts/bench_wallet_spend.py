@@ -0,0 +1,121 @@
+# scripts/bench_wallet_spend.py
+"""
+Many concurrent spends against one wallet.
+
+Each thread spends single tokens in its own session until the wallet runs
+dry. This is run for:
+  - naive: read the row, subtract in Python, UPDATE ... SET balance = :new
+    (the old appreciate path; loses updates)
+  - cas:   spend_token() -- compare-and-set on token_wallets.version
+and each run reports throughput, the number of successful spends against
+the starting balance, the final balance, and conflicts / give-ups.
+
+Usage (from backend/):
+    python -m scripts.bench_wallet_spend --threads 32 --tokens 5000
+    python -m scripts.bench_wallet_spend --cleanup
+"""
+import argparse
+import threading
+import time
+
+from sqlalchemy import text
+
+from database.session import SessionLocal, engine
+from database.db import create_tables
+from app.services import metrics
+from app.services.wallets import InsufficientTokens, WalletBusy, spend_token
+
+BENCH_USER = "bench-wallet"
+
+
+def setup(tokens: int) -> int:
+    with engine.begin() as conn:
+        user_id = conn.execute(text("""
+            INSERT INTO users (username, email, password_hash) VALUES (:u, :u || '@example.com', 'x')
+            ON CONFLICT (username) DO UPDATE SET username = EXCLUDED.username
+            RETURNING id
+        """), {"u": BENCH_USER}).scalar()
+        conn.execute(text("DELETE FROM token_wallets WHERE user_id = :id"), {"id": user_id})
+        return conn.execute(text("""
+            INSERT INTO token_wallets (user_id, monthly_budget, bonus_balance, version)
+            VALUES (:id, :m, :b, 0) RETURNING wallet_id
+        """), {"id": user_id, "m": tokens // 2, "b": tokens - tokens // 2}).scalar()
+
+
+def cleanup() -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM users WHERE username = :u"), {"u": BENCH_USER})
+
+
+def naive_spend(db, wallet_id: int) -> None:
+    row = db.execute(
+        text("SELECT monthly_budget, bonus_balance FROM token_wallets WHERE wallet_id = :id"), {"id": wallet_id}
+    ).one()
+    if row.monthly_budget + row.bonus_balance < 1:
+        raise InsufficientTokens()
+    m, b = (row.monthly_budget - 1, row.bonus_balance) if row.monthly_budget > 0 else (0, row.bonus_balance - 1)
+    db.execute(
+        text("UPDATE token_wallets SET monthly_budget = :m, bonus_balance = :b WHERE wallet_id = :id"),
+        {"m": m, "b": b, "id": wallet_id},
+    )
+
+
+def run(name: str, spend, threads: int, tokens: int) -> None:
+    wallet_id = setup(tokens)
+    counts = {"ok": 0, "busy": 0}
+    lock = threading.Lock()
+    conflicts_before = metrics.get("wallets.spend.conflicts")
+
+    def worker():
+        db = SessionLocal()
+        try:
+            while True:
+                try:
+                    spend(db, wallet_id)
+                    db.commit()
+                    key = "ok"
+                except InsufficientTokens:
+                    db.rollback()
+                    return
+                except WalletBusy:
+                    db.rollback()
+                    key = "busy"
+                with lock:
+                    counts[key] += 1
+        finally:
+            db.close()
+
+    ts = [threading.Thread(target=worker) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    with engine.connect() as conn:
+        left = conn.execute(
+            text("SELECT monthly_budget + bonus_balance FROM token_wallets WHERE wallet_id = :id"), {"id": wallet_id}
+        ).scalar()
+    exact = counts["ok"] + left == tokens
+    print(
+        f"{name:>6}: {counts['ok'] / elapsed:8,.0f} spends/s   spent {counts['ok']} of {tokens}, "
+        f"left {left}   {'exact' if exact else 'LOST UPDATES'}   "
+        f"conflicts {metrics.get('wallets.spend.conflicts') - conflicts_before:.0f}, busy {counts['busy']}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--tokens", type=int, default=5000)
+    parser.add_argument("--cleanup", action="store_true", help="delete the bench user and exit")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+    else:
+        create_tables()
+        run("naive", naive_spend, args.threads, args.tokens)
+        run("cas", spend_token, args.threads, args.tokens)
+        cleanup()
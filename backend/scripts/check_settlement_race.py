@@ -0,0 +1,127 @@
+# scripts/check_settlement_race.py
+"""
+Regression check: a rollup refresh that commits while a period is being
+settled must not make settlement count tokens twice.
+
+Seeds a check creator with one video and --tokens appreciations in --period
+(default 1998-01, so real pools are never touched). Half of them are folded
+into token_daily_rollup up front; the other half are left as the raw tail.
+settle_period() then runs in a READ COMMITTED session, and
+refresh_token_rollup() is made to commit in another connection right before
+the pool_shares INSERT ... SELECT executes, i.e. after everything settlement
+reads in Python and before the statement that counts. The check creator's
+token_count must still equal its raw token count. The settlement is rolled
+back and the seeded rows are deleted.
+
+Needs the rollup to be able to advance over the seeded tail, so run it
+against a dev database with no appreciation younger than ROLLUP_LAG_S below
+the seeded token ids.
+
+Usage (from backend/):
+    python -m scripts.check_settlement_race --tokens 1000
+"""
+import argparse
+
+from sqlalchemy import event, text
+from sqlalchemy.sql.dml import Insert
+
+from database.session import SessionLocal, engine
+from database.db import create_tables
+from database import models
+from app.pools.rollups import get_watermark, refresh_token_rollup
+from app.pools.settlement import month_bounds, resettle_period
+
+PREFIX = "race-settle-"
+
+
+def seed_tokens(conn, creator_id: int, video_id: int, lo: int, hi: int, period: str) -> None:
+    start, _ = month_bounds(period)
+    conn.execute(text("""
+        INSERT INTO users (username, email, password_hash)
+        SELECT :prefix || g, :prefix || g || '@example.com', 'x'
+        FROM generate_series(:lo, :hi) g
+    """), {"prefix": PREFIX, "lo": lo, "hi": hi})
+    conn.execute(text("""
+        INSERT INTO appreciation_tokens (user_id, video_id, source, used_at)
+        SELECT u.id, :video_id, 'tap', :used_at
+        FROM users u
+        WHERE u.username LIKE :prefix || '%' AND u.id <> :creator_id
+          AND NOT EXISTS (SELECT 1 FROM appreciation_tokens t WHERE t.user_id = u.id)
+    """), {"video_id": video_id, "used_at": start, "prefix": PREFIX, "creator_id": creator_id})
+
+
+def seed(tokens: int, period: str) -> int:
+    """Returns the check creator's id; leaves tokens // 2 of them as the raw tail"""
+    with engine.begin() as conn:
+        creator_id = conn.execute(text("""
+            INSERT INTO users (username, email, password_hash)
+            VALUES (:name, :name || '@example.com', 'x') RETURNING id
+        """), {"name": PREFIX + "creator"}).scalar()
+        video_id = conn.execute(text("""
+            INSERT INTO videos (creator_id, title, s3_key, s3_url, upload_status, ai_status)
+            VALUES (:creator_id, :title, :title, '', 'completed', 'completed') RETURNING id
+        """), {"creator_id": creator_id, "title": PREFIX + "video"}).scalar()
+        seed_tokens(conn, creator_id, video_id, 1, tokens // 2, period)
+    refresh_token_rollup()
+    with engine.begin() as conn:
+        seed_tokens(conn, creator_id, video_id, tokens // 2 + 1, tokens, period)
+    return creator_id
+
+
+def cleanup() -> None:
+    with engine.begin() as conn:
+        # videos, tokens and rollup rows cascade
+        conn.execute(text("DELETE FROM users WHERE username LIKE :prefix || '%'"), {"prefix": PREFIX})
+
+
+def check(creator_id: int, period: str) -> bool:
+    start, end = month_bounds(period)
+    with engine.connect() as conn:
+        wm_before = get_watermark(conn)
+    db = SessionLocal()
+    refreshed = []
+
+    @event.listens_for(db, "do_orm_execute")
+    def _refresh_first(state):
+        stmt = state.statement
+        if not refreshed and isinstance(stmt, Insert) and stmt.table.name == models.PoolShare.__tablename__:
+            refreshed.append(refresh_token_rollup())
+
+    try:
+        pool_id = resettle_period(db, period, 1000.0)
+        settled = db.execute(text(
+            "SELECT COALESCE(sum(token_count), 0) FROM pool_shares WHERE pool_id = :pool AND creator_id = :creator"
+        ), {"pool": pool_id, "creator": creator_id}).scalar()
+        raw = db.execute(text("""
+            SELECT count(*) FROM appreciation_tokens t JOIN videos v ON v.id = t.video_id
+            WHERE v.creator_id = :creator AND t.used_at >= :start AND t.used_at < :end
+        """), {"creator": creator_id, "start": start, "end": end}).scalar()
+    finally:
+        db.rollback()
+        db.close()
+    with engine.connect() as conn:
+        wm_after = get_watermark(conn)
+
+    print(f"rollup advanced {wm_before} -> {wm_after} during settlement ({refreshed[0] if refreshed else 0} token ids)")
+    if wm_after == wm_before:
+        print("the rollup did not advance over the seeded tail; the race was not exercised")
+        return False
+    print(f"settled token_count {settled}, raw tokens {raw}")
+    return settled == raw
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--period", default="1998-01")
+    args = parser.parse_args()
+
+    create_tables()
+    cleanup()
+    try:
+        ok = check(seed(args.tokens, args.period), args.period)
+    finally:
+        cleanup()
+    print("OK" if ok else "FAILED")
+    if not ok:
+        raise SystemExit(1)
@@ -0,0 +1,35 @@
+# scripts/reset_wallet_budgets.py
+"""
+Refill every wallet's monthly_budget for a period, in checkpointed,
+throttled wallet_id chunks (see app/services/wallet_reset.py). Safe to
+re-run: an interrupted period resumes, and a completed one is skipped.
+
+Usage (from backend/):
+    python -m scripts.reset_wallet_budgets                      # this month
+    python -m scripts.reset_wallet_budgets --period 2025-10 --budget 10 --chunk 20000 --throttle 0.25
+"""
+import argparse
+import logging
+
+from database.db import create_tables
+from app.services.wallet_reset import (
+    MONTHLY_BUDGET,
+    WALLET_RESET_CHUNK,
+    WALLET_RESET_THROTTLE,
+    reset_wallets,
+)
+
+logging.basicConfig(level=logging.INFO)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--period", default=None, help="YYYY-MM (default: current UTC month)")
+    parser.add_argument("--budget", type=int, default=MONTHLY_BUDGET)
+    parser.add_argument("--chunk", type=int, default=WALLET_RESET_CHUNK, help="wallet ids per transaction")
+    parser.add_argument("--throttle", type=float, default=WALLET_RESET_THROTTLE,
+                        help="sleep this fraction of each chunk's duration between chunks")
+    args = parser.parse_args()
+
+    create_tables()
+    print(reset_wallets(args.period, args.budget, args.chunk, args.throttle))
@@ -0,0 +1,113 @@
+# scripts/settle_periods.py
+"""
+Settle (or re-settle) a range of months in parallel, e.g. after a
+CompensationRule change.
+
+Each period runs on its own worker thread and session (so its own
+connection), inside one transaction that:
+  - takes the period's advisory lock (the same one close-and-settle uses)
+  - deletes the old pool and its shares
+  - settles the period again with settle_period()
+  - queues the same pool.settled outbox event close-and-settle does
+Readers keep seeing the old shares until that transaction commits, and
+re-running the command for a period just replaces its pool again.
+
+By default a period keeps its existing base_amount. --base-amount is
+required for periods that have no pool yet, or it can override them all.
+
+Usage (from backend/):
+    python -m scripts.settle_periods 2025-01 2025-12 --workers 4
+    python -m scripts.settle_periods 2025-01 2025-06 --base-amount 50000 --skip-settled
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Optional
+
+from database.session import SessionLocal
+from database import models
+from app.pools.settlement import emit_settled, lock_period, resettle_period
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def period_range(first: str, last: str) -> List[str]:
+    start = datetime.strptime(first, "%Y-%m")
+    end = datetime.strptime(last, "%Y-%m")
+    periods = []
+    y, m = start.year, start.month
+    while (y, m) <= (end.year, end.month):
+        periods.append(f"{y:04d}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return periods
+
+
+def settle_one(period: str, base_amount: Optional[float], skip_settled: bool) -> dict:
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        lock_period(db, period)
+        existing = (
+            db.query(models.Pool)
+            .filter(models.Pool.period_month == period)
+            .one_or_none()
+        )
+        if existing and skip_settled and existing.settled:
+            db.rollback()
+            return {"period": period, "status": "skipped", "pool_id": existing.id}
+        amount = base_amount if base_amount is not None else (existing.base_amount if existing else None)
+        if amount is None:
+            db.rollback()
+            return {"period": period, "status": "no_base_amount", "pool_id": None}
+
+        pool_id = resettle_period(db, period, amount)
+        emit_settled(db, pool_id, period, amount, resettled=existing is not None)
+        db.commit()
+        return {
+            "period": period,
+            "status": "resettled" if existing else "settled",
+            "pool_id": pool_id,
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def settle_periods(periods: List[str], workers: int = 4, base_amount: Optional[float] = None,
+                   skip_settled: bool = False) -> List[dict]:
+    results = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(settle_one, p, base_amount, skip_settled): p for p in periods}
+        for fut in as_completed(futures):
+            period = futures[fut]
+            try:
+                result = fut.result()
+            except Exception as e:
+                result = {"period": period, "status": "failed", "error": str(e)}
+            results.append(result)
+            logger.info(f"[{len(results)}/{len(periods)}] {result} ({time.perf_counter() - started:.1f}s elapsed)")
+    return sorted(results, key=lambda r: r["period"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("first", help="first period, YYYY-MM")
+    parser.add_argument("last", help="last period, YYYY-MM (inclusive)")
+    parser.add_argument("--workers", type=int, default=4, help="periods settled concurrently")
+    parser.add_argument("--base-amount", type=float, default=None)
+    parser.add_argument("--skip-settled", action="store_true", help="only settle periods without a pool")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    results = settle_periods(period_range(args.first, args.last), args.workers, args.base_amount, args.skip_settled)
+    failed = [r for r in results if r["status"] == "failed"]
+    print(f"{len(results)} periods in {time.perf_counter() - t0:.1f}s, {len(failed)} failed")
+    if failed:
+        raise SystemExit(1)